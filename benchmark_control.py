@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Control-path latency benchmark under vision load
+Runs web-client/backend.py in-process with a silent mock servo, the mock GPS
+source and stub vision models, drives joystick commands at realistic rates
+while frames are uploaded to the AI detection and depth endpoints, and reports
+/api/move, /api/stop and /api/servo/set latency percentiles.
+
+Usage:
+    python benchmark_control.py --duration 30 --ai-fps 10 --depth-fps 10
+    python benchmark_control.py --baseline control_baseline.json --threshold 0.2
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_CLIENT_DIR = os.path.join(ROOT_DIR, 'web-client')
+
+CONTROL_ENDPOINTS = ('move', 'stop', 'servo')
+FRAME_ENDPOINTS = ('ai_frame', 'depth_frame')
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(description="Measure control latency while the vision endpoints are loaded")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds per phase (default 20)")
+    parser.add_argument('--port', type=int, default=8765, help="Port of the in-process backend (default 8765)")
+    parser.add_argument('--move-rate', type=float, default=20.0, help="Joystick move commands per second (default 20)")
+    parser.add_argument('--stop-interval', type=float, default=0.5, help="Seconds between stop commands (default 0.5)")
+    parser.add_argument('--servo-rate', type=float, default=2.0, help="Servo commands per second (default 2)")
+    parser.add_argument('--ai-fps', type=float, default=10.0, help="AI detection frame uploads per second (0 disables)")
+    parser.add_argument('--depth-fps', type=float, default=10.0, help="Depth frame uploads per second (0 disables)")
+    parser.add_argument('--size', type=int, nargs=2, default=(640, 480), metavar=('WIDTH', 'HEIGHT'),
+                        help="Uploaded frame size (default 640 480)")
+    parser.add_argument('--ai-ms', type=float, default=40.0, help="Stub YOLO inference time in ms (default 40)")
+    parser.add_argument('--depth-ms', type=float, default=80.0, help="Stub depth inference time in ms (default 80)")
+    parser.add_argument('--stub-load', choices=('sleep', 'spin'), default='sleep',
+                        help="'sleep' releases the GIL during stub inference like torch kernels; "
+                             "'spin' holds it, the worst case for the event loop")
+    parser.add_argument('--skip-idle', action='store_true', help="Only run the loaded phase")
+    parser.add_argument('-o', '--output', default='control_bench_report.json', help="JSON report path")
+    parser.add_argument('--baseline', default=None, help="Baseline report to compare stop latency against")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="Allowed relative growth of loaded stop p95/p99 (default 0.20)")
+    return parser
+
+
+def simulate_work(milliseconds, mode):
+    """Occupy the calling thread for the stub inference time."""
+    if mode == 'sleep':
+        time.sleep(milliseconds / 1000.0)
+        return
+    deadline = time.perf_counter() + milliseconds / 1000.0
+    while time.perf_counter() < deadline:
+        pass
+
+
+class StubResult:
+    """Detection result without boxes, timed like an ultralytics result."""
+
+    boxes = None
+
+    def __init__(self, inference_ms):
+        self.speed = {'preprocess': 0.0, 'inference': inference_ms, 'postprocess': 0.0}
+
+
+class StubYOLO:
+    """Stands in for an ultralytics YOLO model with a fixed inference time."""
+
+    names = {0: 'stub'}
+
+    def __init__(self, inference_ms, mode):
+        self.inference_ms = inference_ms
+        self.mode = mode
+
+    def __call__(self, frame, conf=0.5, verbose=False, imgsz=None):
+        simulate_work(self.inference_ms, self.mode)
+        return [StubResult(self.inference_ms)]
+
+
+class StubDepthProcessor:
+    """Stands in for DepthProcessor with a fixed inference time."""
+
+    def __init__(self, inference_ms, mode):
+        from utils.depth_processor import DEPTH_STAGES
+        from utils.latency import StageLatency
+        self.inference_ms = inference_ms
+        self.mode = mode
+        self.latency = StageLatency(DEPTH_STAGES)
+        self.warmup_stats = None
+        self.colormap = cv2.COLORMAP_PLASMA
+
+    def set_colormap(self, colormap):
+        self.colormap = colormap
+
+    def process_frame(self, frame, target_size=None):
+        with self.latency.measure('inference'):
+            simulate_work(self.inference_ms, self.mode)
+        with self.latency.measure('draw'):
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            return cv2.applyColorMap(gray, self.colormap)
+
+
+def install_stubs(backend, args):
+    """Replace the servo and the model-backed services of the imported backend."""
+    from ai_detection_service import AIDetectionService
+    from depth_camera_service import DepthCameraService
+
+    class SilentServo:
+        angle = 0
+
+    backend.servo = SilentServo()
+    backend.services.register("ai_detection", lambda: AIDetectionService(model=StubYOLO(args.ai_ms, args.stub_load)))
+    backend.services.register("depth_camera",
+                              lambda: DepthCameraService(depth_processor=StubDepthProcessor(args.depth_ms, args.stub_load)))
+
+
+def start_server(app, port):
+    """Run the backend with uvicorn in a background thread."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline or not thread.is_alive():
+            raise SystemExit("✗ Backend did not start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def make_frame_payload(width, height):
+    frame = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    return {"frame": "data:image/jpeg;base64," + base64.b64encode(buffer).decode('utf-8')}
+
+
+def percentiles(samples_ms, errors, elapsed):
+    if not samples_ms:
+        return {'count': 0, 'errors': errors}
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+    return {
+        'count': len(samples),
+        'errors': errors,
+        'rate': round(len(samples) / elapsed, 2),
+        'p50': round(float(p50), 2),
+        'p95': round(float(p95), 2),
+        'p99': round(float(p99), 2),
+        'max': round(float(samples.max()), 2)
+    }
+
+
+async def run_phase(client, args, duration, with_vision):
+    """
+    Drive one phase and collect latencies per endpoint.
+
+    Control commands are open-loop: each is sent on schedule even if earlier
+    ones have not returned, so a stalled server shows up as latency instead
+    of being hidden by a slower send rate. Frame uploads are closed-loop like
+    the browser, which waits for each response before sending the next frame.
+    """
+    samples = {name: [] for name in CONTROL_ENDPOINTS + FRAME_ENDPOINTS}
+    errors = {name: 0 for name in samples}
+    pending = set()
+    payload = make_frame_payload(*args.size)
+    end = time.perf_counter() + duration
+
+    async def timed(name, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, json=body)
+            ok = response.status_code == 200
+        except Exception:
+            ok = False
+        if ok:
+            samples[name].append((time.perf_counter() - start) * 1000.0)
+        else:
+            errors[name] += 1
+
+    async def open_loop(name, rate, method, path, body_for):
+        period = 1.0 / rate
+        next_send = time.perf_counter()
+        i = 0
+        while next_send < end:
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            task = asyncio.create_task(timed(name, method, path, body_for(i)))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            i += 1
+            next_send += period
+
+    async def closed_loop(name, fps, path):
+        period = 1.0 / fps
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            await timed(name, "POST", path, payload)
+            await asyncio.sleep(max(0.0, period - (time.perf_counter() - start)))
+
+    directions = ("forward", "left", "forward", "right")
+    streams = [
+        open_loop('move', args.move_rate, "POST", "/api/move", lambda i: {"direction": directions[i % 4]}),
+        open_loop('stop', 1.0 / args.stop_interval, "POST", "/api/stop", lambda i: None),
+        open_loop('servo', args.servo_rate, "POST", "/api/servo/set", lambda i: {"angle": (i * 30) % 180}),
+    ]
+    if with_vision and args.ai_fps > 0:
+        streams.append(closed_loop('ai_frame', args.ai_fps, "/api/ai-detection/process-frame"))
+    if with_vision and args.depth_fps > 0:
+        streams.append(closed_loop('depth_frame', args.depth_fps, "/api/depth-camera/process-frame"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*streams)
+    if pending:
+        await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - start
+    return {name: percentiles(samples[name], errors[name], elapsed)
+            for name in samples if samples[name] or errors[name]}
+
+
+async def set_vision(client, enabled):
+    """Toggle AI detection and depth to the requested state."""
+    status = (await client.get("/api/status")).json()
+    for key, path in (("ai_detection_enabled", "/api/ai-detection/toggle"),
+                      ("depth_camera_enabled", "/api/depth-camera/toggle")):
+        if bool(status.get(key)) != enabled:
+            response = await client.post(path)
+            if response.status_code != 200:
+                raise SystemExit(f"✗ {path} failed: {response.text}")
+
+
+async def run_benchmark(args):
+    import httpx
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=50)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=30.0) as client:
+        phases = {}
+        if not args.skip_idle:
+            print(f"\n=== idle: control only, {args.duration:.0f} s ===")
+            await set_vision(client, False)
+            phases['idle'] = await run_phase(client, args, args.duration, with_vision=False)
+            print_phase(phases['idle'])
+        print(f"\n=== loaded: control + {args.ai_fps:g} AI fps + {args.depth_fps:g} depth fps, {args.duration:.0f} s ===")
+        await set_vision(client, True)
+        phases['loaded'] = await run_phase(client, args, args.duration, with_vision=True)
+        await set_vision(client, False)
+        print_phase(phases['loaded'])
+        stalls = (await client.get("/api/metrics/loop-stalls", params={"limit": 5})).json()
+        return phases, stalls
+
+
+def print_phase(phase):
+    print(f"{'Endpoint':<14}{'count':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, result in phase.items():
+        if result['count']:
+            print(f"{name:<14}{result['count']:>8}{result['errors']:>6}{result['p50']:>10}"
+                  f"{result['p95']:>10}{result['p99']:>10}{result['max']:>10}")
+        else:
+            print(f"{name:<14}{0:>8}{result['errors']:>6}")
+
+
+def main(argv=None):
+    args = build_argparser().parse_args(argv)
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # The backend reads the GPS source at import; models resolve relative to web-client/
+    os.environ.setdefault("NAUTILUS_GPS_SOURCE", "mock")
+    os.chdir(WEB_CLIENT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, WEB_CLIENT_DIR)
+    import backend
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    install_stubs(backend, args)
+    # Hold the original quality and workload so costs match across phases and runs
+    backend.quality.set_mode("manual", 0)
+    backend.governor.enabled = False
+    server, thread = start_server(backend.app, args.port)
+    print(f"✓ Backend running on port {args.port} (stub models: AI {args.ai_ms:g} ms, "
+          f"depth {args.depth_ms:g} ms, {args.stub_load})")
+    try:
+        phases, stalls = asyncio.run(run_benchmark(args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': {'machine': platform.machine(), 'python': platform.python_version(),
+                     'system': platform.system()},
+        'config': {key: value for key, value in vars(args).items()
+                   if key not in ('output', 'baseline', 'port')},
+        'phases': phases,
+        'loop_stalls': {'stall_count': stalls.get('stall_count'), 'max_lag_ms': stalls.get('max_lag_ms'),
+                        'recent': [{'lag_ms': s['lag_ms'], 'handler': s['handler']} for s in stalls.get('stalls', [])]}
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report written to {output_path}")
+
+    stop = phases['loaded'].get('stop', {})
+    print(f"Stop latency under load: p50 {stop.get('p50')} ms | p95 {stop.get('p95')} ms | p99 {stop.get('p99')} ms")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            base_stop = json.load(f)['phases']['loaded'].get('stop', {})
+        regressions = [
+            f"stop {key} {stop.get(key)} ms > baseline {base_stop[key]} ms"
+            for key in ('p95', 'p99')
+            if base_stop.get(key) and stop.get(key) is not None and stop[key] > base_stop[key] * (1 + args.threshold)
+        ]
+        if regressions:
+            print(f"\n❌ Stop latency regressed beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\n🎉 Stop latency within {args.threshold:.0%} of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
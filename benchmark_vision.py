@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the vision services
+Replays recorded frames through AIDetectionService, DepthProcessor,
+DepthCameraService and the HTTP endpoints, writes throughput, latency
+percentiles and peak RSS to a JSON report, and compares against a baseline.
+
+Usage:
+    python benchmark_vision.py --input clips/patrol.mp4 --output bench.json
+    python benchmark_vision.py --input clips/frames/ --baseline bench_baseline.json
+    python benchmark_vision.py --input clips/patrol.mp4 --save-baseline bench_baseline.json
+"""
+
+import argparse
+import base64
+import json
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_CLIENT_DIR = os.path.join(ROOT_DIR, 'web-client')
+
+STAGES = ('ai_detection', 'depth_processor', 'depth_camera_service', 'http_ai_detection', 'http_depth_camera')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(description="Benchmark the Nautilus vision services on recorded frames")
+    parser.add_argument('-i', '--input', default=None,
+                        help="Directory of images or a video file; synthetic frames are used if omitted")
+    parser.add_argument('-n', '--frames', type=int, default=100,
+                        help="Frames measured per stage; the input is looped if shorter (default 100)")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured frames per stage (default 5)")
+    parser.add_argument('--size', type=int, nargs=2, default=None, metavar=('WIDTH', 'HEIGHT'),
+                        help="Resize frames before replay (default: camera resolution for synthetic frames)")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=list(STAGES),
+                        help="Stages to run (default: all)")
+    parser.add_argument('-o', '--output', default='bench_report.json', help="JSON report path")
+    parser.add_argument('--baseline', default=None, help="Baseline report to compare against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Allowed relative regression in fps or p95 latency (default 0.10)")
+    parser.add_argument('--save-baseline', default=None, help="Also write this report as the new baseline")
+    parser.add_argument('--timeout', type=float, default=30.0,
+                        help="Seconds to wait for one asynchronous depth result (default 30)")
+    return parser
+
+
+def load_frames(input_path, count, size):
+    """
+    Load up to `count` frames from an image directory or video file.
+
+    Returns:
+        tuple: (list of BGR frames, description of the source)
+    """
+    frames = []
+    if input_path is None:
+        width, height = size or (640, 480)
+        rng = np.random.default_rng(0)
+        for i in range(min(count, 16)):
+            frame = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            cv2.putText(frame, f"FRAME {i}", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+            frames.append(frame)
+        return frames, "synthetic"
+
+    if os.path.isdir(input_path):
+        names = sorted(name for name in os.listdir(input_path) if name.lower().endswith(IMAGE_EXTENSIONS))
+        for name in names[:count]:
+            frame = cv2.imread(os.path.join(input_path, name))
+            if frame is not None:
+                frames.append(frame)
+    else:
+        capture = cv2.VideoCapture(input_path)
+        while len(frames) < count:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+
+    if not frames:
+        raise SystemExit(f"✗ No frames could be read from {input_path}")
+    if size is not None:
+        frames = [cv2.resize(frame, tuple(size)) for frame in frames]
+    return frames, os.path.abspath(input_path)
+
+
+def encode_frame(frame):
+    """Encode a frame as the data URL the browser sends."""
+    _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    return "data:image/jpeg;base64," + base64.b64encode(buffer).decode('utf-8')
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def summarize(latencies_ms, outputs, elapsed):
+    """Build the report entry for one stage."""
+    latencies = np.asarray(latencies_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(latencies, (50, 95, 99))
+    return {
+        'frames': len(latencies),
+        'outputs': outputs,
+        'seconds': round(elapsed, 3),
+        'fps': round(outputs / elapsed, 2) if elapsed > 0 else None,
+        'latency_ms': {
+            'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2),
+            'mean': round(float(latencies.mean()), 2),
+            'max': round(float(latencies.max()), 2)
+        },
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+
+def replay(frames, count, warmup, run_one):
+    """
+    Replay frames through `run_one(frame)`, looping the input as needed.
+
+    `run_one` returns True when the call produced an output (a detection
+    result or a depth frame); throughput counts outputs, not calls.
+    """
+    for i in range(warmup):
+        run_one(frames[i % len(frames)])
+    latencies = []
+    outputs = 0
+    start = time.perf_counter()
+    for i in range(count):
+        frame_start = time.perf_counter()
+        if run_one(frames[i % len(frames)]):
+            outputs += 1
+        latencies.append((time.perf_counter() - frame_start) * 1000.0)
+    return summarize(latencies, outputs, time.perf_counter() - start)
+
+
+def bench_ai_detection(frames, args):
+    from ai_detection_service import get_ai_detection_service
+    service = get_ai_detection_service()
+    if service.model is None:
+        return {'skipped': "YOLO model not available"}
+    service.enable_detection()
+
+    def run_one(frame):
+        service.process_frame(frame)
+        return True
+
+    result = replay(frames, args.frames, args.warmup, run_one)
+    result['stages'] = service.get_latency()
+    return result
+
+
+def bench_depth_processor(frames, args):
+    from depth_camera_service import get_depth_camera_service
+    service = get_depth_camera_service()
+    if not service.is_available():
+        return {'skipped': service.load_error or "Depth model not available"}
+    processor = service.depth_processor
+
+    def run_one(frame):
+        return processor.process_frame(frame) is not None
+
+    result = replay(frames, args.frames, args.warmup, run_one)
+    result['stages'] = processor.latency.summary()
+    return result
+
+
+def bench_depth_camera_service(frames, args):
+    from depth_camera_service import get_depth_camera_service
+    service = get_depth_camera_service()
+    if not service.is_available():
+        return {'skipped': service.load_error or "Depth model not available"}
+    encoded = [encode_frame(frame) for frame in frames]
+    service.start_depth_processing()
+
+    def run_one(frame_b64):
+        # Submit a frame and wait for the worker to finish it, so each
+        # latency sample spans decode, queueing, inference and encoding
+        processed = service.frames_processed
+        service.process_frame(frame_b64)
+        deadline = time.perf_counter() + args.timeout
+        while service.frames_processed == processed:
+            if time.perf_counter() > deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+    try:
+        result = replay(encoded, args.frames, args.warmup, run_one)
+    finally:
+        service.stop_depth_processing()
+    result['stages'] = service.get_latency()
+    return result
+
+
+def bench_http(frames, args, client, toggle_path, frame_path, enabled_key, output_status):
+    encoded = [encode_frame(frame) for frame in frames]
+    response = client.post(toggle_path)
+    body = response.json()
+    if response.status_code != 200 or not body.get(enabled_key):
+        return {'skipped': body.get('message', f"{toggle_path} returned {response.status_code}")}
+
+    def run_one(frame_b64):
+        reply = client.post(frame_path, json={"frame": frame_b64})
+        return reply.status_code == 200 and reply.json().get('status') == output_status
+
+    try:
+        return replay(encoded, args.frames, args.warmup, run_one)
+    finally:
+        client.post(toggle_path)
+
+
+def compare(report, baseline, threshold):
+    """
+    Compare stage fps and p95 latency against a baseline report.
+
+    Returns:
+        list: Regression descriptions (empty if none)
+    """
+    regressions = []
+    print("\n" + "=" * 72)
+    print(f"{'Stage':<24}{'fps':>10}{'base fps':>10}{'p95 ms':>12}{'base p95':>12}")
+    print("=" * 72)
+    for stage, result in report['stages'].items():
+        base = baseline.get('stages', {}).get(stage)
+        if 'skipped' in result or not base or 'skipped' in base:
+            continue
+        fps, base_fps = result['fps'], base['fps']
+        p95, base_p95 = result['latency_ms']['p95'], base['latency_ms']['p95']
+        print(f"{stage:<24}{fps:>10}{base_fps:>10}{p95:>12}{base_p95:>12}")
+        if base_fps and fps is not None and fps < base_fps * (1 - threshold):
+            regressions.append(f"{stage}: fps {fps} < baseline {base_fps}")
+        if base_p95 and p95 > base_p95 * (1 + threshold):
+            regressions.append(f"{stage}: p95 {p95} ms > baseline {base_p95} ms")
+    return regressions
+
+
+def main(argv=None):
+    args = build_argparser().parse_args(argv)
+    input_path = os.path.abspath(args.input) if args.input else None
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    save_baseline_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+
+    # Services resolve model paths relative to web-client/, like the backend
+    os.chdir(WEB_CLIENT_DIR)
+    # web-client/ first, so `backend` is the web backend, not the legacy root script
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, WEB_CLIENT_DIR)
+    from config.camera_config import CameraConfig
+
+    size = args.size or (None if input_path else (CameraConfig.FRAME_WIDTH, CameraConfig.FRAME_HEIGHT))
+    frames, source = load_frames(input_path, args.frames, size)
+    height, width = frames[0].shape[:2]
+    print(f"✓ Loaded {len(frames)} frames ({width}x{height}) from {source}")
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': {'machine': platform.machine(), 'python': platform.python_version(),
+                     'system': platform.system()},
+        'input': {'source': source, 'frames_loaded': len(frames), 'width': width, 'height': height},
+        'config': {'frames': args.frames, 'warmup': args.warmup,
+                   'depth_model': CameraConfig.DEPTH_MODEL,
+                   'depth_checkpoint': CameraConfig.LOCAL_DEPTH_CHECKPOINT,
+                   'depth_process_interval': CameraConfig.DEPTH_PROCESS_INTERVAL},
+        'stages': {}
+    }
+
+    client = None
+    for stage in args.stages:
+        print(f"\n=== {stage} ===")
+        try:
+            if stage == 'ai_detection':
+                result = bench_ai_detection(frames, args)
+            elif stage == 'depth_processor':
+                result = bench_depth_processor(frames, args)
+            elif stage == 'depth_camera_service':
+                result = bench_depth_camera_service(frames, args)
+            else:
+                if client is None:
+                    from fastapi.testclient import TestClient
+                    import backend
+                    client = TestClient(backend.app).__enter__()
+                if stage == 'http_ai_detection':
+                    result = bench_http(frames, args, client, "/api/ai-detection/toggle",
+                                        "/api/ai-detection/process-frame", "ai_detection_enabled", "success")
+                else:
+                    result = bench_http(frames, args, client, "/api/depth-camera/toggle",
+                                        "/api/depth-camera/process-frame", "depth_camera_enabled", "success")
+        except Exception as e:
+            result = {'skipped': f"{type(e).__name__}: {e}"}
+
+        report['stages'][stage] = result
+        if 'skipped' in result:
+            print(f"⚠️ Skipped: {result['skipped']}")
+        else:
+            latency = result['latency_ms']
+            print(f"✓ {result['fps']} fps | p50 {latency['p50']} ms | p95 {latency['p95']} ms | "
+                  f"p99 {latency['p99']} ms | peak RSS {result['peak_rss_mb']} MB")
+
+    if client is not None:
+        client.__exit__(None, None, None)
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Report written to {output_path}")
+    if save_baseline_path:
+        with open(save_baseline_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline written to {save_baseline_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\n🎉 No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,5 +4,6 @@ Contains configuration classes for various components.
 """
 
 from .camera_config import CameraConfig, PerformanceConfig, DebugConfig
+from .backend_config import BackendConfig
 
-__all__ = ['CameraConfig', 'PerformanceConfig', 'DebugConfig'] 
\ No newline at end of file
+__all__ = ['CameraConfig', 'PerformanceConfig', 'DebugConfig', 'BackendConfig'] 
\ No newline at end of file
@@ -0,0 +1,123 @@
+"""
+Backend Configuration Settings
+Contains configurable parameters for the web controller backend.
+"""
+
+import os
+
+
+class BackendConfig:
+    """Configuration class for the FastAPI controller backend."""
+    
+    # Server and robot identity. The environment overrides allow several
+    # controllers to run on one machine as local stand-ins for a fleet.
+    HOST = "0.0.0.0"
+    PORT = int(os.environ.get("NAUTILUS_PORT", 8000))
+    ROBOT_ID = os.environ.get("NAUTILUS_ROBOT_ID", "NAUT-001")
+    ROBOT_MODEL = os.environ.get("NAUTILUS_ROBOT_MODEL", "Nautilus Explorer Pro")
+    
+    # Service loading
+    PRELOAD_MODELS = True  # Load AI/depth models in the background at startup
+    MODEL_LOAD_WAIT_TIMEOUT = 30.0  # seconds a toggle request waits for a model load
+    
+    # Teleoperation WebSocket
+    TELEOP_DEADMAN_TIMEOUT = 0.3  # seconds without a movement frame before stopping
+    
+    # Telemetry push
+    TELEMETRY_MAX_RATE = 10.0  # maximum state pushes per second to dashboards
+    BATTERY_SAMPLE_INTERVAL = 5.0  # seconds
+    TEMPERATURE_SAMPLE_INTERVAL = 1.0  # seconds
+    
+    # GPS
+    GPS_SOURCE = os.environ.get("NAUTILUS_GPS_SOURCE", "gpsd")  # "gpsd", "nmea" (replay GPS_NMEA_FILE), "mock" or "replay" (replay_session.py)
+    GPSD_HOST = "127.0.0.1"
+    GPSD_PORT = 2947
+    GPS_NMEA_FILE = None  # NMEA log replayed when GPS_SOURCE is "nmea"
+    GPS_NMEA_RATE = 10.0  # epochs per second for logs without timestamps
+    GPS_MAX_RECONNECT_DELAY = 30.0  # seconds, upper bound of the reconnect backoff
+    
+    # Position history
+    POSITION_HISTORY_SIZE = 36000  # samples kept per robot (1 hour at 10 Hz, ~1 MB)
+    TRACK_DP_TOLERANCE = 1.0  # meters, default Douglas-Peucker tolerance for /api/track
+    TRACK_BUCKET_SECONDS = 5.0  # default bucket width for time-bucketed tracks
+    
+    # Fleet aggregation. Each entry is {"id": ..., "model": ..., "url": "http://host:port"};
+    # the robot served by this backend is always included.
+    FLEET_ROBOTS = []
+    FLEET_MAX_RATE = 2.0  # maximum fleet pushes per second to dashboards
+    FLEET_MAX_RECONNECT_DELAY = 30.0  # seconds, upper bound of the reconnect backoff
+    FLEET_COORD_SCALE = 100000  # wire units per degree (~1.1 m resolution)
+    FLEET_BATTERY_STEP = 1  # percent, battery quantization on the wire
+    FLEET_INDEX_CELL_SIZE = 0.001  # degrees (~110 m), spatial index grid cell
+    # Named geofences: name -> list of [lat, lng] polygon vertices
+    GEOFENCES = {}
+    
+    # Event-loop watchdog
+    LOOP_WATCHDOG_INTERVAL = 0.05  # seconds between loop heartbeats
+    LOOP_STALL_THRESHOLD = 0.1  # seconds of lag recorded as a stall, with the blocking stack
+    LOOP_STALL_HISTORY = 50  # recent stalls kept for /api/metrics/loop-stalls
+    
+    # On-demand profiling (admin endpoints)
+    PROFILE_MAX_SECONDS = 60.0  # longest CPU profile capture
+    PROFILE_MAX_HZ = 250  # highest CPU sampling rate
+    PROFILE_MAX_STACKS = 10000  # distinct folded stacks kept per capture
+    ALLOC_MAX_SNAPSHOTS = 4  # tracemalloc snapshots kept (oldest evicted)
+    ALLOC_MAX_FRAMES = 25  # deepest traceback stored per allocation
+    ALLOC_MAX_SECONDS = 300.0  # allocation tracing stops by itself after this long
+    TORCH_PROFILE_MAX_INFERENCES = 50  # most inferences in one torch profiler capture
+    
+    # Obstacle map (depth + detections) consulted by forward motion commands
+    OBSTACLE_GRID_ROWS = 12
+    OBSTACLE_GRID_COLS = 16
+    OBSTACLE_SMOOTHING = 0.5  # weight of the newest depth map in the occupancy average
+    OBSTACLE_MARGIN = 0.12  # nearness above the floor model that counts as an obstacle
+    OBSTACLE_CORRIDOR = 0.5  # fraction of the image width the robot drives into
+    OBSTACLE_SLOW_THRESHOLD = 0.35  # hazard at which forward speed is limited
+    OBSTACLE_STOP_THRESHOLD = 0.6  # hazard at which forward motion is refused
+    OBSTACLE_SLOW_SPEED = 40  # percent speed limit near obstacles
+    OBSTACLE_MAX_AGE = 1.0  # seconds; shortest age after which a map is stale (forward speed limited to OBSTACLE_SLOW_SPEED)
+    OBSTACLE_MAX_AGE_FACTOR = 2.0  # a map is stale after this many times the p95 age maps reach before being replaced
+    OBSTACLE_MAX_AGE_LIMIT = 30.0  # seconds; an older map is always stale, however slow depth runs
+    OBSTACLE_INACTIVE_SPEED_LIMIT = 40  # percent speed limit while depth is off; 100 opts out of limiting motion without depth
+    
+    # Detection log (columnar, queried by /api/detections)
+    DETECTION_LOG_DIR = "detection_log"
+    DETECTION_LOG_SEGMENT_SECONDS = 3600  # time span of one segment
+    DETECTION_LOG_FLUSH_INTERVAL = 2.0  # seconds between batch writes
+    DETECTION_LOG_BATCH_SIZE = 4096  # pending rows that trigger an early write
+    DETECTION_LOG_RETENTION_DAYS = 14  # segments older than this are deleted
+    
+    # Adaptive quality control of the vision pipelines (see web-client/quality_controller.py)
+    QUALITY_MODE = "auto"  # "auto", or "manual" to hold QUALITY_MIN_LEVEL until changed
+    QUALITY_INTERVAL = 2.0  # seconds between control decisions
+    QUALITY_AI_TARGET_MS = 250.0  # target p95 end-to-end AI detection latency
+    QUALITY_AI_TARGET_FPS = 4.0  # AI frame rate to hold; its frame time also caps the latency target
+    QUALITY_DEPTH_TARGET_MS = 1000.0  # target p95 end-to-end depth latency
+    QUALITY_DEPTH_TARGET_FPS = 1.0  # depth frame rate to hold
+    QUALITY_CPU_HIGH = 0.85  # process CPU share of all cores that lowers quality
+    QUALITY_CPU_LOW = 0.6  # CPU share below which quality may rise
+    QUALITY_HEADROOM = 0.7  # fraction of the latency target to stay under before raising quality
+    QUALITY_DEGRADE_AFTER = 2  # consecutive over-budget decisions before lowering quality
+    QUALITY_IMPROVE_AFTER = 5  # consecutive good decisions before raising quality
+    QUALITY_COOLDOWN = 6.0  # seconds after a change before the next one
+    QUALITY_MIN_LEVEL = 0  # best quality level allowed (0 = original settings)
+    QUALITY_MAX_LEVEL = 4  # worst quality level allowed
+    QUALITY_HISTORY = 100  # level changes kept for /api/quality
+    
+    # Hardware sensors (sysfs) and the compute governor (see web-client/compute_governor.py)
+    SENSOR_ROOT = os.environ.get("NAUTILUS_SENSOR_ROOT", "/")  # sysfs is read below this root; a stand-in tree for tests
+    THERMAL_ZONE_TYPES = []  # thermal zone types read, e.g. ["cpu-thermal"]; empty uses the hottest zone
+    GOVERNOR_ENABLED = True  # act on the readings (when False they are only reported)
+    GOVERNOR_INTERVAL = 5.0  # seconds between governor readings
+    GOVERNOR_TEMP_HIGH = 70.0  # °C, enters the reduced tier
+    GOVERNOR_TEMP_CRITICAL = 80.0  # °C, enters the critical tier (Pi firmware throttles from 80 °C)
+    GOVERNOR_TEMP_HYSTERESIS = 5.0  # °C below a threshold before it counts as cleared
+    GOVERNOR_BATTERY_LOW = 30  # percent on battery, enters the reduced tier
+    GOVERNOR_BATTERY_CRITICAL = 15  # percent on battery, enters the critical tier
+    GOVERNOR_BATTERY_HYSTERESIS = 5  # percent above a threshold before it counts as cleared
+    GOVERNOR_RELAX_AFTER = 30.0  # seconds of clear readings before a lower tier
+    GOVERNOR_REDUCED_QUALITY = 2  # best quality level in the reduced tier
+    GOVERNOR_CRITICAL_QUALITY = 4  # best quality level in the critical tier
+    GOVERNOR_REDUCED_AI_FPS = 2.0  # most AI frames per second in the reduced tier
+    GOVERNOR_CRITICAL_AI_FPS = 1.0  # most AI frames per second in the critical tier
+    GOVERNOR_HISTORY = 50  # tier changes kept for /api/governor
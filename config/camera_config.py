@@ -18,9 +18,35 @@ class CameraConfig:
     # Depth processing settings
     DEPTH_MODEL = "depth-anything/Depth-Anything-V2-Small-hf"
     LOCAL_DEPTH_CHECKPOINT = "../checkpoints/depth_anything_v2_vitb.pth"
+    # Smaller encoder the compute governor switches to when hot or low on battery;
+    # without it the DEPTH_MODEL pipeline (Small) is tried
+    FALLBACK_DEPTH_CHECKPOINT = "../checkpoints/depth_anything_v2_vits.pth"
+    DEPTH_MODEL_CACHE_DIR = "../checkpoints/cache"  # Converted artifacts + manifest
+    DEPTH_MODEL_DTYPE = "fp32"  # "fp16" halves weight memory on CUDA devices
+    VERIFY_MODEL_CHECKSUMS = True  # Check artifact SHA-256 once per artifact file version (size, mtime)
+    DEPTH_PIPELINE_DIR = "../checkpoints/hf"  # Pre-staged HuggingFace pipeline models
+    DEPTH_MODEL_OFFLINE = True  # Never download models at startup
     DEPTH_COLORMAP = cv2.COLORMAP_PLASMA
     DEPTH_QUEUE_SIZE = 2
     DEPTH_PROCESS_INTERVAL = 0.1  # seconds
+    DEPTH_INPUT_SIZE = 518  # short side full depth frames run at (multiple of 14)
+    DEPTH_JPEG_QUALITY = 80  # depth frames sent to the browser
+    
+    # AI detection and browser upload settings. With the depth settings above
+    # they are quality level 0; the quality controller derives its lower levels from them.
+    AI_JPEG_QUALITY = 85  # annotated AI frames sent to the browser
+    YOLO_IMAGE_SIZE = 640  # YOLO inference size (multiple of 32)
+    UPLOAD_JPEG_QUALITY = 0.8  # JPEG quality the browser captures uploads at
+    
+    # Per-object depth ("objects" mode): depth only for the current AI detections
+    DEPTH_MODE = "full"  # "full" (colormapped depth frame) or "objects"
+    DEPTH_ROI_METHOD = "frame"  # "frame": one reduced full-frame pass, depths share a scale; "crops": per-box passes
+    DEPTH_ROI_PADDING = 0.15  # context around each box, as a fraction of its size
+    DEPTH_ROI_INPUT_SIZE = 252  # short side of crops / reduced frame fed to the model
+    DEPTH_ROI_MAX_AREA = 0.4  # "crops": crop area fraction above which one reduced full-frame pass is used
+    DEPTH_ROI_MAX_AGE = 0.5  # seconds; older detections are ignored
+    DEPTH_ROI_MAP_INPUT_SIZE = 112  # "crops": short side of the full-frame pass feeding the obstacle map
+    DEPTH_ROI_MAP_INTERVAL = 1.0  # "crops": seconds between obstacle map passes
     
     # Display settings
     WINDOW_TITLE = "Camera vs Depth Detection"
@@ -85,6 +111,10 @@ class PerformanceConfig:
     
     # Memory management
     CLEAR_CACHE_INTERVAL = 100  # Clear processing cache every N frames
+    
+    # Model warm-up (run during background model load)
+    WARMUP_ITERATIONS = 3  # Synthetic frames pushed through each model after loading
+    COMPILE_DEPTH_MODEL = False  # torch.compile the local depth model during warm-up
 
 
 class DebugConfig:
@@ -93,5 +123,9 @@ class DebugConfig:
     ENABLE_FPS_COUNTER = True
     ENABLE_DEPTH_INFO = False
     ENABLE_PERFORMANCE_METRICS = False
-    SAVE_DEBUG_FRAMES = False
-    DEBUG_OUTPUT_DIR = "debug_output" 
\ No newline at end of file
+    SAVE_DEBUG_FRAMES = False  # Start the recorder when the backend starts
+    DEBUG_OUTPUT_DIR = "debug_output"  # Recording directory
+    RECORD_SEGMENT_SECONDS = 60.0  # Time span of one segment file
+    RECORD_MAX_BYTES = 2 * 1024 ** 3  # Disk quota; oldest segments are deleted beyond it
+    RECORD_QUEUE_SIZE = 64  # Records buffered for the writer before new ones are dropped
+    RECORD_CAMERA_INTERVAL = 0.05  # Minimum seconds between recorded camera frames of one pipeline
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Session replay
+Drives web-client/backend.py from a recording made by utils/recorder.py:
+recorded camera frames are uploaded to the AI detection or depth endpoint
+they were originally sent to (frames recorded without a source go to both)
+in place of the browser, GPS fixes are fed through the "replay" GPS source in
+place of the receiver, and control commands are re-issued to their endpoints
+with a silent servo. Writes throughput, endpoint latency, per-stage timings
+and detection agreement with the recording to a JSON report.
+
+Speeds:
+    1 (default)  original timing; uploads are closed-loop like the browser,
+                 so frames arriving while a request is in flight are skipped
+    N            N times faster than recorded
+    max          every record in order, each frame waited on (including the
+                 depth worker), as fast as the pipeline allows; deterministic
+
+Usage:
+    python replay_session.py web-client/debug_output
+    python replay_session.py web-client/debug_output --speed 4 --services ai
+    python replay_session.py web-client/debug_output --speed max --baseline replay_baseline.json
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_CLIENT_DIR = os.path.join(ROOT_DIR, 'web-client')
+
+FRAME_ENDPOINTS = {
+    'ai': ('ai_frame', "/api/ai-detection/process-frame", "/api/ai-detection/toggle", "ai_detection_enabled"),
+    'depth': ('depth_frame', "/api/depth-camera/process-frame", "/api/depth-camera/toggle", "depth_camera_enabled"),
+}
+
+# Recorded camera frame source (utils.recorder.CAMERA_SOURCES) -> FRAME_ENDPOINTS key
+FRAME_SOURCES = {'ai_detection': 'ai', 'depth_camera': 'depth'}
+
+
+def build_argparser():
+    parser = argparse.ArgumentParser(description="Replay a recorded session through the Nautilus backend")
+    parser.add_argument('recording', help="Recording directory (contains index.json)")
+    parser.add_argument('--speed', default='1',
+                        help="Replay speed multiplier, or 'max' for as fast as possible (default 1)")
+    parser.add_argument('--start', type=float, default=0.0, help="Seconds into the recording to start at")
+    parser.add_argument('--end', type=float, default=None, help="Seconds into the recording to stop at")
+    parser.add_argument('--services', nargs='*', choices=tuple(FRAME_ENDPOINTS), default=None,
+                        help="Vision services to enable (default: those with records in the recording)")
+    parser.add_argument('--port', type=int, default=8766, help="Port of the in-process backend (default 8766)")
+    parser.add_argument('--depth-timeout', type=float, default=30.0,
+                        help="Seconds to wait for one depth frame at max speed (default 30)")
+    parser.add_argument('-o', '--output', default='replay_report.json', help="JSON report path")
+    parser.add_argument('--baseline', default=None, help="Baseline report to compare throughput against")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="Allowed relative drop in fps or growth in p95 latency (default 0.10)")
+    return parser
+
+
+class ReplayServo:
+    """Stands in for the servo and counts the angles commanded."""
+
+    def __init__(self):
+        self._angle = 0
+        self.moves = 0
+
+    @property
+    def angle(self):
+        return self._angle
+
+    @angle.setter
+    def angle(self, value):
+        self._angle = value
+        self.moves += 1
+
+
+def recorded_services(reader):
+    """Vision services that were running while the session was recorded."""
+    totals = Counter()
+    for segment in reader.segments:
+        totals.update(segment['records'])
+    services = []
+    if totals['detections']:
+        services.append('ai')
+    if totals['depth']:
+        services.append('depth')
+    return services
+
+
+def load_expected_detections(reader, start, end):
+    """Recorded detection classes per AI frame, keyed by frame time."""
+    from utils.recorder import DETECTIONS
+    return {timestamp: sorted(d.get('class_name', str(d.get('class_id'))) for d in detections)
+            for timestamp, _, detections in reader.records(start, end, streams=(DETECTIONS,))}
+
+
+async def set_services(client, services):
+    """Enable exactly the requested vision services; model loads happen here."""
+    status = (await client.get("/api/status")).json()
+    for name, (_, _, toggle_path, enabled_key) in FRAME_ENDPOINTS.items():
+        if bool(status.get(enabled_key)) != (name in services):
+            response = await client.post(toggle_path)
+            if response.status_code != 200:
+                raise SystemExit(f"✗ {toggle_path} failed: {response.text}")
+
+
+async def replay(client, backend, reader, args, services, start, end, expected):
+    """
+    Feed the recording into the backend.
+
+    Returns:
+        dict: Latency samples and errors per endpoint, record counters,
+            detection agreement and wall time
+    """
+    from utils.recorder import CAMERA, GPS, COMMAND, split_camera_payload
+
+    speed = None if args.speed == 'max' else float(args.speed)
+    loop = asyncio.get_running_loop()
+    gps_source = backend.gps_reader.source
+    frame_endpoints = {name: FRAME_ENDPOINTS[name][:2] for name in services}
+    samples = {}
+    errors = Counter()
+    skipped = Counter()
+    commands = Counter()
+    agreement = Counter()
+    in_flight = set()
+    pending = set()
+    counts = {'camera': 0, 'gps': 0}
+
+    async def send(name, path, body, recorded_at=None):
+        sent = time.perf_counter()
+        try:
+            response = await client.post(path, json=body)
+        except Exception:
+            errors[name] += 1
+            return
+        if response.status_code != 200:
+            errors[name] += 1
+            return
+        samples.setdefault(name, []).append((time.perf_counter() - sent) * 1000.0)
+        if name == 'ai_frame' and recorded_at in expected:
+            classes = sorted(d['class_name'] for d in response.json().get('detections', []))
+            agreement['compared'] += 1
+            agreement['matched'] += classes == expected[recorded_at]
+
+    async def upload(name, path, body, recorded_at):
+        in_flight.add(name)
+        try:
+            await send(name, path, body, recorded_at)
+        finally:
+            in_flight.discard(name)
+
+    def spawn(coroutine):
+        task = asyncio.create_task(coroutine)
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    async def wait_for_depth():
+        service = backend.services.get("depth_camera")
+        deadline = time.perf_counter() + args.depth_timeout
+        while (service.frames_processed + service.frames_dropped < service.frames_received
+               and time.perf_counter() < deadline):
+            await asyncio.sleep(0.002)
+
+    first = None
+    wall_start = time.perf_counter()
+    for timestamp, stream, payload in reader.records(start, end, streams=(CAMERA, GPS, COMMAND), decode=False):
+        if first is None:
+            first = timestamp
+        if speed:
+            delay = wall_start + (timestamp - first) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        if stream == GPS:
+            counts['gps'] += 1
+            gps_source.push(json.loads(payload))
+            if speed is None:
+                await loop.run_in_executor(None, gps_source.join)
+        elif stream == COMMAND:
+            command = json.loads(payload)
+            commands[command['path']] += 1
+            if speed is None:
+                await send(command['path'], command['path'], command['body'])
+            else:
+                # Open-loop like the joystick: commands never wait for each other
+                spawn(send(command['path'], command['path'], command['body']))
+        else:
+            counts['camera'] += 1
+            source, jpeg = split_camera_payload(payload)
+            # Each frame goes only where the browser sent it
+            targets = [frame_endpoints[name] for name in frame_endpoints
+                       if source is None or FRAME_SOURCES.get(source) == name]
+            if not targets:
+                continue
+            body = {"frame": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode('ascii')}
+            if speed is None:
+                await asyncio.gather(*(send(name, path, body, timestamp) for name, path in targets))
+                if any(name == 'depth_frame' for name, _ in targets):
+                    await wait_for_depth()
+                continue
+            for name, path in targets:
+                if name in in_flight:
+                    skipped[name] += 1
+                else:
+                    spawn(upload(name, path, body, timestamp))
+    if pending:
+        await asyncio.gather(*pending)
+    if speed is None and 'depth' in frame_endpoints:
+        await wait_for_depth()
+
+    return {
+        'wall_seconds': time.perf_counter() - wall_start,
+        'recorded_seconds': (timestamp - first) if first is not None else 0.0,
+        'samples': samples,
+        'errors': errors,
+        'skipped': skipped,
+        'commands': commands,
+        'agreement': agreement,
+        'counts': counts
+    }
+
+
+def service_counters(backend, name):
+    service = backend.services.get(name)
+    if service is None:
+        return None
+    return {'received': service.frames_received, 'processed': service.frames_processed,
+            'dropped': service.frames_dropped}
+
+
+async def run_replay(args, backend, reader, services, start, end, expected):
+    import httpx
+    from benchmark_control import percentiles
+
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60.0) as client:
+        print(f"Enabling services: {', '.join(services) or 'none'}")
+        await set_services(client, services)
+        print(f"Replaying at speed {args.speed}...")
+        result = await replay(client, backend, reader, args, services, start, end, expected)
+        stages = (await client.get("/api/metrics/latency")).json()
+        stalls = (await client.get("/api/metrics/loop-stalls", params={"limit": 5})).json()
+        counters = {name: service_counters(backend, name) for name in ("ai_detection", "depth_camera")}
+        await set_services(client, [])
+
+    wall = result['wall_seconds']
+    endpoints = {name: percentiles(result['samples'].get(name, []), result['errors'][name], wall)
+                 for name in set(result['samples']) | set(result['errors'])}
+    for name, _, _, _ in FRAME_ENDPOINTS.values():
+        if name in endpoints:
+            endpoints[name]['skipped'] = result['skipped'][name]
+    throughput = {f"{name}_fps": round(counter['processed'] / wall, 2) if wall > 0 else 0.0
+                  for name, counter in counters.items() if counter}
+    agreement = result['agreement']
+    return {
+        'replay': {
+            'recorded_seconds': round(result['recorded_seconds'], 3),
+            'wall_seconds': round(wall, 3),
+            'achieved_speed': round(result['recorded_seconds'] / wall, 2) if wall > 0 else None,
+            'camera_frames': result['counts']['camera'],
+            'gps_fixes': result['counts']['gps'],
+            'commands': dict(result['commands'])
+        },
+        'throughput': throughput,
+        'services': counters,
+        'endpoints': endpoints,
+        'stages': {key: stages.get(key) for key in ('ai_detection', 'depth_camera')},
+        'detections': {
+            'compared': agreement['compared'],
+            'matched': agreement['matched'],
+            'match_rate': round(agreement['matched'] / agreement['compared'], 3) if agreement['compared'] else None
+        },
+        'servo_moves': backend.servo.moves,
+        'loop_stalls': {'stall_count': stalls.get('stall_count'), 'max_lag_ms': stalls.get('max_lag_ms'),
+                        'recent': [{'lag_ms': s['lag_ms'], 'handler': s['handler']} for s in stalls.get('stalls', [])]}
+    }
+
+
+def compare(report, baseline, threshold):
+    """List throughput drops and p95 latency growth beyond `threshold`."""
+    regressions = []
+    for key, base_fps in baseline.get('throughput', {}).items():
+        fps = report['throughput'].get(key)
+        if base_fps and fps is not None and fps < base_fps * (1 - threshold):
+            regressions.append(f"{key} {fps} < baseline {base_fps}")
+    for name, base in baseline.get('endpoints', {}).items():
+        current = report['endpoints'].get(name, {})
+        if base.get('p95') and current.get('p95') is not None and current['p95'] > base['p95'] * (1 + threshold):
+            regressions.append(f"{name} p95 {current['p95']} ms > baseline {base['p95']} ms")
+    return regressions
+
+
+def main(argv=None):
+    args = build_argparser().parse_args(argv)
+    if args.speed != 'max':
+        try:
+            if float(args.speed) <= 0:
+                raise ValueError
+        except ValueError:
+            raise SystemExit("✗ --speed must be a positive number or 'max'")
+    recording_dir = os.path.abspath(args.recording)
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    # GPS fixes come from the recording; models resolve relative to web-client/
+    os.environ["NAUTILUS_GPS_SOURCE"] = "replay"
+    os.chdir(WEB_CLIENT_DIR)
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, WEB_CLIENT_DIR)
+
+    from utils.recorder import RecordingReader
+    from config.backend_config import BackendConfig
+    from config.camera_config import DebugConfig
+
+    try:
+        reader = RecordingReader(recording_dir)
+    except (OSError, ValueError, KeyError) as e:
+        raise SystemExit(f"✗ Cannot read recording {recording_dir}: {e}")
+    if not reader.segments:
+        raise SystemExit(f"✗ Recording {recording_dir} has no segments")
+    start = reader.start + args.start
+    end = reader.start + args.end if args.end is not None else None
+    services = args.services if args.services is not None else recorded_services(reader)
+    expected = load_expected_detections(reader, start, end) if 'ai' in services else {}
+    print(f"✓ Recording {recording_dir}: {len(reader.segments)} segments, "
+          f"{reader.end - reader.start:.1f} s, {len(expected)} frames with recorded detections")
+
+    # Never record the replay into a recording, and keep replayed detections
+    # out of the robot's detection history
+    DebugConfig.SAVE_DEBUG_FRAMES = False
+    BackendConfig.PRELOAD_MODELS = False
+    BackendConfig.MODEL_LOAD_WAIT_TIMEOUT = 600.0
+    BackendConfig.DETECTION_LOG_DIR = tempfile.mkdtemp(prefix="replay-detections-")
+    # Replay at the original quality and workload so detections are comparable to the recording
+    BackendConfig.QUALITY_MODE = "manual"
+    BackendConfig.QUALITY_MIN_LEVEL = 0
+    BackendConfig.GOVERNOR_ENABLED = False
+
+    import backend
+    from benchmark_control import start_server
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    backend.servo = ReplayServo()
+
+    server, thread = start_server(backend.app, args.port)
+    print(f"✓ Backend running on port {args.port}")
+    try:
+        results = asyncio.run(run_replay(args, backend, reader, services, start, end, expected))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': {'machine': platform.machine(), 'python': platform.python_version(),
+                     'system': platform.system()},
+        'config': {'recording': recording_dir, 'speed': args.speed, 'start': args.start, 'end': args.end,
+                   'services': services},
+        **results
+    }
+    with open(output_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report['replay']
+    print(f"\n✓ Replayed {summary['recorded_seconds']} s in {summary['wall_seconds']} s "
+          f"({summary['achieved_speed']}x): {summary['camera_frames']} frames, "
+          f"{summary['gps_fixes']} GPS fixes, {sum(summary['commands'].values())} commands")
+    for name, result in report['endpoints'].items():
+        if result['count']:
+            print(f"  {name:<36} {result['count']:>6} ok {result['errors']:>4} err "
+                  f"{result.get('skipped', 0):>5} skipped | p50 {result['p50']} ms | p95 {result['p95']} ms")
+    for key, fps in report['throughput'].items():
+        print(f"  {key:<36} {fps}")
+    detections = report['detections']
+    if detections['compared']:
+        print(f"  detections matching the recording: {detections['matched']}/{detections['compared']}")
+    print(f"\n✓ Report written to {output_path}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if baseline.get('config', {}).get('speed') != args.speed:
+            print(f"⚠️ Baseline was replayed at speed {baseline.get('config', {}).get('speed')}")
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\n🎉 No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,7 +12,8 @@ import os
 sys.path.append('web-client')
 
 try:
-    from ai_detection_service import ai_detection_service
+    from ai_detection_service import get_ai_detection_service
+    ai_detection_service = get_ai_detection_service()
     print("✓ AI Detection service imported successfully")
 except ImportError as e:
     print(f"✗ Failed to import AI Detection service: {e}")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the sysfs sensor readers and the compute governor
+Sensors read a stand-in sysfs tree; the governor is fed readings directly
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from compute_governor import ComputeGovernor
+from quality_controller import QualityController
+from utils.system_sensors import PowerSupplySensor, ThermalSensor, write_sensor_standin
+
+
+def reading(time, temperature=None, battery=None, on_battery=False):
+    return {'time': time, 'temperature': temperature, 'battery': battery, 'on_battery': on_battery}
+
+
+@pytest.fixture
+def services():
+    return {
+        'ai_detection': SimpleNamespace(min_interval=0.0, jpeg_quality=None, image_size=None),
+        'depth_camera': SimpleNamespace(paused=False, jpeg_quality=None, process_interval=None,
+                                        depth_processor=None, using_fallback=False, fallback_error=None)
+    }
+
+
+@pytest.fixture
+def governor(tmp_path, services):
+    quality = QualityController(services.get)
+    return ComputeGovernor(ThermalSensor(str(tmp_path)), PowerSupplySensor(str(tmp_path)), quality,
+                           services.get, relax_after=30.0)
+
+
+def test_sensors_read_the_standin_tree(tmp_path):
+    root = str(tmp_path)
+    write_sensor_standin(root, temperature=71.234, battery=42, external_power=False,
+                         cpu_freq_mhz=1200, cpu_max_freq_mhz=1800)
+    thermal = ThermalSensor(root).read()
+    assert thermal['temperature'] == 71.2
+    assert thermal['zones'] == [{'zone': 'thermal_zone0', 'type': 'cpu-thermal', 'temperature': 71.2}]
+    assert (thermal['cpu_freq_mhz'], thermal['cpu_freq_ratio']) == (1200, 0.667)
+    assert PowerSupplySensor(root).read() == {'battery': 42, 'battery_status': 'Discharging',
+                                              'external_power': False, 'on_battery': True}
+    assert ThermalSensor(root, zone_types=['gpu-thermal']).read()['temperature'] is None
+
+
+def test_sensors_without_sysfs_report_nothing(tmp_path):
+    assert ThermalSensor(str(tmp_path)).read()['temperature'] is None
+    assert PowerSupplySensor(str(tmp_path)).read()['on_battery'] is None
+
+
+def test_governor_reads_both_sensors(governor, tmp_path):
+    write_sensor_standin(str(tmp_path), temperature=82.0, battery=90, battery_status='Charging')
+    assert governor.tick() == 2
+    assert governor.reading['temperature'] == 82.0 and governor.reading['on_battery'] is False
+
+
+def test_restricted_tiers_apply_their_actions(governor, services):
+    assert governor.tick(reading(0.0, temperature=72.0)) == 1
+    assert services['ai_detection'].min_interval == 0.5
+    assert not services['depth_camera'].paused
+    assert governor.quality.effective_level == 2
+
+    assert governor.tick(reading(1.0, temperature=60.0, battery=10, on_battery=True)) == 2
+    assert governor.reasons == ["battery 10% <= 15%"]
+    assert services['ai_detection'].min_interval == 1.0
+    assert services['depth_camera'].paused
+    assert governor.quality.effective_level == 4
+
+
+def test_battery_only_counts_while_discharging(governor):
+    assert governor.tick(reading(0.0, battery=10, on_battery=False)) == 0
+
+
+def test_lower_tier_waits_for_hysteresis_and_relax_time(governor, services):
+    governor.tick(reading(0.0, temperature=81.0))
+    # Below the threshold but inside the hysteresis margin: held
+    assert governor.tick(reading(10.0, temperature=77.0)) == 2
+    assert governor.tick(reading(100.0, temperature=77.0)) == 2
+    # Clear of the margin: relaxes one tier only after relax_after seconds
+    assert governor.tick(reading(110.0, temperature=70.0)) == 2
+    assert governor.get_status()['relax_at'] == 140.0
+    assert governor.tick(reading(139.0, temperature=70.0)) == 2
+    assert governor.tick(reading(140.0, temperature=70.0)) == 1
+    # A reading that calls for the tier again restarts the wait
+    governor.tick(reading(150.0, temperature=60.0))
+    governor.tick(reading(160.0, temperature=71.0))
+    assert governor.tick(reading(185.0, temperature=60.0)) == 1
+    assert governor.tick(reading(215.0, temperature=60.0)) == 0
+    assert services['ai_detection'].min_interval == 0.0
+    assert governor.quality.effective_level == 0
+    assert [(change['from'], change['to']) for change in governor.get_status()['changes']] == [
+        ('reduced', 'normal'), ('critical', 'reduced'), ('normal', 'critical')]
+
+
+def test_disabled_governor_only_reads(governor, services):
+    governor.enabled = False
+    assert governor.tick(reading(0.0, temperature=90.0)) == 2
+    assert not services['depth_camera'].paused
+    assert governor.quality.effective_level == 0
+    assert governor.get_status()['actions']['quality_limit'] is None
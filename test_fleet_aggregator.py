@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for the fleet aggregator
+Covers local robots, dashboard subscription and viewport changes
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from fastapi import WebSocketDisconnect
+
+from fleet_aggregator import FleetAggregator, telemetry_url
+from robot_state import RobotStateStore
+
+
+class FakeDashboard:
+    """WebSocket stand-in fed with client messages; records what it is sent."""
+
+    def __init__(self, on_send=None):
+        self.messages = []
+        self.on_send = on_send
+        self.incoming = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        self.messages.append(message)
+        if self.on_send is not None:
+            await self.on_send(message)
+
+    async def receive_text(self):
+        text = await self.incoming.get()
+        if text is None:
+            raise WebSocketDisconnect()
+        return text
+
+    def robots(self):
+        """Packed robot fields rebuilt from the snapshots and deltas received."""
+        robots = {}
+        for message in self.messages:
+            if message["t"] == "s":
+                robots = {}
+            for robot_id in message.get("x", []):
+                robots.pop(robot_id, None)
+            for robot_id, fields in message["r"].items():
+                robots.setdefault(robot_id, {}).update(fields)
+        return robots
+
+
+def make_fleet():
+    fleet = FleetAggregator(max_rate=100)
+    fleet._add_robot("NAUT-002", "Nautilus Mk2", "10.0.0.2")
+    fleet._add_robot("NAUT-003", "Nautilus Mk2", "10.0.0.3")
+    fleet.update_robot("NAUT-002", status="online", lat=3.1209, lng=101.6559, battery=80.0)
+    fleet.update_robot("NAUT-003", status="online", lat=3.2000, lng=101.7000, battery=60.0)
+    return fleet
+
+
+def test_telemetry_url():
+    assert telemetry_url("http://192.168.1.101:8000") == "ws://192.168.1.101:8000/ws/telemetry"
+    assert telemetry_url("https://fleet.example/robot/") == "wss://fleet.example/robot/ws/telemetry"
+
+
+def test_local_robot_follows_its_state_store():
+    async def scenario():
+        store = RobotStateStore()
+        fleet = FleetAggregator()
+        fleet.add_local("NAUT-001", "Nautilus Mk1", store)
+        await fleet.start()
+        store.update(posY=3.5, posX=101.5, battery=42, is_moving=True)
+        await fleet.stop()
+        return fleet
+
+    record = asyncio.run(scenario()).get_robot("NAUT-001")
+    assert (record["status"], record["lat"], record["lng"]) == ("online", 3.5, 101.5)
+    assert (record["battery"], record["is_moving"], record["ip"]) == (42, True, "local")
+
+
+def test_changes_during_the_snapshot_reach_the_new_dashboard():
+    async def scenario():
+        fleet = make_fleet()
+        await fleet.start()
+
+        async def move_robot_mid_send(message):
+            if message["t"] == "s":
+                fleet.update_robot("NAUT-002", lat=3.1300, battery=75.0)
+                # Let the broadcaster run while the snapshot is in flight
+                await asyncio.sleep(0.05)
+
+        dashboard = FakeDashboard(on_send=move_robot_mid_send)
+        task = asyncio.create_task(fleet.handle_client(dashboard))
+        await asyncio.sleep(0.2)
+        assert dashboard in fleet.clients
+        await dashboard.incoming.put(None)
+        await task
+        await fleet.stop()
+        return fleet, dashboard
+
+    fleet, dashboard = asyncio.run(scenario())
+    assert dashboard.robots() == fleet.snapshot()["r"]
+    assert dashboard not in fleet.clients
+
+
+def test_viewport_change_sends_a_snapshot_of_the_robots_in_view():
+    async def scenario():
+        fleet = make_fleet()
+        await fleet.start()
+        dashboard = FakeDashboard()
+        task = asyncio.create_task(fleet.handle_client(dashboard))
+        await asyncio.sleep(0.05)
+        await dashboard.incoming.put(json.dumps({"bbox": [3.19, 101.69, 3.21, 101.71]}))
+        await dashboard.incoming.put("not json")
+        await asyncio.sleep(0.05)
+        bbox = fleet.clients.get(dashboard)
+
+        # Changed robots outside the view, including one that just left it, are listed for removal
+        fleet.update_robot("NAUT-002", battery=10.0)
+        fleet.update_robot("NAUT-003", lat=3.3000)
+        await asyncio.sleep(0.1)
+        await dashboard.incoming.put(None)
+        await task
+        await fleet.stop()
+        return bbox, dashboard
+
+    bbox, dashboard = asyncio.run(scenario())
+    assert bbox == (3.19, 101.69, 3.21, 101.71)
+    snapshots = [message for message in dashboard.messages if message["t"] == "s"]
+    assert [set(snapshot["r"]) for snapshot in snapshots] == [{"NAUT-002", "NAUT-003"}, {"NAUT-003"}]
+    assert dashboard.messages[-1]["r"] == {}
+    assert sorted(dashboard.messages[-1]["x"]) == ["NAUT-002", "NAUT-003"]
+    assert dashboard.robots() == {}
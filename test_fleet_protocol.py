@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Tests for the fleet wire protocol
+Snapshots and deltas are decoded the way fleet.js does and must rebuild the
+aggregator's fleet at wire resolution
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from fleet_aggregator import FleetAggregator
+from fleet_protocol import FIELD_CODES, STATUS_CODES, DeltaCache, FleetCodec, encode
+
+FIELD_NAMES = {code: name for name, code in FIELD_CODES.items()}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+
+def decode_fields(fields, params):
+    """Decode wire fields into fleet record values (mirrors decodeRobot in fleet.js)."""
+    record = {}
+    for code, value in fields.items():
+        if code in ('a', 'o') and value is not None:
+            value = value / params['coord_scale']
+        elif code == 's':
+            value = STATUS_NAMES.get(value, 'offline')
+        elif code == 'v':
+            value = bool(value)
+        record[FIELD_NAMES[code]] = value
+    return record
+
+
+class Dashboard:
+    """Fleet client state built only from encoded messages."""
+
+    def __init__(self):
+        self.robots = {}
+        self.version = None
+        self.params = None
+
+    def apply(self, encoded):
+        message = json.loads(encoded)
+        if message['t'] == 's':
+            self.params = message['q']
+            self.robots = {}
+        for robot_id in message.get('x', []):
+            self.robots.pop(robot_id, None)
+        for robot_id, fields in message['r'].items():
+            self.robots.setdefault(robot_id, {}).update(decode_fields(fields, self.params))
+        self.version = message['v']
+
+
+def make_fleet():
+    fleet = FleetAggregator()
+    fleet._add_robot('NAUT-001', 'Nautilus Mk1', '10.0.0.1')
+    fleet._add_robot('NAUT-002', 'Nautilus Mk2', '10.0.0.2')
+    fleet.update_robot('NAUT-001', status='online', lat=52.52, lng=13.405, heading=90.0, battery=81.0)
+    fleet.update_robot('NAUT-002', status='online', lat=52.53, lng=13.41, heading=180.0, battery=64.0)
+    return fleet
+
+
+def expected_robots(fleet, bbox=None):
+    """Decode the aggregator's own snapshot, the reference every client must reach."""
+    snapshot = fleet.snapshot(bbox)
+    return {robot_id: decode_fields(fields, snapshot['q']) for robot_id, fields in snapshot['r'].items()}
+
+
+def test_codec_quantizes_to_wire_resolution():
+    codec = FleetCodec(coord_scale=100000, battery_step=5)
+    packed = codec.pack({'lat': 52.520008, 'lng': -13.4049954, 'battery': 81.4, 'heading': 89.6,
+                         'is_moving': True, 'status': 'online', 'last_update': 123.0})
+    assert packed == {'a': 5252001, 'o': -1340500, 'b': 80, 'h': 90, 'v': 1, 's': 1}
+    decoded = decode_fields(packed, codec.params())
+    assert abs(decoded['lat'] - 52.520008) <= 0.5 / 100000
+    assert abs(decoded['lng'] + 13.4049954) <= 0.5 / 100000
+    assert decoded['status'] == 'online' and decoded['is_moving'] is True
+
+
+def test_unknown_status_and_missing_values():
+    packed = FleetCodec().pack({'status': 'rebooting', 'lat': None, 'battery': None})
+    assert packed == {'s': STATUS_CODES['offline'], 'a': None, 'b': None}
+
+
+def test_changes_below_wire_resolution_produce_no_delta():
+    fleet = make_fleet()
+    version = fleet.version
+    assert not fleet.update_robot('NAUT-001', lat=52.520001, battery=81.2)
+    assert fleet.version == version
+    assert fleet.changes_since(version)['r'] == {}
+
+
+def test_delta_carries_only_changed_fields():
+    fleet = make_fleet()
+    version = fleet.version
+    fleet.update_robot('NAUT-002', battery=60.0)
+    changes = fleet.changes_since(version)
+    assert changes['f'] == version and changes['v'] == fleet.version
+    assert changes['r'] == {'NAUT-002': {'b': 60}}
+
+
+def test_snapshot_plus_deltas_round_trip():
+    fleet = make_fleet()
+    dashboard = Dashboard()
+    dashboard.apply(encode(fleet.snapshot()))
+
+    steps = [
+        ('NAUT-001', {'lat': 52.5205, 'lng': 13.4055, 'heading': 95.0}),
+        ('NAUT-002', {'battery': 63.0, 'is_moving': True}),
+        ('NAUT-001', {'status': 'offline'}),
+        ('NAUT-002', {'lat': 52.531, 'gps_status': 'active', 'temperature': 41.7}),
+    ]
+    for robot_id, fields in steps:
+        version = dashboard.version
+        fleet.update_robot(robot_id, **fields)
+        dashboard.apply(fleet.encoded_changes(version))
+        assert dashboard.version == fleet.version
+        assert dashboard.robots == expected_robots(fleet)
+
+
+def test_coalesced_delta_from_an_older_version():
+    fleet = make_fleet()
+    dashboard = Dashboard()
+    dashboard.apply(encode(fleet.snapshot()))
+    fleet.update_robot('NAUT-001', battery=70.0)
+    fleet.update_robot('NAUT-001', battery=69.0, heading=10.0)
+    fleet.update_robot('NAUT-002', is_moving=True)
+    dashboard.apply(fleet.encoded_changes(dashboard.version))
+    assert dashboard.robots == expected_robots(fleet)
+
+
+def test_unknown_versions_get_a_snapshot():
+    fleet = make_fleet()
+    for version in (None, 0, fleet.version + 10):
+        assert json.loads(fleet.encoded_changes(version))['t'] == 's'
+
+
+def test_viewport_deltas_add_and_remove_robots():
+    fleet = make_fleet()
+    bbox = (52.515, 13.40, 52.525, 13.407)  # around NAUT-001 only
+    dashboard = Dashboard()
+    dashboard.apply(encode(fleet.snapshot(bbox)))
+    assert set(dashboard.robots) == {'NAUT-001'}
+
+    # NAUT-002 drives into view: its full record arrives, not just the position
+    version = dashboard.version
+    fleet.update_robot('NAUT-002', lat=52.521, lng=13.406)
+    dashboard.apply(fleet.encoded_changes(version, bbox))
+    assert dashboard.robots == expected_robots(fleet, bbox)
+    assert dashboard.robots['NAUT-002']['model'] == 'Nautilus Mk2'
+
+    # NAUT-001 leaves the view and is removed
+    version = dashboard.version
+    fleet.update_robot('NAUT-001', lat=52.60)
+    dashboard.apply(fleet.encoded_changes(version, bbox))
+    assert set(dashboard.robots) == {'NAUT-002'}
+    assert dashboard.robots == expected_robots(fleet, bbox)
+
+
+def test_encoded_deltas_are_cached_per_version_and_viewport():
+    fleet = make_fleet()
+    version = fleet.version
+    fleet.update_robot('NAUT-001', battery=50.0)
+    first = fleet.encoded_changes(version)
+    encoded = fleet.messages_encoded
+    assert fleet.encoded_changes(version) == first
+    assert fleet.messages_encoded == encoded
+    fleet.encoded_changes(version, (0.0, 0.0, 1.0, 1.0))
+    assert fleet.messages_encoded == encoded + 1
+
+
+def test_delta_cache_evicts_least_recently_used():
+    cache = DeltaCache(max_entries=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_encode_is_compact_json():
+    message = {'t': 'd', 'f': 1, 'v': 2, 'r': {'NAUT-001': {'b': 50}}}
+    assert encode(message) == '{"t":"d","f":1,"v":2,"r":{"NAUT-001":{"b":50}}}'
+    assert json.loads(encode(message)) == message
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for GPS parsing
+Covers NMEA sentences, gpsd TPV/SKY reports, fix mode inference for NMEA
+logs and the fix status the reader publishes
+"""
+
+from functools import reduce
+
+import pytest
+
+from utils.gps_reader import GPSReader, NMEAFileSource, ReplaySource, parse_gpsd_report, parse_nmea_sentence
+
+
+def nmea(body):
+    """Wrap a sentence body with '$' and its checksum."""
+    return f"${body}*{reduce(lambda value, char: value ^ ord(char), body, 0):02X}"
+
+
+GGA = nmea("GPGGA,123519,4807.038,N,01131.000,W,1,08,0.9,545.4,M,46.9,M,,")
+GGA_NO_FIX = nmea("GPGGA,123520,,,,,0,00,,,M,,M,,")
+RMC = nmea("GNRMC,123519,A,4807.038,S,01131.000,E,022.4,084.4,230394,003.1,W")
+RMC_VOID = nmea("GPRMC,123520,V,,,,,,,230394,,")
+GSA_2D = nmea("GPGSA,A,2,04,05,09,,,,,,,,,,2.5,1.3,2.1")
+GSV = nmea("GPGSV,3,1,11,03,03,111,00,04,15,270,00,06,01,010,00,13,06,292,00")
+
+
+def test_gga_position_fix_quality_and_precision():
+    update = parse_nmea_sentence(GGA)
+    assert update['lat'] == pytest.approx(48.1173)
+    assert update['lon'] == pytest.approx(-11.516667)
+    assert update['alt'] == 545.4
+    assert update['fix_quality'] == 1
+    assert update['satellites_used'] == 8
+    assert update['hdop'] == 0.9
+    assert update['nmea_time'] == 12 * 3600 + 35 * 60 + 19
+    assert 'mode' not in update
+
+
+def test_gga_without_fix_has_no_position():
+    update = parse_nmea_sentence(GGA_NO_FIX)
+    assert update['fix_quality'] == 0
+    assert 'lat' not in update
+
+
+def test_rmc_position_speed_and_validity():
+    update = parse_nmea_sentence(RMC)
+    assert update['fix_valid'] is True
+    assert update['lat'] == pytest.approx(-48.1173)
+    assert update['speed'] == pytest.approx(22.4 * 0.514444)
+    assert update['track'] == 84.4
+    void = parse_nmea_sentence(RMC_VOID)
+    assert void['fix_valid'] is False
+    assert 'lat' not in void
+
+
+def test_gsa_and_gsv():
+    assert parse_nmea_sentence(GSA_2D) == {'mode': 2, 'hdop': 1.3}
+    assert parse_nmea_sentence(GSV) == {'satellites_visible': 11}
+
+
+def test_invalid_sentences_are_rejected():
+    assert parse_nmea_sentence(GGA[:-2] + "00") is None  # bad checksum
+    assert parse_nmea_sentence("GPGGA,123519") is None  # no '$'
+    assert parse_nmea_sentence(nmea("GPVTG,054.7,T,034.4,M,005.5,N,010.2,K")) is None  # unsupported
+    assert parse_nmea_sentence(nmea("GPGGA,123519,4807.038,N,01131.000,E,x,08,0.9,545.4,M,,M,,")) is None
+
+
+def test_tpv_report():
+    update = parse_gpsd_report({'class': 'TPV', 'mode': 3, 'lat': 1.5, 'lon': 2.5, 'altMSL': 12.0, 'alt': 40.0,
+                                'speed': 0.4, 'track': 270.0, 'time': '2024-01-01T00:00:00.000Z'})
+    assert update == {'mode': 3, 'lat': 1.5, 'lon': 2.5, 'alt': 12.0, 'speed': 0.4, 'track': 270.0,
+                      'time': '2024-01-01T00:00:00.000Z'}
+    assert parse_gpsd_report({'class': 'TPV'}) == {'mode': 0}
+
+
+def test_sky_report():
+    satellites = [{'PRN': 1, 'used': True}, {'PRN': 2, 'used': False}, {'PRN': 3, 'used': True}]
+    assert parse_gpsd_report({'class': 'SKY', 'hdop': 1.1, 'satellites': satellites}) == {
+        'hdop': 1.1, 'satellites_visible': 3, 'satellites_used': 2}
+    assert parse_gpsd_report({'class': 'SKY', 'uSat': 7, 'nSat': 12}) == {
+        'satellites_used': 7, 'satellites_visible': 12}
+    assert parse_gpsd_report({'class': 'VERSION'}) is None
+
+
+def read_log(tmp_path, *sentences):
+    path = tmp_path / "log.nmea"
+    path.write_text("\n".join(sentences) + "\n")
+    return list(NMEAFileSource(str(path), speed=1000, loop=False).updates(lambda: True))
+
+
+def test_nmea_log_without_gsa_infers_the_mode(tmp_path):
+    updates = read_log(tmp_path, RMC_VOID, RMC, GGA, RMC, GGA_NO_FIX)
+    assert [update['mode'] for update in updates] == [1, 2, 3, 3, 1]
+    assert not any('fix_quality' in update or 'fix_valid' in update for update in updates)
+
+
+def test_nmea_log_with_gsa_uses_its_mode(tmp_path):
+    updates = read_log(tmp_path, GSA_2D, GGA, RMC)
+    assert updates[0]['mode'] == 2
+    assert 'mode' not in updates[1] and 'mode' not in updates[2]
+
+
+def apply_all(*updates):
+    """Run updates through a reader and get the fix it last published."""
+    source = ReplaySource()
+    published = []
+    reader = GPSReader(source, on_update=published.append)
+    reader.start()
+    try:
+        for update in updates:
+            source.push(update)
+        source.join()
+    finally:
+        reader.stop()
+    return [fix for fix in published if fix['status'] in ('active', 'no fix')][-1]
+
+
+def test_gpsd_no_fix_with_last_position_stays_without_fix():
+    fix = apply_all(parse_gpsd_report({'class': 'TPV', 'mode': 1, 'lat': 1.5, 'lon': 2.5}))
+    assert fix['mode'] == 1
+    assert fix['status'] == 'no fix'
+
+
+def test_gpsd_fix_is_active():
+    fix = apply_all(parse_gpsd_report({'class': 'TPV', 'mode': 2, 'lat': 1.5, 'lon': 2.5}),
+                    parse_gpsd_report({'class': 'SKY', 'uSat': 6, 'nSat': 9}))
+    assert fix['status'] == 'active'
+    assert fix['mode_name'] == '2d'
+    assert (fix['lat'], fix['lon'], fix['satellites_used']) == (1.5, 2.5, 6)
+    assert fix['last_fix_time'] is not None
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the model artifact store
+Uses small stand-in checkpoints with the Depth-Anything-V2 parameter names
+"""
+
+import argparse
+import json
+import os
+
+import pytest
+import torch
+
+from utils.model_store import (ModelStore, encoder_config_from_filename, infer_encoder_config,
+                               resolve_pipeline_model)
+
+VITS = {'encoder': 'vits', 'features': 64, 'out_channels': [48, 96, 192, 384]}
+
+
+def fake_state_dict():
+    state_dict = {
+        'pretrained.cls_token': torch.randn(1, 1, 384),
+        'depth_head.scratch.output_conv1.weight': torch.randn(32, 64, 3, 3),
+        'depth_head.scratch.output_conv1.bias': torch.randn(32),
+    }
+    for i, channels in enumerate(VITS['out_channels']):
+        state_dict[f'depth_head.projects.{i}.weight'] = torch.randn(channels, 384, 1, 1)
+    return state_dict
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    path = tmp_path / 'depth_anything_v2_vits.pth'
+    torch.save(fake_state_dict(), path)
+    return str(path)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ModelStore(str(tmp_path / 'cache'))
+
+
+def test_infer_encoder_config():
+    assert infer_encoder_config(fake_state_dict()) == VITS
+    assert infer_encoder_config({}) is None
+    assert encoder_config_from_filename('/models/depth_anything_v2_vitb.pth')['encoder'] == 'vitb'
+    assert encoder_config_from_filename('/models/model.pth') is None
+
+
+def test_conversion_round_trips_the_weights(store, checkpoint):
+    artifact_path, config = store.get_artifact(checkpoint)
+    assert config == VITS
+    loaded = store.load_state_dict(artifact_path)
+    original = torch.load(checkpoint, weights_only=True)
+    assert set(loaded) == set(original)
+    for name, tensor in original.items():
+        assert torch.equal(loaded[name], tensor)
+
+
+def test_fp16_artifacts_halve_floating_point_weights(store, checkpoint):
+    artifact_path, _ = store.get_artifact(checkpoint, dtype='fp16')
+    assert artifact_path.endswith('-vits-fp16.safetensors')
+    assert all(tensor.dtype == torch.float16 for tensor in store.load_state_dict(artifact_path).values())
+    with pytest.raises(ValueError):
+        store.get_artifact(checkpoint, dtype='int8')
+
+
+def test_cached_artifact_is_reused_across_stores(store, checkpoint, tmp_path):
+    artifact_path, _ = store.get_artifact(checkpoint)
+    mtime = os.stat(artifact_path).st_mtime_ns
+    reopened = ModelStore(str(tmp_path / 'cache'))
+    assert reopened.get_artifact(checkpoint) == (artifact_path, VITS)
+    assert os.stat(artifact_path).st_mtime_ns == mtime
+
+
+def test_corrupted_artifact_is_reconverted(store, checkpoint):
+    artifact_path, _ = store.get_artifact(checkpoint)
+    size = os.path.getsize(artifact_path)
+    with open(artifact_path, 'r+b') as f:
+        f.seek(size - 4)
+        f.write(b'\xff\xff\xff\xff')
+    os.utime(artifact_path, (0, 0))
+    artifact_path, _ = store.get_artifact(checkpoint)
+    loaded = store.load_state_dict(artifact_path)
+    assert torch.equal(loaded['pretrained.cls_token'], torch.load(checkpoint)['pretrained.cls_token'])
+
+
+def test_rebuild_reexports_an_artifact_that_verifies(store, checkpoint):
+    store.get_artifact(checkpoint)
+    (entry,) = store.manifest['artifacts'].values()
+    created = entry['created']
+    store.get_artifact(checkpoint, rebuild=True)
+    (entry,) = store.manifest['artifacts'].values()
+    assert entry['created'] > created
+
+
+def test_checkpoints_pickling_more_than_tensors_still_convert(store, tmp_path):
+    path = tmp_path / 'depth_anything_v2_vits.pth'
+    state_dict = fake_state_dict()
+    state_dict['training_args'] = argparse.Namespace(epochs=10)
+    torch.save(state_dict, path)
+    artifact_path, config = store.get_artifact(str(path))
+    assert config == VITS
+    assert 'training_args' not in store.load_state_dict(artifact_path)
+
+
+def test_unreadable_manifest_starts_over(tmp_path):
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    (cache / ModelStore.MANIFEST_NAME).write_text('{not json')
+    assert ModelStore(str(cache)).manifest['artifacts'] == {}
+    (cache / ModelStore.MANIFEST_NAME).write_text(json.dumps({'version': 99}))
+    assert ModelStore(str(cache)).manifest['version'] == ModelStore.MANIFEST_VERSION
+
+
+def test_resolve_pipeline_model(tmp_path):
+    staged = tmp_path / 'depth-anything-small'
+    staged.mkdir()
+    (staged / 'config.json').write_text('{}')
+    assert resolve_pipeline_model(str(staged)) == str(staged)
+    assert resolve_pipeline_model('org/depth-anything-small', local_dir=str(tmp_path)) == str(staged)
+    assert resolve_pipeline_model('org/not-staged-anywhere', local_dir=str(tmp_path), offline=True) is None
+    assert resolve_pipeline_model('org/not-staged-anywhere') == 'org/not-staged-anywhere'
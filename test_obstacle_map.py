@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the obstacle map's motion gate
+Covers the fused decisions and the active, stale and inactive gate states
+"""
+
+import time
+
+import numpy as np
+
+from utils.obstacle_map import ObstacleMap
+
+# Depth of a flat floor: nearness grows linearly towards the bottom edge
+FLOOR = np.tile(np.linspace(0.3, 1.0, 48)[:, None], (1, 64)).astype(np.float32)
+
+
+def make_obstacle():
+    """Floor with a near object filling the center of the view."""
+    depth = FLOOR.copy()
+    depth[10:40, 24:40] = 1.0
+    return depth
+
+
+def active_map(depth, detections=(), updates=4, timestamp=None):
+    """An active map fed the same depth map a few times."""
+    obstacle_map = ObstacleMap()
+    obstacle_map.active = True
+    for _ in range(updates):
+        obstacle_map.update(depth, detections, timestamp)
+    return obstacle_map
+
+
+def test_clear_floor_allows_full_speed():
+    decision = active_map(FLOOR).check('forward')
+    assert decision['gate'] == 'active'
+    assert decision['action'] == 'clear'
+    assert decision['speed_limit'] == 100
+
+
+def test_obstacle_stops_forward_motion_and_is_labelled():
+    detections = [{'bbox': [24, 10, 40, 40], 'class_name': 'person'}]
+    obstacle_map = active_map(make_obstacle(), detections)
+    for direction in ('forward', 'forward-left', 'forward-right'):
+        decision = obstacle_map.check(direction)
+        assert decision['action'] == 'stop'
+        assert decision['speed_limit'] == 0
+        assert decision['classes'] == ['person']
+
+
+def test_directions_away_from_the_obstacle_are_not_gated():
+    decision = active_map(make_obstacle()).check('backward')
+    assert decision['action'] == 'clear'
+    assert decision['speed_limit'] == 100
+
+
+def test_active_gate_without_a_map_is_stale():
+    obstacle_map = ObstacleMap(slow_speed=40)
+    obstacle_map.active = True
+    decision = obstacle_map.check('forward')
+    assert decision['gate'] == 'stale'
+    assert decision['action'] == 'unknown'
+    assert decision['speed_limit'] == 40
+
+
+def test_old_map_goes_stale_and_limits_forward_speed():
+    obstacle_map = active_map(FLOOR, updates=1)
+    now = time.time()
+    assert obstacle_map.check('forward', now=now)['gate'] == 'active'
+    decision = obstacle_map.check('forward', now=now + 5)
+    assert decision['gate'] == 'stale'
+    assert decision['speed_limit'] == obstacle_map.slow_speed
+    assert obstacle_map.check('backward', now=now + 5)['speed_limit'] == 100
+
+
+def test_max_age_follows_a_slow_depth_pipeline():
+    # Maps that arrive 8 s after capture, as with a slow CPU depth pass
+    obstacle_map = active_map(FLOOR, updates=2, timestamp=time.time() - 8)
+    max_age = obstacle_map.get_grid()['max_age']
+    assert 15 < max_age < 17
+    now = time.time()
+    assert obstacle_map.check('forward', now=now + 5)['gate'] == 'active'
+    assert obstacle_map.check('forward', now=now + 10)['gate'] == 'stale'
+
+
+def test_max_age_is_capped():
+    obstacle_map = active_map(FLOOR, updates=1, timestamp=time.time() - 40)
+    assert obstacle_map.get_grid()['max_age'] == obstacle_map.max_age_limit
+    assert obstacle_map.check('forward')['gate'] == 'stale'
+
+
+def test_inactive_gate_applies_the_inactive_speed_limit():
+    obstacle_map = active_map(make_obstacle())
+    obstacle_map.active = False
+    decision = obstacle_map.check('forward')
+    assert decision['gate'] == 'inactive'
+    assert decision['action'] == 'unknown'
+    assert decision['speed_limit'] == obstacle_map.inactive_speed_limit
+    assert obstacle_map.get_grid()['gate'] == 'inactive'
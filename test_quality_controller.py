@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the adaptive quality controller
+Drives the controller with simulated latency samples and clock ticks
+"""
+
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from quality_controller import QUALITY_STEPS, QualityController, build_quality_levels
+from utils.latency import StageLatency
+
+
+class Pipelines:
+    """Stand-in AI detection and depth services with latency trackers."""
+
+    def __init__(self):
+        self.services = {
+            'ai_detection': SimpleNamespace(latency=StageLatency(('total',)), jpeg_quality=None, image_size=None),
+            'depth_camera': SimpleNamespace(latency=StageLatency(('total',)), jpeg_quality=None,
+                                            process_interval=None,
+                                            depth_processor=SimpleNamespace(input_size=None))
+        }
+
+    def get(self, name):
+        return self.services.get(name)
+
+    def frames(self, name, milliseconds, count=5):
+        for _ in range(count):
+            self.services[name].latency.record('total', milliseconds / 1000.0)
+
+
+@pytest.fixture
+def pipelines():
+    return Pipelines()
+
+
+@pytest.fixture
+def controller(pipelines):
+    # CPU limits out of reach so only the simulated latencies decide
+    return QualityController(pipelines.get, cpu_high=100.0, cpu_low=100.0, cooldown=6.0)
+
+
+def run_ticks(controller, pipelines, ticks, ai_ms, start=None, interval=2.0):
+    """Feed AI frames of a fixed latency and tick once per interval."""
+    now = time.time() if start is None else start
+    for _ in range(ticks):
+        if ai_ms is not None:
+            pipelines.frames('ai_detection', ai_ms)
+        controller.tick(now)
+        now += interval
+    return now
+
+
+def test_quality_levels_round_model_sizes():
+    levels = build_quality_levels()
+    assert len(levels) == len(QUALITY_STEPS)
+    assert levels[0] == {'ai_jpeg_quality': 85, 'depth_jpeg_quality': 80, 'upload_quality': 0.8,
+                         'depth_input_size': 518, 'depth_interval': 0.1, 'yolo_imgsz': 640}
+    for better, worse in zip(levels, levels[1:]):
+        assert worse['depth_input_size'] < better['depth_input_size']
+        assert worse['depth_interval'] > better['depth_interval']
+    assert all(level['depth_input_size'] % 14 == 0 for level in levels)
+    assert all(level['yolo_imgsz'] % 32 == 0 for level in levels)
+
+
+def test_over_budget_ticks_lower_quality_and_apply_it(controller, pipelines):
+    now = run_ticks(controller, pipelines, 1, ai_ms=400)
+    assert controller.level == 0
+    run_ticks(controller, pipelines, 1, ai_ms=400, start=now)
+    assert controller.level == 1
+    change = controller.get_status()['changes'][0]
+    assert (change['from'], change['to']) == (0, 1)
+    assert change['reason'] == "ai_detection p95 400 ms > 250 ms"
+
+    ai = pipelines.get('ai_detection')
+    depth = pipelines.get('depth_camera')
+    settings = controller.levels[1]
+    assert (ai.jpeg_quality, ai.image_size) == (settings['ai_jpeg_quality'], settings['yolo_imgsz'])
+    assert depth.depth_processor.input_size == settings['depth_input_size']
+    assert depth.process_interval == settings['depth_interval']
+
+
+def test_cooldown_delays_the_next_step(controller, pipelines):
+    now = run_ticks(controller, pipelines, 2, ai_ms=400)
+    now = run_ticks(controller, pipelines, 3, ai_ms=400, start=now)
+    assert controller.level == 1
+    run_ticks(controller, pipelines, 2, ai_ms=400, start=now)
+    assert controller.level == 2
+
+
+def test_good_ticks_raise_quality_and_idle_ticks_hold(controller, pipelines):
+    controller.set_mode("auto", 3)
+    # Idle ticks hold the level while the cooldown after set_mode() runs out
+    now = run_ticks(controller, pipelines, 20, ai_ms=None)
+    assert controller.last_sample['verdict'] == "idle"
+    assert controller.level == 3
+    now = run_ticks(controller, pipelines, 5, ai_ms=100, start=now)
+    assert controller.level == 2
+    # 200 ms is inside the target but not the 70% headroom
+    run_ticks(controller, pipelines, 20, ai_ms=200, start=now)
+    assert controller.last_sample['verdict'] == "hold"
+    assert controller.level == 2
+
+
+def test_limits_cap_the_effective_level_in_every_mode(controller, pipelines):
+    controller.set_mode("manual", 1)
+    controller.set_limit("governor", 3, "temperature 82.0°C")
+    assert (controller.level, controller.effective_level) == (1, 3)
+    assert pipelines.get('ai_detection').image_size == controller.levels[3]['yolo_imgsz']
+    controller.set_limit("governor", None)
+    assert controller.effective_level == 1
+    assert [change['reason'] for change in controller.get_status()['changes']] == [
+        "governor limit cleared", "governor limit: temperature 82.0°C", "manual level set"]
+
+
+def test_manual_level_is_clamped_and_unknown_modes_are_rejected(pipelines):
+    controller = QualityController(pipelines.get, min_level=1, max_level=3)
+    controller.set_mode("manual", 9)
+    assert controller.level == 3
+    controller.set_mode("manual", -1)
+    assert controller.level == 1
+    with pytest.raises(ValueError):
+        controller.set_mode("turbo")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Tests for the versioned robot state store
+"""
+
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from robot_state import STATE_FIELDS, RobotStateStore
+
+
+def test_starts_with_defaults_at_version_zero():
+    store = RobotStateStore()
+    snapshot = store.snapshot()
+    assert snapshot.pop("version") == 0
+    assert snapshot == {name: default for name, (_, default) in STATE_FIELDS.items()}
+
+
+def test_update_returns_only_changed_fields_and_bumps_the_version():
+    store = RobotStateStore()
+    version, changes = store.update(motor_speed=70, is_moving=False)
+    assert (version, changes) == (1, {"motor_speed": 70})
+    assert store.update(motor_speed=70) == (1, {})
+
+
+def test_values_are_coerced_to_the_field_type():
+    store = RobotStateStore()
+    store.update(motor_speed="65", posX=101, battery=None)
+    assert store.get("motor_speed") == 65
+    assert isinstance(store.get("posX"), float)
+    assert store.get("battery") is None
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(KeyError):
+        RobotStateStore().update(warp_drive=True)
+
+
+def test_changes_since_a_version():
+    store = RobotStateStore()
+    store.update(motor_speed=60)
+    seen = store.version
+    store.update(servo_angle=45)
+    store.update(motor_speed=80, heading=12.5)
+    assert store.changes_since(seen) == {"servo_angle": 45, "motor_speed": 80, "heading": 12.5, "version": 3}
+    assert store.changes_since(store.version) == {"version": 3}
+
+
+def test_subscribers_get_each_change_and_failures_are_isolated():
+    store = RobotStateStore()
+    received = []
+
+    def failing(version, changes):
+        raise RuntimeError("subscriber bug")
+
+    store.subscribe(failing)
+    store.subscribe(lambda version, changes: received.append((version, changes)))
+    store.update(camera_enabled=True)
+    store.update(camera_enabled=True)
+    store.unsubscribe(failing)
+    store.update(camera_enabled=False)
+    assert received == [(1, {"camera_enabled": True}), (2, {"camera_enabled": False})]
+
+
+def test_concurrent_updates_keep_every_version():
+    store = RobotStateStore()
+
+    def writer(offset):
+        for i in range(500):
+            store.update(motor_speed=offset + i)
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in (0, 1000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert store.version == 1000
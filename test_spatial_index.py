@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the fleet spatial index
+Grid queries are checked against brute-force scans of random positions
+"""
+
+import random
+
+import pytest
+
+from utils.spatial_index import SpatialIndex, distance_meters, point_in_polygon
+
+SQUARE = [(0.0, 0.0), (0.0, 1.0), (1.0, 1.0), (1.0, 0.0)]
+
+
+@pytest.fixture
+def positions():
+    rng = random.Random(7)
+    return {f"R{i}": (3.10 + rng.random() * 0.05, 101.63 + rng.random() * 0.05) for i in range(300)}
+
+
+@pytest.fixture
+def index(positions):
+    index = SpatialIndex(cell_size=0.002)
+    for item_id, (lat, lon) in positions.items():
+        index.update(item_id, lat, lon)
+    return index
+
+
+def test_distance_meters():
+    assert distance_meters(0.0, 0.0, 0.0, 0.0) == 0.0
+    assert distance_meters(3.0, 101.0, 3.001, 101.0) == pytest.approx(110.54, rel=1e-3)
+
+
+def test_point_in_polygon():
+    assert point_in_polygon(0.5, 0.5, SQUARE)
+    assert not point_in_polygon(1.5, 0.5, SQUARE)
+    assert point_in_polygon(0.5, 0.5, SQUARE + [SQUARE[0]])
+
+
+@pytest.mark.parametrize("bbox", [
+    (3.11, 101.64, 3.12, 101.65),  # a few cells
+    (3.0, 101.5, 3.2, 101.8),  # everything; scans occupied cells instead
+    (3.2, 101.8, 3.3, 101.9),  # nothing
+])
+def test_bbox_query_matches_a_scan(index, positions, bbox):
+    south, west, north, east = bbox
+    expected = {item_id for item_id, (lat, lon) in positions.items()
+                if south <= lat <= north and west <= lon <= east}
+    assert index.query_bbox(*bbox) == expected
+
+
+def test_nearest_matches_a_scan(index, positions):
+    lat, lon = 3.125, 101.655
+    by_distance = sorted(positions, key=lambda item_id: distance_meters(lat, lon, *positions[item_id]))
+    nearest = index.nearest(lat, lon, k=5)
+    assert [item_id for item_id, _ in nearest] == by_distance[:5]
+    assert [distance for _, distance in nearest] == sorted(distance for _, distance in nearest)
+
+
+def test_nearest_respects_max_distance(index, positions):
+    lat, lon = 3.125, 101.655
+    within = {item_id for item_id in positions if distance_meters(lat, lon, *positions[item_id]) <= 300}
+    result = index.nearest(lat, lon, k=len(positions), max_distance=300)
+    assert {item_id for item_id, _ in result} == within
+    assert index.nearest(lat, lon, k=0) == []
+
+
+def test_polygon_query_matches_a_scan(index, positions):
+    triangle = [(3.10, 101.63), (3.15, 101.63), (3.10, 101.68)]
+    expected = {item_id for item_id, (lat, lon) in positions.items() if point_in_polygon(lat, lon, triangle)}
+    assert index.query_polygon(triangle) == expected
+    inside = next(iter(expected))
+    assert index.contains(inside, triangle)
+    assert not index.contains("missing", triangle)
+
+
+def test_moves_and_removals_update_the_cells():
+    index = SpatialIndex(cell_size=0.001)
+    index.update("A", 3.1001, 101.6001)
+    index.update("A", 3.2001, 101.7001)
+    assert index.query_bbox(3.1, 101.6, 3.101, 101.601) == set()
+    assert index.query_bbox(3.2, 101.7, 3.201, 101.701) == {"A"}
+    assert index.get("A") == (3.2001, 101.7001)
+    index.remove("A")
+    assert "A" not in index and len(index) == 0
+    assert index.nearest(3.2, 101.7) == []
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for the telemetry publisher
+A dashboard that connects while the state changes must end up with the
+current state
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'web-client'))
+
+from fastapi import WebSocketDisconnect
+
+from robot_state import RobotStateStore
+from telemetry import TelemetryPublisher
+
+
+class FakeDashboard:
+    """WebSocket stand-in that records messages and can act during a send."""
+
+    def __init__(self, on_send=None):
+        self.messages = []
+        self.on_send = on_send
+        self.closed = asyncio.Event()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        message = json.loads(text)
+        self.messages.append(message)
+        if self.on_send is not None:
+            await self.on_send(message)
+
+    async def receive_text(self):
+        await self.closed.wait()
+        raise WebSocketDisconnect()
+
+    def state(self):
+        """Rebuild the state from the snapshot and deltas received."""
+        state = {}
+        for message in self.messages:
+            state.update(message["state"])
+        return state
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def serve(publisher, dashboard, settle=0.3):
+    task = asyncio.create_task(publisher.handle_client(dashboard))
+    await asyncio.sleep(settle)
+    dashboard.closed.set()
+    await task
+
+
+def test_snapshot_carries_state_and_static_data():
+    async def scenario():
+        store = RobotStateStore()
+        publisher = TelemetryPublisher(store)
+        publisher.add_static("classes", lambda: ["person"])
+        await publisher.start()
+        dashboard = FakeDashboard()
+        await serve(publisher, dashboard, settle=0.05)
+        await publisher.stop()
+        return store, dashboard
+
+    store, dashboard = run(scenario())
+    snapshot = dashboard.messages[0]
+    assert snapshot["type"] == "snapshot"
+    assert snapshot["state"] == store.snapshot()
+    assert snapshot["static"] == {"classes": ["person"]}
+
+
+def test_changes_during_the_snapshot_reach_the_new_dashboard():
+    async def scenario():
+        store = RobotStateStore()
+        publisher = TelemetryPublisher(store, max_rate=100)
+        await publisher.start()
+        # Another dashboard keeps the broadcaster sending deltas
+        other = FakeDashboard()
+        publisher.clients.add(other)
+
+        async def change_state_mid_send(message):
+            if message["type"] == "snapshot":
+                store.update(motor_speed=77, heading=45.0)
+                # Let the broadcaster push this change to the other dashboard
+                await asyncio.sleep(0.05)
+
+        dashboard = FakeDashboard(on_send=change_state_mid_send)
+        await serve(publisher, dashboard)
+        await publisher.stop()
+        return store, dashboard, other
+
+    store, dashboard, other = run(scenario())
+    assert any(message["state"].get("motor_speed") == 77 for message in other.messages)
+    state = dashboard.state()
+    assert state["motor_speed"] == 77 and state["heading"] == 45.0
+    assert state == store.snapshot()
+
+
+def test_connected_dashboards_receive_deltas():
+    async def scenario():
+        store = RobotStateStore()
+        publisher = TelemetryPublisher(store, max_rate=100)
+        await publisher.start()
+        dashboard = FakeDashboard()
+        task = asyncio.create_task(publisher.handle_client(dashboard))
+        await asyncio.sleep(0.05)
+        store.update(servo_angle=30)
+        await asyncio.sleep(0.1)
+        dashboard.closed.set()
+        await task
+        await publisher.stop()
+        return publisher, dashboard
+
+    publisher, dashboard = run(scenario())
+    assert dashboard.messages[-1] == {"type": "delta", "state": {"servo_angle": 30, "version": 1}}
+    assert publisher.clients == set()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for the teleop WebSocket
+Covers acks, stale frames and the dead-man switch against the real backend
+with the mock GPS source and without model loading
+"""
+
+import json
+import os
+import sys
+import time
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+WEB_CLIENT_DIR = os.path.join(ROOT_DIR, 'web-client')
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    """Import the backend from web-client/ like server.sh does."""
+    os.environ.setdefault("NAUTILUS_GPS_SOURCE", "mock")
+    sys.path.insert(0, ROOT_DIR)
+    sys.path.insert(0, WEB_CLIENT_DIR)
+    from config.backend_config import BackendConfig
+    BackendConfig.PRELOAD_MODELS = False
+    BackendConfig.DETECTION_LOG_DIR = str(tmp_path_factory.mktemp("detection_log"))
+    cwd = os.getcwd()
+    os.chdir(WEB_CLIENT_DIR)
+    try:
+        import backend
+        yield backend
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(backend):
+    from fastapi.testclient import TestClient
+    with TestClient(backend.app) as client:
+        yield client
+
+
+def send(websocket, **frame):
+    websocket.send_text(json.dumps(frame))
+    return websocket.receive_json()
+
+
+def test_move_is_acked_with_the_state_version(backend, client):
+    with client.websocket_connect("/ws/teleop") as websocket:
+        ack = send(websocket, d="forward", s=1)
+        assert ack["s"] == 1
+        assert ack["v"] == backend.robot_state.version
+        assert backend.robot_state.get("current_direction") == "forward"
+        send(websocket, d="stop", s=2)
+    assert not backend.robot_state.get("is_moving")
+
+
+def test_out_of_order_frames_are_ignored(backend, client):
+    with client.websocket_connect("/ws/teleop") as websocket:
+        send(websocket, d="left", s=5)
+        assert send(websocket, d="right", s=4) == {"s": 4, "stale": True}
+        assert backend.robot_state.get("current_direction") == "left"
+        send(websocket, d="stop", s=6)
+
+
+def test_bad_frames_are_reported(client):
+    with client.websocket_connect("/ws/teleop") as websocket:
+        assert send(websocket, d="forward") == {"error": "bad frame"}
+
+
+def test_deadman_stops_the_robot_without_frames(backend, client):
+    with client.websocket_connect("/ws/teleop") as websocket:
+        started = time.monotonic()
+        send(websocket, d="forward", s=1)
+        assert backend.robot_state.get("is_moving")
+        message = websocket.receive_json()
+        elapsed = time.monotonic() - started
+        assert message["stop"] == "deadman"
+        assert elapsed >= backend.BackendConfig.TELEOP_DEADMAN_TIMEOUT
+        assert not backend.robot_state.get("is_moving")
+
+        # Frames keep the robot moving again after a dead-man stop
+        send(websocket, d="forward", s=2)
+        assert backend.robot_state.get("is_moving")
+        send(websocket, d="stop", s=3)
+
+
+def test_disconnect_stops_the_robot(backend, client):
+    with client.websocket_connect("/ws/teleop") as websocket:
+        send(websocket, d="forward", s=1)
+    deadline = time.monotonic() + 2
+    while backend.robot_state.get("is_moving") and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not backend.robot_state.get("is_moving")
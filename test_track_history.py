@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the position history ring buffer and track downsampling
+"""
+
+import numpy as np
+import pytest
+
+from utils.track_history import PositionHistory, TrackStore, douglas_peucker, time_buckets
+
+
+def test_ring_buffer_keeps_the_newest_samples_in_order():
+    history = PositionHistory(4)
+    for t in range(6):
+        history.append(float(t), 3.0 + t, 101.0, heading=t * 10)
+    samples = history.query()
+    assert samples['times'].tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert samples['lat'].tolist() == [5.0, 6.0, 7.0, 8.0]
+    assert history.latest() == {'time': 5.0, 'lat': 8.0, 'lon': 101.0, 'heading': 50.0}
+
+
+def test_time_range_query_is_inclusive():
+    history = PositionHistory(10)
+    for t in range(10):
+        history.append(float(t), 0.0, 0.0)
+    assert history.query(3, 6)['times'].tolist() == [3.0, 4.0, 5.0, 6.0]
+    assert history.query(start=8)['times'].tolist() == [8.0, 9.0]
+    assert len(history.query(20, 30)['times']) == 0
+
+
+def test_empty_history():
+    history = PositionHistory(3)
+    assert history.latest() is None
+    assert history.get_track()['points'] == []
+
+
+def test_douglas_peucker_drops_collinear_points_and_keeps_corners():
+    x = np.array([0.0, 1.0, 2.0, 3.0, 3.0, 3.0])
+    y = np.array([0.0, 0.0, 0.0, 0.0, 1.0, 2.0])
+    assert douglas_peucker(x, y, 0.1).tolist() == [0, 3, 5]
+    assert douglas_peucker(x[:2], y[:2], 0.1).tolist() == [0, 1]
+
+
+def test_time_buckets_keep_the_last_sample_of_each_bucket():
+    times = np.array([0.0, 1.0, 4.9, 5.0, 7.0, 12.0])
+    assert time_buckets(times, 5.0).tolist() == [2, 4, 5]
+    assert time_buckets(np.array([]), 5.0).tolist() == []
+
+
+def test_track_downsampling_methods():
+    history = PositionHistory(100)
+    # Straight line north with a one-step jog east
+    for t in range(50):
+        history.append(float(t), 3.0 + t * 1e-5, 101.0 + (1e-4 if t >= 25 else 0.0))
+    raw = history.get_track(method='raw')
+    assert raw['returned_samples'] == raw['total_samples'] == 50
+
+    simplified = history.get_track(method='dp', tolerance=1.0)
+    assert simplified['returned_samples'] == 4
+    points = simplified['points']
+    assert points[0][0] == 0.0 and points[-1][0] == 49.0
+
+    bucketed = history.get_track(method='bucket', bucket_seconds=10.0)
+    assert [point[0] for point in bucketed['points']] == [9.0, 19.0, 29.0, 39.0, 49.0]
+
+    with pytest.raises(ValueError):
+        history.get_track(method='spline')
+
+
+def test_track_store_keeps_one_history_per_robot():
+    store = TrackStore(5)
+    store.record('NAUT-001', 1.0, 3.0, 101.0)
+    store.record('NAUT-002', 1.0, 4.0, 102.0)
+    store.record('NAUT-001', 2.0, 3.1, 101.1)
+    assert sorted(store.robot_ids()) == ['NAUT-001', 'NAUT-002']
+    assert store.history('NAUT-001').count == 2
+    store.remove('NAUT-002')
+    assert store.robot_ids() == ['NAUT-001']
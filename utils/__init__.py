@@ -4,5 +4,7 @@ Contains various utility modules for depth processing and other functionalities.
 """
 
 from .depth_processor import DepthProcessor
+from .model_store import ModelStore
+from .track_history import PositionHistory, TrackStore
 
-__all__ = ['DepthProcessor'] 
\ No newline at end of file
+__all__ = ['DepthProcessor', 'ModelStore', 'PositionHistory', 'TrackStore'] 
\ No newline at end of file
@@ -6,20 +6,82 @@ This module contains utilities for depth estimation and visualization.
 import numpy as np
 import cv2
 from PIL import Image
-from transformers import pipeline
-import torch
 import os
 import sys
+import time
+
+from .model_store import ModelStore, resolve_pipeline_model
+from .latency import StageLatency
+from .profiling import InferenceProfiler
 
 # Add the depth_anything_v2 module to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
-try:
-    from depth_anything_v2.dpt import DepthAnythingV2
-    DEPTH_ANYTHING_V2_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Depth-Anything-V2 local model not available: {e}")
-    DEPTH_ANYTHING_V2_AVAILABLE = False
+# torch, transformers and the Depth-Anything-V2 architecture are imported
+# lazily by load_model() so that importing this module stays cheap.
+DepthAnythingV2 = None
+torch = None
+
+# Stages timed for every processed frame
+DEPTH_STAGES = ('preprocess', 'inference', 'postprocess', 'draw')
+
+# Depth samples used per object; larger boxes are strided down to about this many
+ROI_MAX_SAMPLES = 4096
+
+
+def robust_median(values, k=2.5):
+    """
+    Median of `values` after rejecting outliers beyond k scaled MADs.
+    
+    Args:
+        values: 1-D array of depth samples
+        k: Rejection threshold in robust standard deviations (1.4826 * MAD)
+        
+    Returns:
+        tuple: (median of the inliers, MAD of the inliers, inlier fraction),
+            or (None, None, 0.0) for an empty input
+    """
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return None, None, 0.0
+    median = np.median(values)
+    deviation = np.abs(values - median)
+    mad = np.median(deviation)
+    if mad > 0:
+        values = values[deviation <= k * 1.4826 * mad]
+        median = np.median(values)
+        mad = np.median(np.abs(values - median))
+    return float(median), float(mad), values.size / deviation.size
+
+
+def pad_box(box, padding, width, height):
+    """Grow an (x1, y1, x2, y2) box by `padding` of its size per side, clipped to the frame."""
+    x1, y1, x2, y2 = box
+    pad_x = (x2 - x1) * padding
+    pad_y = (y2 - y1) * padding
+    return (max(0, int(x1 - pad_x)), max(0, int(y1 - pad_y)),
+            min(width, int(np.ceil(x2 + pad_x))), min(height, int(np.ceil(y2 + pad_y))))
+
+
+def _import_depth_anything_v2():
+    """
+    Import torch and the Depth-Anything-V2 architecture on first use.
+    
+    Returns:
+        bool: True if the local architecture is available, False otherwise
+    """
+    global DepthAnythingV2, torch
+    if DepthAnythingV2 is not None:
+        return True
+    try:
+        import torch as _torch
+        from depth_anything_v2.dpt import DepthAnythingV2 as _DepthAnythingV2
+    except ImportError as e:
+        print(f"Warning: Depth-Anything-V2 local model not available: {e}")
+        return False
+    torch = _torch
+    DepthAnythingV2 = _DepthAnythingV2
+    return True
 
 
 class DepthProcessor:
@@ -27,20 +89,46 @@ class DepthProcessor:
     Handles depth estimation processing and visualization.
     """
     
-    def __init__(self, model_name="depth-anything/Depth-Anything-V2-Small-hf", local_checkpoint=None):
+    def __init__(self, model_name="depth-anything/Depth-Anything-V2-Small-hf", local_checkpoint=None,
+                 cache_dir=None, dtype='fp32', verify_checksums=True,
+                 pipeline_dir=None, offline=False):
         """
         Initialize the depth processor.
         
         Args:
             model_name: HuggingFace model name for depth estimation
             local_checkpoint: Path to local model checkpoint file
+            cache_dir: Model artifact cache directory (defaults to a 'cache'
+                folder next to the local checkpoint)
+            dtype: Weight precision for the local model ('fp32' or 'fp16')
+            verify_checksums: Verify cached artifact checksums before loading
+            pipeline_dir: Directory with pre-staged HuggingFace pipeline models
+            offline: Never download models; fail immediately if nothing is
+                available locally
         """
         self.model_name = model_name
         self.local_checkpoint = local_checkpoint
+        if cache_dir is None and local_checkpoint:
+            cache_dir = os.path.join(os.path.dirname(local_checkpoint), 'cache')
+        self.cache_dir = cache_dir
+        self.dtype = dtype
+        self.verify_checksums = verify_checksums
+        self.pipeline_dir = pipeline_dir
+        self.offline = offline
+        self.load_error = None
+        self.device = 'cpu'
+        self.is_half = False
         self.pipeline = None
         self.model = None
         self.is_loaded = False
         self.use_local = False
+        self.is_compiled = False
+        self.encoder = None  # Encoder of the local model ('vits', 'vitb', ...)
+        self.warmup_stats = None
+        self.latency = StageLatency(DEPTH_STAGES)
+        self.profiler = InferenceProfiler()
+        self.last_depth = None  # Raw depth array of the last processed frame
+        self.input_size = None  # Short side for process_frame() (None: model default)
         self.current_colormap = cv2.COLORMAP_PLASMA
         
     def load_model(self):
@@ -50,21 +138,45 @@ class DepthProcessor:
         Returns:
             bool: True if model loaded successfully, False otherwise
         """
+        self.load_error = None
+        
         # Try loading local checkpoint first if available
         if self.local_checkpoint and os.path.exists(self.local_checkpoint):
             try:
                 print(f"Loading local depth model: {self.local_checkpoint}")
-                return self._load_local_model()
+                if self._load_local_model():
+                    return True
             except Exception as e:
                 print(f"✗ Error loading local model: {e}")
-                print("Falling back to HuggingFace model...")
+            print("Falling back to HuggingFace model...")
+        elif self.local_checkpoint:
+            print(f"Local depth checkpoint not found: {self.local_checkpoint}")
+        
+        # Fallback to HuggingFace pipeline, preferring pre-staged local files.
+        # huggingface_hub reads HF_HUB_OFFLINE once, when it is first imported,
+        # so it is set before resolve_pipeline_model() imports it
+        if self.offline:
+            os.environ.setdefault('HF_HUB_OFFLINE', '1')
+        model_source = resolve_pipeline_model(self.model_name, self.pipeline_dir, self.offline)
+        if model_source is None:
+            self.load_error = (f"Depth model '{self.model_name}' is not staged locally "
+                               f"and offline mode is enabled")
+            print(f"✗ {self.load_error}")
+            self.is_loaded = False
+            return False
         
-        # Fallback to HuggingFace pipeline
         try:
-            print(f"Loading depth model from HuggingFace: {self.model_name}")
+            from transformers import pipeline
+            if model_source == self.model_name:
+                print(f"Loading depth model from HuggingFace: {self.model_name}")
+            else:
+                print(f"Loading depth model from local files: {model_source}")
+            # local_files_only also holds if huggingface_hub was imported
+            # elsewhere before HF_HUB_OFFLINE was set
             self.pipeline = pipeline(
                 task="depth-estimation", 
-                model=self.model_name
+                model=model_source,
+                model_kwargs={"local_files_only": True} if self.offline else None
             )
             self.use_local = False
             self.is_loaded = True
@@ -72,6 +184,7 @@ class DepthProcessor:
             return True
         except Exception as e:
             print(f"✗ Error loading depth model: {e}")
+            self.load_error = f"Error loading depth model: {e}"
             self.is_loaded = False
             return False
             
@@ -82,52 +195,52 @@ class DepthProcessor:
         Returns:
             bool: True if model loaded successfully, False otherwise
         """
-        if not DEPTH_ANYTHING_V2_AVAILABLE:
+        if not _import_depth_anything_v2():
             print("✗ Depth-Anything-V2 architecture not available")
             return False
             
         try:
-            # Determine model configuration based on checkpoint filename
-            if 'vitb' in self.local_checkpoint:
-                encoder = 'vitb'
-                features = 128
-                out_channels = [96, 192, 384, 768]
-            elif 'vits' in self.local_checkpoint:
-                encoder = 'vits'
-                features = 64
-                out_channels = [48, 96, 192, 384]
-            elif 'vitl' in self.local_checkpoint:
-                encoder = 'vitl'
-                features = 256
-                out_channels = [256, 512, 1024, 1024]
-            else:
-                # Default to vitb configuration
-                print("⚠️  Unknown model type, defaulting to vitb configuration")
-                encoder = 'vitb'
-                features = 128
-                out_channels = [96, 192, 384, 768]
-            
-            print(f"Creating DepthAnythingV2 model with encoder: {encoder}")
-            
-            # Create the model
-            self.model = DepthAnythingV2(
-                encoder=encoder,
-                features=features,
-                out_channels=out_channels
-            )
+            device = 'cuda' if torch.cuda.is_available() else 'mps' if torch.backends.mps.is_available() else 'cpu'
+            dtype = self.dtype
+            if dtype == 'fp16' and device != 'cuda':
+                print("⚠️  fp16 depth weights need CUDA, using fp32")
+                dtype = 'fp32'
             
-            # Load the checkpoint
-            print(f"Loading checkpoint: {self.local_checkpoint}")
-            checkpoint = torch.load(self.local_checkpoint, map_location='cpu')
-            self.model.load_state_dict(checkpoint)
+            # Get a verified, memory-mappable artifact from the model store
+            store = ModelStore(self.cache_dir, verify_checksums=self.verify_checksums)
+            artifact_path, config = store.get_artifact(self.local_checkpoint, dtype=dtype)
             
-            # Set device
-            device = 'cuda' if torch.cuda.is_available() else 'mps' if torch.backends.mps.is_available() else 'cpu'
-            self.model = self.model.to(device).eval()
+            print(f"Creating DepthAnythingV2 model with encoder: {config['encoder']}")
+            print(f"Loading checkpoint: {artifact_path}")
+            try:
+                state_dict = store.load_state_dict(artifact_path)
+            except Exception as e:
+                # A damaged artifact can pass the size check (and the hash check
+                # when checksums are off); export it again from the checkpoint
+                print(f"⚠️  Cached artifact failed to load ({e}), reconverting: {artifact_path}")
+                artifact_path, config = store.get_artifact(self.local_checkpoint, dtype=dtype, rebuild=True)
+                state_dict = store.load_state_dict(artifact_path)
+            
+            try:
+                # Build on the meta device and adopt the mmapped tensors directly,
+                # so peak memory stays close to the size of the weights
+                with torch.device('meta'):
+                    model = DepthAnythingV2(**config)
+                model.load_state_dict(state_dict, assign=True)
+            except (AttributeError, TypeError):
+                # torch < 2.1 has no meta-device context or assign=True
+                model = DepthAnythingV2(**config)
+                model.load_state_dict(state_dict)
+            del state_dict
+            
+            self.model = model.to(device).eval()
+            self.encoder = config['encoder']
+            self.device = device
+            self.is_half = dtype == 'fp16'
             
             self.use_local = True
             self.is_loaded = True
-            print(f"✓ Local Depth-Anything-V2 model loaded successfully on {device}")
+            print(f"✓ Local Depth-Anything-V2 model loaded successfully on {device} ({dtype})")
             return True
             
         except Exception as e:
@@ -136,12 +249,93 @@ class DepthProcessor:
             traceback.print_exc()
             return False
             
-    def estimate_depth(self, frame):
+    def _compile_model(self):
+        """
+        Compile the local model's forward pass with torch.compile.
+        
+        Returns:
+            bool: True if the model was compiled, False otherwise
+        """
+        if not self.use_local or self.model is None or not hasattr(torch, 'compile'):
+            return False
+            
+        try:
+            # infer_image() calls self.forward, so replacing the bound method
+            # on the instance routes inference through the compiled graph
+            self.model.forward = torch.compile(self.model.forward)
+            self.is_compiled = True
+            return True
+        except Exception as e:
+            print(f"⚠️  torch.compile unavailable, using eager model: {e}")
+            return False
+            
+    def _uncompile_model(self):
+        """Restore the eager forward pass after a failed compilation."""
+        if self.is_compiled:
+            del self.model.forward
+            self.is_compiled = False
+            
+    def warmup(self, width, height, iterations=3, compile_model=False):
+        """
+        Run synthetic frames through the model so that the first real frame
+        runs at steady-state latency.
+        
+        Args:
+            width: Frame width, normally the configured camera width
+            height: Frame height, normally the configured camera height
+            iterations: Number of synthetic frames to run
+            compile_model: Compile the local model before warming it up
+            
+        Returns:
+            dict: Warm-up timings, or None if the model is not loaded
+        """
+        if not self.is_loaded:
+            return None
+            
+        if compile_model:
+            self._compile_model()
+            
+        frame = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        times_ms = []
+        while len(times_ms) < iterations:
+            start_time = time.time()
+            try:
+                if self.use_local:
+                    self._infer_local(frame)
+                else:
+                    self._estimate_depth_pipeline(frame)
+            except Exception as e:
+                if not self.is_compiled:
+                    print(f"✗ Error during depth model warm-up: {e}")
+                    break
+                # Compilation errors surface on the first call; fall back to eager
+                print(f"⚠️  Compiled depth model failed, using eager model: {e}")
+                self._uncompile_model()
+                times_ms = []
+                continue
+            times_ms.append(round((time.time() - start_time) * 1000, 1))
+            
+        self.warmup_stats = {
+            'iterations': len(times_ms),
+            'frame_size': [width, height],
+            'compiled': self.is_compiled,
+            'times_ms': times_ms,
+            'first_ms': times_ms[0] if times_ms else None,
+            'last_ms': times_ms[-1] if times_ms else None
+        }
+        # Keep warm-up frames out of the steady-state latency figures
+        self.latency = StageLatency(DEPTH_STAGES)
+        print(f"✓ Depth model warm-up finished: {times_ms} ms")
+        return self.warmup_stats
+            
+    def estimate_depth(self, frame, input_size=None):
         """
         Estimate depth for a given frame.
         
         Args:
             frame: Input BGR frame from camera
+            input_size: Short side the local model runs at (default 518);
+                the HuggingFace pipeline always uses its own size
             
         Returns:
             numpy array: Raw depth estimation array
@@ -150,10 +344,11 @@ class DepthProcessor:
             return None
             
         try:
-            if self.use_local:
-                return self._estimate_depth_local(frame)
-            else:
-                return self._estimate_depth_pipeline(frame)
+            with self.profiler.capture():
+                if self.use_local:
+                    return self._estimate_depth_local(frame, input_size)
+                else:
+                    return self._estimate_depth_pipeline(frame)
                 
         except Exception as e:
             print(f"Error estimating depth: {e}")
@@ -173,19 +368,24 @@ class DepthProcessor:
             return None
             
         # Convert BGR to RGB for the model
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(rgb_frame)
+        with self.latency.measure('preprocess'):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            pil_image = Image.fromarray(rgb_frame)
         
-        # Get depth estimation
-        depth_result = self.pipeline(pil_image)
-        return np.array(depth_result["depth"])
+        # Get depth estimation (the pipeline's own pre/post-processing is
+        # included in the inference stage)
+        with self.latency.measure('inference'):
+            depth_result = self.pipeline(pil_image)
+        with self.latency.measure('postprocess'):
+            return np.array(depth_result["depth"])
         
-    def _estimate_depth_local(self, frame):
+    def _estimate_depth_local(self, frame, input_size=None):
         """
         Estimate depth using local Depth-Anything-V2 model.
         
         Args:
             frame: Input BGR frame from camera
+            input_size: Short side the model runs at (default 518)
             
         Returns:
             numpy array: Raw depth estimation array
@@ -194,13 +394,111 @@ class DepthProcessor:
             return None
             
         try:
-            # Use the model's built-in inference method
-            depth = self.model.infer_image(frame)
-            return depth
+            return self._infer_local(frame, input_size)
             
         except Exception as e:
             print(f"Error in local depth estimation: {e}")
             return None
+            
+    def _infer_local(self, frame, input_size=None):
+        """
+        Run the local model on a frame, raising on failure.
+        
+        Args:
+            frame: Input BGR frame from camera
+            input_size: Short side the model runs at (default 518)
+            
+        Returns:
+            numpy array: Raw depth estimation array
+        """
+        # Same steps as the model's infer_image(), split so each stage can be
+        # timed. On GPU the forward pass runs asynchronously and part of it
+        # is only waited for in the postprocess stage's .cpu() copy.
+        import torch.nn.functional as F
+        with torch.no_grad():
+            with self.latency.measure('preprocess'):
+                image, (h, w) = self.model.image2tensor(frame, input_size or 518)
+                if self.is_half:
+                    # Half weights need half inputs
+                    image = image.half()
+            with self.latency.measure('inference'):
+                depth = self.model.forward(image)
+            with self.latency.measure('postprocess'):
+                depth = F.interpolate(depth[:, None].float(), (h, w), mode="bilinear", align_corners=True)[0, 0]
+                return depth.cpu().numpy()
+    
+    def estimate_object_depths(self, frame, boxes, padding=0.15, input_size=252, max_area_fraction=0.4,
+                               method="frame", depth=None):
+        """
+        Estimate the depth of detected objects without a full-resolution pass.
+        
+        With method "frame" one reduced-resolution pass over the whole frame
+        serves every box, so all objects share one relative depth scale and
+        can be compared with each other. With method "crops" each box is
+        padded so the model sees some context and the padded crops run at a
+        reduced input size; crops are inferred independently, so with
+        relative-depth models their values are not comparable across objects.
+        When the crops together cover more than `max_area_fraction` of the
+        frame, the single frame pass is cheaper and is used instead. An
+        object's depth is the median inside its (unpadded) box after MAD
+        outlier rejection, which drops background and occluders at the box
+        edges.
+        
+        Args:
+            frame: Input BGR frame from camera
+            boxes: (x1, y1, x2, y2) boxes in frame pixels
+            padding: Context added around each box ("crops"), as a fraction of its size
+            input_size: Largest short side the model runs at for crops and
+                the reduced full-frame pass
+            max_area_fraction: Crop area, relative to the frame, above which a
+                single full-frame pass is used ("crops")
+            method: "frame" or "crops"
+            depth: Depth map of the whole frame from estimate_depth(frame,
+                input_size), if the caller already has it; reused for the
+                frame pass
+            
+        Returns:
+            list: One dict per box with bbox, depth (model units, None if it
+                could not be estimated), mad, inlier_fraction and source
+        """
+        if not self.is_loaded or not boxes:
+            return []
+        
+        height, width = frame.shape[:2]
+        padded = [pad_box(box, padding, width, height) for box in boxes]
+        crop_area = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in padded)
+        
+        regions = []
+        if method == "frame" or crop_area > max_area_fraction * width * height:
+            if depth is None:
+                depth = self.estimate_depth(frame, input_size)
+            regions = [(depth, (0, 0), 'frame')] * len(boxes)
+        else:
+            for x1, y1, x2, y2 in padded:
+                crop = frame[y1:y2, x1:x2]
+                if crop.size == 0:
+                    regions.append((None, (x1, y1), 'crop'))
+                    continue
+                # Never upsample a small crop beyond its own resolution
+                crop_size = max(56, min(input_size, (min(crop.shape[:2]) // 14) * 14))
+                regions.append((self.estimate_depth(crop, crop_size), (x1, y1), 'crop'))
+        
+        objects = []
+        for box, (depth, (offset_x, offset_y), source) in zip(boxes, regions):
+            result = {'bbox': [int(v) for v in box], 'depth': None, 'mad': None,
+                      'inlier_fraction': 0.0, 'source': source}
+            if depth is not None:
+                x1, y1, x2, y2 = (int(box[0]) - offset_x, int(box[1]) - offset_y,
+                                  int(box[2]) - offset_x, int(box[3]) - offset_y)
+                region = depth[max(0, y1):max(0, y2), max(0, x1):max(0, x2)]
+                if region.size:
+                    stride = max(1, int(np.sqrt(region.size / ROI_MAX_SAMPLES)))
+                    median, mad, inliers = robust_median(region[::stride, ::stride].ravel())
+                    if median is not None:
+                        result.update(depth=round(median, 4), mad=round(mad, 4),
+                                      inlier_fraction=round(inliers, 3))
+            objects.append(result)
+        return objects
     
     def set_colormap(self, colormap):
         """
@@ -256,25 +554,27 @@ class DepthProcessor:
             numpy array: Colored depth visualization ready for display
         """
         # Estimate depth
-        depth_array = self.estimate_depth(frame)
+        depth_array = self.estimate_depth(frame, self.input_size)
+        self.last_depth = depth_array
         if depth_array is None:
             return np.zeros_like(frame)
             
         # Visualize depth
-        depth_colored = self.visualize_depth(depth_array)
-        if depth_colored is None:
-            return np.zeros_like(frame)
-            
-        # Resize if target size specified
-        if target_size is not None:
-            width, height = target_size
-            depth_colored = cv2.resize(depth_colored, (width, height))
-        else:
-            # Resize to match original frame size
-            height, width = frame.shape[:2]
-            depth_colored = cv2.resize(depth_colored, (width, height))
-            
-        return depth_colored
+        with self.latency.measure('draw'):
+            depth_colored = self.visualize_depth(depth_array)
+            if depth_colored is None:
+                return np.zeros_like(frame)
+                
+            # Resize if target size specified
+            if target_size is not None:
+                width, height = target_size
+                depth_colored = cv2.resize(depth_colored, (width, height))
+            else:
+                # Resize to match original frame size
+                height, width = frame.shape[:2]
+                depth_colored = cv2.resize(depth_colored, (width, height))
+                
+            return depth_colored
         
     def get_depth_info(self, depth_array, point=None):
         """
@@ -0,0 +1,377 @@
+"""
+Detection Log Utilities
+Append-only columnar log of detections with a segment index, for time-range
+and class queries over days of data.
+
+Layout of a log directory:
+    index.json                      Segments: name, start/end time, rows and
+                                    per-class row counts; known class names
+    <segment>/time.f8               One file per column, appended in batches;
+    <segment>/class_id.u2           row i of every column is the same detection
+    <segment>/confidence.f4
+    <segment>/bbox.i2               (x1, y1, x2, y2) per row
+    <segment>/lat.f8, lon.f8        Robot position when the frame was processed
+    <segment>/track_id.i4           -1 when the detection is not tracked
+
+Rows are appended in time order, so a segment's time column is sorted and a
+time range is found with a binary search over a memory-mapped column. Rows
+are held back until they are `hold_seconds` old so that frames finishing
+out of order still land sorted; queries see rows once they are written.
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+# Column name -> (dtype, values per row)
+COLUMNS = {
+    'time': (np.dtype('<f8'), 1),
+    'class_id': (np.dtype('<u2'), 1),
+    'confidence': (np.dtype('<f4'), 1),
+    'bbox': (np.dtype('<i2'), 4),
+    'lat': (np.dtype('<f8'), 1),
+    'lon': (np.dtype('<f8'), 1),
+    'track_id': (np.dtype('<i4'), 1),
+}
+
+
+def _column_path(directory, name):
+    dtype, _ = COLUMNS[name]
+    return os.path.join(directory, f"{name}.{dtype.kind}{dtype.itemsize}")
+
+
+class DetectionLog:
+    """
+    Batched, append-only detection log.
+
+    append() only adds tuples to an in-memory batch; a background thread
+    converts each batch to column arrays and appends them to the current
+    segment every `flush_interval` seconds or once `batch_size` rows are
+    pending. Segments cover `segment_seconds` each; segments older than
+    `retention_seconds` are deleted as new rows are written.
+    """
+
+    def __init__(self, directory, segment_seconds=3600.0, flush_interval=2.0,
+                 batch_size=4096, retention_seconds=14 * 86400, hold_seconds=1.0):
+        """
+        Initialize the log and load its index.
+
+        Args:
+            directory: Log directory
+            segment_seconds: Time span of one segment
+            flush_interval: Seconds between batch writes
+            batch_size: Pending rows that trigger an early write
+            retention_seconds: Age after which segments are deleted (None keeps all)
+            hold_seconds: Age rows reach before they are written
+        """
+        self.directory = directory
+        self.segment_seconds = segment_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention_seconds = retention_seconds
+        self.hold_seconds = hold_seconds
+        self.rows_written = 0
+        self.last_error = None
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = None
+        os.makedirs(directory, exist_ok=True)
+        self._segments, self.classes = self._load_index()
+
+    # Hot path
+
+    def append(self, timestamp, detections, lat=None, lon=None):
+        """
+        Queue one frame's detections for the next batch write.
+
+        Args:
+            timestamp: Frame time (unix seconds)
+            detections: Detection dicts with class_id, class_name, confidence,
+                bbox and optionally track_id
+            lat: Robot latitude, or None
+            lon: Robot longitude, or None
+        """
+        if not detections:
+            return
+        lat = np.nan if lat is None else lat
+        lon = np.nan if lon is None else lon
+        rows = [(timestamp, d['class_id'], d['confidence'], d['bbox'], lat, lon, d.get('track_id', -1))
+                for d in detections]
+        with self._pending_lock:
+            self._pending.extend(rows)
+            for d in detections:
+                if d['class_id'] not in self.classes:
+                    self.classes[d['class_id']] = d.get('class_name', str(d['class_id']))
+            pending = len(self._pending)
+        if pending >= self.batch_size:
+            self._flush_event.set()
+
+    # Background writer
+
+    def start(self):
+        """Start the background batch writer."""
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detection-log", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Write the pending batch and stop the writer."""
+        self._stop_event.set()
+        self._flush_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self.flush(force=True)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._flush_event.wait(self.flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.last_error = str(e)
+
+    def _take_pending(self, force):
+        with self._pending_lock:
+            rows, self._pending = self._pending, []
+            if not force:
+                cutoff = time.time() - self.hold_seconds
+                self._pending = [row for row in rows if row[0] > cutoff]
+                rows = [row for row in rows if row[0] <= cutoff]
+        return rows
+
+    @staticmethod
+    def _to_columns(rows):
+        """Convert row tuples to column arrays."""
+        times, class_ids, confidences, bboxes, lats, lons, track_ids = zip(*rows)
+        return {
+            'time': np.asarray(times, dtype=COLUMNS['time'][0]),
+            'class_id': np.asarray(class_ids, dtype=COLUMNS['class_id'][0]),
+            'confidence': np.asarray(confidences, dtype=COLUMNS['confidence'][0]),
+            'bbox': np.asarray(bboxes, dtype=COLUMNS['bbox'][0]).reshape(-1, 4),
+            'lat': np.asarray(lats, dtype=COLUMNS['lat'][0]),
+            'lon': np.asarray(lons, dtype=COLUMNS['lon'][0]),
+            'track_id': np.asarray(track_ids, dtype=COLUMNS['track_id'][0]),
+        }
+
+    def flush(self, force=False):
+        """
+        Append pending rows to their segments and update the index.
+
+        Args:
+            force: Also write rows younger than hold_seconds
+        """
+        with self._write_lock:
+            rows = self._take_pending(force)
+            if not rows:
+                return
+            rows.sort(key=lambda row: row[0])
+            columns = self._to_columns(rows)
+            # Split the batch at segment boundaries
+            segment_ids = (columns['time'] // self.segment_seconds).astype(np.int64)
+            boundaries = np.flatnonzero(np.diff(segment_ids)) + 1
+            for part in np.split(np.arange(len(rows)), boundaries):
+                self._append_rows(int(segment_ids[part[0]]), {name: values[part] for name, values in columns.items()})
+            self._apply_retention()
+            self._save_index()
+
+    def _append_rows(self, segment_id, columns):
+        name = str(segment_id * int(self.segment_seconds))
+        segment = self._segments.get(name)
+        if segment is None:
+            segment = self._segments[name] = {
+                'name': name, 'start': float(columns['time'][0]), 'end': float(columns['time'][-1]),
+                'rows': 0, 'class_counts': {}
+            }
+        directory = os.path.join(self.directory, name)
+        os.makedirs(directory, exist_ok=True)
+        if segment['rows'] and columns['time'][0] < segment['end']:
+            # Rows later than hold_seconds: rewrite the segment merged, through
+            # new files so readers holding memory maps keep the old ones
+            columns = self._merge_segment(segment, columns)
+            for column, values in columns.items():
+                path = _column_path(directory, column)
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(np.ascontiguousarray(values).tobytes())
+                os.replace(path + '.tmp', path)
+            self.rows_written -= segment['rows']
+            segment['rows'] = 0
+            segment['class_counts'] = {}
+        else:
+            for column, values in columns.items():
+                with open(_column_path(directory, column), 'ab') as f:
+                    f.write(np.ascontiguousarray(values).tobytes())
+        ids, counts = np.unique(columns['class_id'], return_counts=True)
+        for class_id, count in zip(ids.tolist(), counts.tolist()):
+            key = str(class_id)
+            segment['class_counts'][key] = segment['class_counts'].get(key, 0) + count
+        segment['rows'] += len(columns['time'])
+        segment['start'] = min(segment['start'], float(columns['time'][0]))
+        segment['end'] = max(segment['end'], float(columns['time'][-1]))
+        self.rows_written += len(columns['time'])
+
+    def _merge_segment(self, segment, columns):
+        existing = self._read_segment(segment)
+        merged = {name: np.concatenate([existing[name], columns[name]]) for name in COLUMNS}
+        order = np.argsort(merged['time'], kind='stable')
+        return {name: values[order] for name, values in merged.items()}
+
+    def _apply_retention(self):
+        if self.retention_seconds is None:
+            return
+        cutoff = time.time() - self.retention_seconds
+        for name in [name for name, segment in self._segments.items() if segment['end'] < cutoff]:
+            del self._segments[name]
+            shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.directory, 'index.json')) as f:
+                index = json.load(f)
+            segments = {segment['name']: segment for segment in index['segments']}
+            classes = {int(class_id): name for class_id, name in index.get('classes', {}).items()}
+            return segments, classes
+        except (OSError, ValueError, KeyError):
+            return {}, {}
+
+    def _save_index(self):
+        path = os.path.join(self.directory, 'index.json')
+        segments = sorted(self._segments.values(), key=lambda segment: segment['start'])
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': 1, 'classes': {str(k): v for k, v in self.classes.items()},
+                       'segments': segments}, f)
+        os.replace(path + '.tmp', path)
+
+    # Queries
+
+    def _read_segment(self, segment, start=None, end=None):
+        """Read a segment's rows within [start, end] as memory-mapped column slices."""
+        directory = os.path.join(self.directory, segment['name'])
+        arrays = {}
+        rows = segment['rows']
+        for name, (dtype, width) in COLUMNS.items():
+            path = _column_path(directory, name)
+            available = os.path.getsize(path) // (dtype.itemsize * width) if os.path.exists(path) else 0
+            rows = min(rows, available)
+        for name, (dtype, width) in COLUMNS.items():
+            if rows == 0:
+                arrays[name] = np.empty((0, width) if width > 1 else 0, dtype=dtype)
+                continue
+            shape = (rows, width) if width > 1 else (rows,)
+            arrays[name] = np.memmap(_column_path(directory, name), dtype=dtype, mode='r', shape=shape)
+        times = arrays['time']
+        lo = np.searchsorted(times, start, 'left') if start is not None else 0
+        hi = np.searchsorted(times, end, 'right') if end is not None else len(times)
+        return {name: values[lo:hi] for name, values in arrays.items()}
+
+    def _segments_in(self, start, end, class_ids):
+        """Get the segments overlapping [start, end] that hold any of the classes, oldest first."""
+        keys = None if class_ids is None else {str(class_id) for class_id in class_ids}
+        with self._write_lock:
+            segments = sorted(self._segments.values(), key=lambda segment: segment['start'])
+        return [
+            segment for segment in segments
+            if not ((start is not None and segment['end'] < start) or (end is not None and segment['start'] > end))
+            and (keys is None or keys.intersection(segment['class_counts']))
+        ]
+
+    def _read_matching(self, segment, start, end, class_ids):
+        columns = self._read_segment(segment, start, end)
+        if class_ids is not None:
+            mask = np.isin(columns['class_id'], list(class_ids))
+            columns = {name: values[mask] for name, values in columns.items()}
+        return columns
+
+    def _select(self, start, end, class_ids):
+        """Yield column dicts of matching rows per segment, oldest first."""
+        for segment in self._segments_in(start, end, class_ids):
+            columns = self._read_matching(segment, start, end, class_ids)
+            if len(columns['time']):
+                yield columns
+
+    def class_ids(self, names):
+        """Map class names to the class ids seen in the log (unknown names are ignored)."""
+        by_name = {name: class_id for class_id, name in self.classes.items()}
+        return [by_name[name] for name in names if name in by_name]
+
+    def query(self, start=None, end=None, class_ids=None, limit=1000):
+        """
+        Get detections in a time range, newest first.
+
+        Args:
+            start: Earliest time (unix seconds), inclusive
+            end: Latest time, inclusive
+            class_ids: Only these class ids; all if None
+            limit: Maximum rows returned
+
+        Returns:
+            dict: total matching rows and the newest `limit` rows as dicts
+        """
+        total = 0
+        rows = []
+        for segment in reversed(self._segments_in(start, end, class_ids)):
+            covered = (start is None or segment['start'] >= start) and (end is None or segment['end'] <= end)
+            if covered and len(rows) >= limit:
+                # Enough rows already: count whole segments from the index
+                counts = segment['class_counts']
+                total += segment['rows'] if class_ids is None else sum(
+                    counts.get(str(class_id), 0) for class_id in class_ids)
+                continue
+            part = self._read_matching(segment, start, end, class_ids)
+            total += len(part['time'])
+            for i in range(len(part['time']) - 1, -1, -1):
+                if len(rows) >= limit:
+                    break
+                rows.append({
+                    'time': float(part['time'][i]),
+                    'class_id': int(part['class_id'][i]),
+                    'class_name': self.classes.get(int(part['class_id'][i])),
+                    'confidence': round(float(part['confidence'][i]), 3),
+                    'bbox': part['bbox'][i].tolist(),
+                    'lat': None if np.isnan(part['lat'][i]) else float(part['lat'][i]),
+                    'lon': None if np.isnan(part['lon'][i]) else float(part['lon'][i]),
+                    'track_id': None if part['track_id'][i] < 0 else int(part['track_id'][i])
+                })
+        return {'total': total, 'detections': rows}
+
+    def counts(self, start=None, end=None, bucket_seconds=60, class_ids=None):
+        """
+        Count detections per class in fixed time buckets.
+
+        Returns:
+            list: {start, counts: {class_name: n}} per non-empty bucket, oldest first
+        """
+        buckets = {}
+        for part in self._select(start, end, class_ids):
+            keys = (part['time'] // bucket_seconds).astype(np.int64) * (1 << 16) + part['class_id']
+            unique, counts = np.unique(keys, return_counts=True)
+            for key, count in zip(unique.tolist(), counts.tolist()):
+                bucket, class_id = divmod(key, 1 << 16)
+                name = self.classes.get(class_id, str(class_id))
+                entry = buckets.setdefault(bucket, {})
+                entry[name] = entry.get(name, 0) + count
+        return [{'start': bucket * bucket_seconds, 'counts': buckets[bucket]} for bucket in sorted(buckets)]
+
+    def get_status(self):
+        """Get row counts, pending rows and the time span of the log."""
+        with self._write_lock:
+            segments = list(self._segments.values())
+        return {
+            'directory': os.path.abspath(self.directory),
+            'segments': len(segments),
+            'rows': sum(segment['rows'] for segment in segments),
+            'pending': len(self._pending),
+            'start': min((segment['start'] for segment in segments), default=None),
+            'end': max((segment['end'] for segment in segments), default=None),
+            'last_error': self.last_error
+        }
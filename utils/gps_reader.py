@@ -0,0 +1,457 @@
+"""
+GPS Reader Utilities
+Streams position fixes from gpsd, a replayed NMEA log or a session replay in a background thread,
+tracking fix quality (mode, satellites, HDOP) and reconnecting with backoff.
+"""
+
+import json
+import queue
+import socket
+import threading
+import time
+
+
+# gpsd / NMEA GSA fix modes
+FIX_MODE_NAMES = {0: "unknown", 1: "no fix", 2: "2d", 3: "3d"}
+
+
+def _nmea_checksum_ok(sentence):
+    """Validate the *XX checksum of an NMEA sentence (sentences without one pass)."""
+    if '*' not in sentence:
+        return True
+    body, checksum = sentence[1:].split('*', 1)
+    calculated = 0
+    for char in body:
+        calculated ^= ord(char)
+    try:
+        return calculated == int(checksum[:2], 16)
+    except ValueError:
+        return False
+
+
+def _nmea_coordinate(value, hemisphere):
+    """Convert an NMEA ddmm.mmmm / dddmm.mmmm value to signed decimal degrees."""
+    if not value:
+        return None
+    dot = value.index('.') if '.' in value else len(value)
+    degrees = float(value[:dot - 2])
+    minutes = float(value[dot - 2:])
+    result = degrees + minutes / 60.0
+    return -result if hemisphere in ('S', 'W') else result
+
+
+def _nmea_seconds(value):
+    """Convert an NMEA hhmmss.ss time to seconds since midnight."""
+    if len(value) < 6:
+        return None
+    return int(value[0:2]) * 3600 + int(value[2:4]) * 60 + float(value[4:])
+
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_nmea_sentence(sentence):
+    """
+    Parse one NMEA sentence into fix fields.
+
+    Supports GGA (position, fix quality, satellites used, HDOP, altitude),
+    RMC (position, validity, speed, track), GSA (fix mode, HDOP) and GSV
+    (satellites in view) from any talker (GP, GN, GL, ...). Only GSA sets
+    `mode`; GGA and RMC report `fix_quality` and `fix_valid` for sources to
+    infer a mode from when a log has no GSA.
+
+    Args:
+        sentence: NMEA sentence, e.g. "$GPGGA,...*47"
+
+    Returns:
+        dict: Parsed fields (may be empty), or None if invalid or unsupported
+    """
+    sentence = sentence.strip()
+    if not sentence.startswith('$') or not _nmea_checksum_ok(sentence):
+        return None
+
+    fields = sentence[1:].split('*', 1)[0].split(',')
+    kind = fields[0][2:]
+
+    try:
+        if kind == 'GGA' and len(fields) >= 10:
+            update = {'nmea_time': _nmea_seconds(fields[1])}
+            if fields[6]:
+                update['fix_quality'] = int(fields[6])
+            if update.get('fix_quality'):
+                update['lat'] = _nmea_coordinate(fields[2], fields[3])
+                update['lon'] = _nmea_coordinate(fields[4], fields[5])
+                update['alt'] = _float_or_none(fields[9])
+            if fields[7]:
+                update['satellites_used'] = int(fields[7])
+            if fields[8]:
+                update['hdop'] = float(fields[8])
+            return update
+
+        if kind == 'RMC' and len(fields) >= 9:
+            update = {'nmea_time': _nmea_seconds(fields[1]), 'fix_valid': fields[2] == 'A'}
+            if fields[2] == 'A':
+                update['lat'] = _nmea_coordinate(fields[3], fields[4])
+                update['lon'] = _nmea_coordinate(fields[5], fields[6])
+                speed_knots = _float_or_none(fields[7])
+                update['speed'] = speed_knots * 0.514444 if speed_knots is not None else None
+                update['track'] = _float_or_none(fields[8])
+            return update
+
+        if kind == 'GSA' and len(fields) >= 17:
+            update = {}
+            if fields[2]:
+                update['mode'] = int(fields[2])
+            if fields[16]:
+                update['hdop'] = float(fields[16])
+            return update
+
+        if kind == 'GSV' and len(fields) >= 4:
+            return {'satellites_visible': int(fields[3])} if fields[3] else {}
+    except (ValueError, IndexError):
+        return None
+
+    return None
+
+
+def parse_gpsd_report(report):
+    """
+    Convert a gpsd JSON report into fix fields.
+
+    Args:
+        report: Decoded gpsd report dict
+
+    Returns:
+        dict: Parsed fields, or None for report classes that carry no fix data
+    """
+    report_class = report.get('class')
+
+    if report_class == 'TPV':
+        update = {'mode': report.get('mode', 0)}
+        for key in ('lat', 'lon', 'speed', 'track'):
+            if key in report:
+                update[key] = report[key]
+        if 'altMSL' in report or 'alt' in report:
+            update['alt'] = report.get('altMSL', report.get('alt'))
+        if 'time' in report:
+            update['time'] = report['time']
+        return update
+
+    if report_class == 'SKY':
+        update = {}
+        if 'hdop' in report:
+            update['hdop'] = report['hdop']
+        satellites = report.get('satellites')
+        if satellites is not None:
+            update['satellites_visible'] = len(satellites)
+            update['satellites_used'] = sum(1 for sat in satellites if sat.get('used'))
+        elif 'uSat' in report:
+            update['satellites_used'] = report['uSat']
+            update['satellites_visible'] = report.get('nSat', report['uSat'])
+        return update
+
+    return None
+
+
+class GpsdSource:
+    """Streams JSON reports from a gpsd daemon."""
+
+    def __init__(self, host='127.0.0.1', port=2947, timeout=2.0):
+        """
+        Initialize the gpsd source.
+
+        Args:
+            host: gpsd host
+            port: gpsd port
+            timeout: Socket connect/read timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.name = f"gpsd {host}:{port}"
+
+    def updates(self, running):
+        """
+        Yield fix updates until `running()` returns False.
+
+        Raises:
+            OSError: When the connection fails or is closed by gpsd
+        """
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(b'?WATCH={"enable":true,"json":true};\n')
+            buffer = b''
+            while running():
+                try:
+                    chunk = sock.recv(4096)
+                except socket.timeout:
+                    continue
+                if not chunk:
+                    raise ConnectionError("gpsd closed the connection")
+
+                # Reports are newline-delimited JSON; keep any partial line
+                buffer += chunk
+                lines = buffer.split(b'\n')
+                buffer = lines.pop()
+                for line in lines:
+                    if not line.strip():
+                        continue
+                    try:
+                        update = parse_gpsd_report(json.loads(line))
+                    except ValueError:
+                        continue
+                    if update:
+                        yield update
+
+
+class NMEAFileSource:
+    """
+    Replays an NMEA log as a local stand-in for a receiver.
+
+    Sentences are paced by the differences between their timestamps (scaled
+    by `speed`), or at `rate` epochs per second when the log has no times.
+    The fix mode comes from GSA; until a log has shown a GSA sentence it is
+    inferred from GGA fix quality (3D with an altitude) and RMC validity.
+    """
+
+    def __init__(self, path, rate=10.0, speed=1.0, loop=True):
+        """
+        Initialize the NMEA replay source.
+
+        Args:
+            path: NMEA log file
+            rate: Epochs per second when the log has no usable timestamps
+            speed: Replay speed multiplier for timestamped logs
+            loop: Restart from the beginning at end of file
+        """
+        self.path = path
+        self.rate = rate
+        self.speed = speed
+        self.loop = loop
+        self.name = f"nmea {path}"
+
+    def updates(self, running):
+        """
+        Yield fix updates until `running()` returns False or the log ends.
+
+        Raises:
+            OSError: When the log cannot be read
+        """
+        while running():
+            last_epoch = None
+            has_gsa = False
+            inferred_mode = 0
+            with open(self.path, 'r', errors='replace') as f:
+                for line in f:
+                    if not running():
+                        return
+                    update = parse_nmea_sentence(line)
+                    if update is None:
+                        continue
+
+                    quality = update.pop('fix_quality', None)
+                    valid = update.pop('fix_valid', None)
+                    if 'mode' in update:
+                        has_gsa = True
+                    elif not has_gsa and (quality is not None or valid is not None):
+                        if quality == 0 or valid is False:
+                            inferred_mode = 1
+                        elif quality:
+                            inferred_mode = 3 if update.get('alt') is not None else 2
+                        else:
+                            inferred_mode = max(inferred_mode, 2)
+                        update['mode'] = inferred_mode
+
+                    epoch = update.pop('nmea_time', None)
+                    if epoch is None:
+                        if 'lat' in update:
+                            time.sleep(1.0 / self.rate / self.speed)
+                    elif epoch != last_epoch:
+                        if last_epoch is not None:
+                            delay = epoch - last_epoch
+                            if not 0 < delay <= 1.0:
+                                delay = 1.0 / self.rate
+                            time.sleep(delay / self.speed)
+                        last_epoch = epoch
+                    if update:
+                        yield update
+            if not self.loop:
+                return
+            # Avoid spinning on a log without any position sentences
+            time.sleep(1.0 / self.rate)
+
+
+class StaticSource:
+    """Reports a fixed position; used for development without a receiver."""
+
+    def __init__(self, lat, lon, alt=None, rate=1.0):
+        """
+        Initialize the static source.
+
+        Args:
+            lat: Latitude in decimal degrees
+            lon: Longitude in decimal degrees
+            alt: Altitude in meters
+            rate: Updates per second
+        """
+        self.update = {'lat': lat, 'lon': lon, 'alt': alt, 'mode': 3 if alt is not None else 2}
+        self.rate = rate
+        self.name = "mock"
+
+    def updates(self, running):
+        """Yield the fixed position at `rate` until `running()` returns False."""
+        while running():
+            yield dict(self.update)
+            time.sleep(1.0 / self.rate)
+
+
+class ReplaySource:
+    """
+    Reports fixes handed to push(); used by session replay in place of a receiver.
+
+    Each pushed update is marked done only after the reader has applied and
+    published it, so join() waits until the robot state reflects every fix.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.name = "replay"
+
+    def push(self, update):
+        """Queue a fix update for the reader thread."""
+        self.queue.put(dict(update))
+
+    def join(self):
+        """Block until every pushed update has been applied."""
+        self.queue.join()
+
+    def updates(self, running):
+        """Yield pushed updates until `running()` returns False."""
+        while running():
+            try:
+                update = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                yield update
+            finally:
+                # Resumed once the reader has applied the update
+                self.queue.task_done()
+
+
+class GPSReader:
+    """
+    Reads a GPS source in a background thread and publishes each fix.
+
+    Position updates are published as soon as they are parsed, so the
+    publish rate follows the receiver (typically 5-10 Hz). Connection errors
+    are retried with exponential backoff.
+    """
+
+    def __init__(self, source, on_update=None, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        """
+        Initialize the GPS reader.
+
+        Args:
+            source: GpsdSource, NMEAFileSource, StaticSource or ReplaySource
+            on_update: Callback invoked with the full fix dict after every update
+            reconnect_delay: Initial reconnect delay in seconds
+            max_reconnect_delay: Upper bound for the reconnect delay
+        """
+        self.source = source
+        self.on_update = on_update
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.status = "initializing"
+        self.fix = {
+            'lat': None,
+            'lon': None,
+            'alt': None,
+            'speed': None,
+            'track': None,
+            'time': None,
+            'mode': 0,
+            'satellites_used': 0,
+            'satellites_visible': 0,
+            'hdop': None,
+            'last_fix_time': None,
+        }
+        self.updates_received = 0
+        self.reconnects = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the reader thread if it is not already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="gps-reader")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=2.0):
+        """Stop the reader thread."""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        self._set_status("disconnected")
+
+    def is_running(self):
+        return self._running
+
+    def _set_status(self, status):
+        self.status = status
+        self._publish()
+
+    def _publish(self):
+        if self.on_update is not None:
+            self.on_update(self.get_fix())
+
+    def _run(self):
+        """Read from the source, reconnecting with exponential backoff."""
+        delay = self.reconnect_delay
+        while self._running:
+            self._set_status("connecting")
+            try:
+                for update in self.source.updates(self.is_running):
+                    self._apply(update)
+                    delay = self.reconnect_delay
+            except Exception as e:
+                if not self._running:
+                    break
+                self._set_status(f"error: {e}")
+            else:
+                if not self._running:
+                    break
+                self._set_status("source ended")
+
+            self.reconnects += 1
+            # Sleep in short steps so stop() is not held up by the backoff
+            deadline = time.time() + delay
+            while self._running and time.time() < deadline:
+                time.sleep(0.1)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _apply(self, update):
+        """Merge a parsed update into the current fix and publish it."""
+        with self._lock:
+            self.fix.update(update)
+            if 'lat' in update and update['lat'] is not None:
+                self.fix['last_fix_time'] = time.time()
+            self.updates_received += 1
+            self.status = "active" if self.fix['mode'] >= 2 else "no fix"
+        self._publish()
+
+    def get_fix(self):
+        """Get a copy of the current fix and reader status."""
+        with self._lock:
+            fix = dict(self.fix)
+        fix['status'] = self.status
+        fix['mode_name'] = FIX_MODE_NAMES.get(fix['mode'], "unknown")
+        fix['source'] = self.source.name
+        return fix
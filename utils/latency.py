@@ -0,0 +1,131 @@
+"""
+Latency Utilities
+Per-stage latency tracking for the vision pipelines with rolling percentiles.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class RollingLatency:
+    """
+    Latency samples (milliseconds) over a fixed window of recent observations.
+
+    Samples go into a preallocated ring buffer, so recording is O(1) and
+    memory stays constant; percentiles are computed only when requested.
+    """
+
+    def __init__(self, window=512):
+        """
+        Initialize the rolling window.
+
+        Args:
+            window: Number of most recent samples kept
+        """
+        self.window = window
+        self.samples = np.zeros(window, dtype=np.float64)
+        self.count = 0
+        self.last = None
+
+    def record(self, milliseconds):
+        """Add one sample."""
+        self.samples[self.count % self.window] = milliseconds
+        self.count += 1
+        self.last = milliseconds
+
+    def summary(self):
+        """
+        Get percentiles over the current window.
+
+        Returns:
+            dict: count (all-time), window sample count, p50/p95/p99, mean,
+                max and last in milliseconds; None values when empty
+        """
+        filled = self.samples[:min(self.count, self.window)]
+        if len(filled) == 0:
+            return {'count': 0, 'samples': 0, 'p50': None, 'p95': None, 'p99': None,
+                    'mean': None, 'max': None, 'last': None}
+        p50, p95, p99 = np.percentile(filled, (50, 95, 99))
+        return {
+            'count': self.count,
+            'samples': len(filled),
+            'p50': round(float(p50), 2),
+            'p95': round(float(p95), 2),
+            'p99': round(float(p99), 2),
+            'mean': round(float(filled.mean()), 2),
+            'max': round(float(filled.max()), 2),
+            'last': round(float(self.last), 2)
+        }
+
+
+class StageLatency:
+    """
+    Rolling latency per pipeline stage.
+
+    Usage:
+        latency = StageLatency(('decode', 'inference'))
+        with latency.measure('inference'):
+            run_model()
+    """
+
+    def __init__(self, stages, window=512):
+        """
+        Initialize the stage trackers.
+
+        Args:
+            stages: Stage names, in pipeline order
+            window: Samples kept per stage
+        """
+        self.stages = {stage: RollingLatency(window) for stage in stages}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        """Record a stage duration given in seconds."""
+        with self._lock:
+            self.stages[stage].record(seconds * 1000.0)
+
+    @contextmanager
+    def measure(self, stage):
+        """Time the enclosed block as one sample of `stage`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def percentile(self, stage, q):
+        """Get one percentile (milliseconds) of a stage, or None without samples."""
+        with self._lock:
+            tracker = self.stages[stage]
+            filled = tracker.samples[:min(tracker.count, tracker.window)]
+            return float(np.percentile(filled, q)) if len(filled) else None
+
+    def since(self, stage, count):
+        """
+        Get the samples of a stage recorded after it had `count` samples.
+
+        Args:
+            stage: Stage name
+            count: Sample count from an earlier call (0 for all kept samples)
+
+        Returns:
+            tuple: (current count, numpy array of the newer samples in ms, at
+                most one window)
+        """
+        with self._lock:
+            tracker = self.stages[stage]
+            if count > tracker.count:  # tracker was replaced
+                count = 0
+            new = min(tracker.count - count, tracker.window)
+            if new <= 0:
+                return tracker.count, np.empty(0)
+            index = np.arange(tracker.count - new, tracker.count) % tracker.window
+            return tracker.count, tracker.samples[index]
+
+    def summary(self):
+        """Get the rolling summary of every stage, in pipeline order."""
+        with self._lock:
+            return {stage: tracker.summary() for stage, tracker in self.stages.items()}
@@ -0,0 +1,318 @@
+"""
+Model Artifact Store
+Keeps converted Depth-Anything-V2 weights in a local cache with a manifest of
+encoder configurations and checksums. Weights are stored as safetensors so
+they can be memory-mapped and assigned to the model without extra copies.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import time
+
+
+# Architecture settings for each Depth-Anything-V2 encoder
+ENCODER_CONFIGS = {
+    'vits': {'encoder': 'vits', 'features': 64, 'out_channels': [48, 96, 192, 384]},
+    'vitb': {'encoder': 'vitb', 'features': 128, 'out_channels': [96, 192, 384, 768]},
+    'vitl': {'encoder': 'vitl', 'features': 256, 'out_channels': [256, 512, 1024, 1024]},
+}
+
+# DINOv2 embedding dimension for each encoder
+EMBED_DIM_TO_ENCODER = {
+    384: 'vits',
+    768: 'vitb',
+    1024: 'vitl',
+    1536: 'vitg',
+}
+
+SUPPORTED_DTYPES = ('fp32', 'fp16')
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 digest of a file without reading it into memory at once.
+
+    Args:
+        path: File path
+        chunk_size: Bytes read per chunk
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def infer_encoder_config(state_dict):
+    """
+    Infer the Depth-Anything-V2 architecture from checkpoint tensor shapes.
+
+    Args:
+        state_dict: Mapping of parameter names to tensors
+
+    Returns:
+        dict: Keyword arguments for DepthAnythingV2, or None if unknown
+    """
+    try:
+        embed_dim = state_dict['pretrained.cls_token'].shape[-1]
+        features = state_dict['depth_head.scratch.output_conv1.weight'].shape[1]
+        out_channels = [
+            int(state_dict[f'depth_head.projects.{i}.weight'].shape[0]) for i in range(4)
+        ]
+    except KeyError:
+        return None
+
+    encoder = EMBED_DIM_TO_ENCODER.get(int(embed_dim))
+    if encoder is None:
+        return None
+
+    return {'encoder': encoder, 'features': int(features), 'out_channels': out_channels}
+
+
+def encoder_config_from_filename(path):
+    """
+    Guess the encoder configuration from a checkpoint filename.
+
+    Args:
+        path: Checkpoint path, e.g. depth_anything_v2_vitb.pth
+
+    Returns:
+        dict: Keyword arguments for DepthAnythingV2, or None if unknown
+    """
+    name = os.path.basename(path)
+    for encoder, config in ENCODER_CONFIGS.items():
+        if encoder in name:
+            return dict(config)
+    return None
+
+
+def resolve_pipeline_model(model_name, local_dir=None, offline=False):
+    """
+    Resolve a HuggingFace model id to local files without touching the network.
+
+    Checks, in order: model_name as a directory, a pre-staged copy under
+    local_dir (either <local_dir>/<org>/<name> or <local_dir>/<name>), and
+    the HuggingFace hub cache.
+
+    Args:
+        model_name: HuggingFace model id or local directory
+        local_dir: Directory with pre-staged pipeline models
+        offline: Never fall back to downloading
+
+    Returns:
+        str: Local model directory, the model id when a download is allowed,
+            or None when offline and nothing is staged locally
+    """
+    if os.path.isdir(model_name):
+        return model_name
+
+    if local_dir:
+        for candidate in (os.path.join(local_dir, model_name),
+                          os.path.join(local_dir, model_name.split('/')[-1])):
+            if os.path.isfile(os.path.join(candidate, 'config.json')):
+                return candidate
+
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        cached = try_to_load_from_cache(model_name, 'config.json')
+        if isinstance(cached, str):
+            return os.path.dirname(cached)
+    except ImportError:
+        pass
+
+    return None if offline else model_name
+
+
+class ModelStore:
+    """
+    Cache of converted model artifacts keyed by the source checkpoint hash.
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+    MANIFEST_VERSION = 1
+
+    def __init__(self, cache_dir, verify_checksums=True):
+        """
+        Initialize the model store.
+
+        Args:
+            cache_dir: Directory holding the manifest and converted artifacts
+            verify_checksums: Verify artifact checksums before loading; an
+                artifact is re-hashed only when its size or mtime changed
+        """
+        self.cache_dir = cache_dir
+        self.verify_checksums = verify_checksums
+        self.manifest_path = os.path.join(cache_dir, self.MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        """Read the manifest, starting a new one if missing or unreadable."""
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == self.MANIFEST_VERSION:
+                    return manifest
+                print(f"⚠️  Ignoring model manifest with unsupported version: {self.manifest_path}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Ignoring unreadable model manifest: {e}")
+        return {'version': self.MANIFEST_VERSION, 'sources': {}, 'artifacts': {}}
+
+    def _save_manifest(self):
+        """Write the manifest atomically."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _source_entry(self, checkpoint_path):
+        """
+        Get the manifest entry for a source checkpoint, hashing it if needed.
+
+        The hash is reused while the file size and modification time are
+        unchanged, so a checkpoint is only hashed once.
+        """
+        path = os.path.abspath(checkpoint_path)
+        stat = os.stat(path)
+
+        for sha, entry in self.manifest['sources'].items():
+            if (entry.get('path') == path and entry.get('size') == stat.st_size
+                    and entry.get('mtime') == stat.st_mtime):
+                return sha, entry
+
+        print(f"Hashing checkpoint: {checkpoint_path}")
+        sha = file_sha256(path)
+        entry = self.manifest['sources'].get(sha, {})
+        entry.update({'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime})
+        self.manifest['sources'][sha] = entry
+        self._save_manifest()
+        return sha, entry
+
+    def get_artifact(self, checkpoint_path, dtype='fp32', rebuild=False):
+        """
+        Get a verified cached artifact for a checkpoint, converting it if needed.
+
+        Args:
+            checkpoint_path: Path to the source .pth checkpoint
+            dtype: Weight precision of the artifact ('fp32' or 'fp16')
+            rebuild: Re-export the artifact even if the cached one verifies
+                (e.g. after it failed to load)
+
+        Returns:
+            tuple: (artifact_path, encoder_config)
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported artifact dtype: {dtype}")
+
+        sha, source = self._source_entry(checkpoint_path)
+        key = f"{sha}:{dtype}"
+        entry = self.manifest['artifacts'].get(key)
+
+        if entry is not None and 'encoder' in source and not rebuild:
+            artifact_path = os.path.join(self.cache_dir, entry['file'])
+            if self._verify(artifact_path, entry):
+                return artifact_path, self._encoder_config(source)
+            print(f"⚠️  Cached artifact failed verification, reconverting: {artifact_path}")
+
+        return self._convert(checkpoint_path, sha, source, dtype)
+
+    def _verify(self, artifact_path, entry):
+        """
+        Check that an artifact exists and matches its recorded size and hash.
+
+        A successful hash check is remembered with the file's mtime, so an
+        unchanged artifact is not hashed again on later loads.
+        """
+        if not os.path.exists(artifact_path):
+            return False
+        stat = os.stat(artifact_path)
+        if stat.st_size != entry.get('size'):
+            return False
+        if not self.verify_checksums or entry.get('verified_mtime') == stat.st_mtime:
+            return True
+        if file_sha256(artifact_path) != entry.get('sha256'):
+            return False
+        entry['verified_mtime'] = stat.st_mtime
+        self._save_manifest()
+        return True
+
+    def _encoder_config(self, source):
+        """Extract the DepthAnythingV2 keyword arguments from a source entry."""
+        return {
+            'encoder': source['encoder'],
+            'features': source['features'],
+            'out_channels': list(source['out_channels'])
+        }
+
+    def _convert(self, checkpoint_path, sha, source, dtype):
+        """Convert a .pth checkpoint into a cached safetensors artifact."""
+        import torch
+        from safetensors.torch import save_file
+
+        print(f"Converting checkpoint to {dtype} artifact: {checkpoint_path}")
+        try:
+            state_dict = torch.load(checkpoint_path, map_location='cpu', mmap=True, weights_only=True)
+        except (TypeError, RuntimeError, pickle.UnpicklingError):
+            # Older torch releases or legacy (non-zip) checkpoints cannot be mmapped, and
+            # checkpoints pickling more than tensors fail the weights-only loader; the
+            # configured local checkpoint is trusted, as it was before the artifact cache
+            try:
+                state_dict = torch.load(checkpoint_path, map_location='cpu', weights_only=False)
+            except TypeError:
+                # torch < 1.13 has no weights_only and always unpickles fully
+                state_dict = torch.load(checkpoint_path, map_location='cpu')
+
+        # An encoder config written into the manifest by hand takes precedence
+        if 'encoder' not in source:
+            config = infer_encoder_config(state_dict) or encoder_config_from_filename(checkpoint_path)
+            if config is None:
+                raise ValueError(f"Cannot determine encoder configuration for {checkpoint_path}")
+            source.update(config)
+
+        tensors = {}
+        for name, tensor in state_dict.items():
+            if not isinstance(tensor, torch.Tensor):
+                continue
+            if dtype == 'fp16' and tensor.is_floating_point():
+                tensor = tensor.half()
+            tensors[name] = tensor.contiguous()
+        del state_dict
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        file_name = f"{sha[:16]}-{source['encoder']}-{dtype}.safetensors"
+        artifact_path = os.path.join(self.cache_dir, file_name)
+        tmp_path = artifact_path + '.tmp'
+        save_file(tensors, tmp_path, metadata={'source_sha256': sha, 'encoder': source['encoder'], 'dtype': dtype})
+        del tensors
+        os.replace(tmp_path, artifact_path)
+
+        self.manifest['artifacts'][f"{sha}:{dtype}"] = {
+            'file': file_name,
+            'dtype': dtype,
+            'sha256': file_sha256(artifact_path),
+            'size': os.path.getsize(artifact_path),
+            'verified_mtime': os.stat(artifact_path).st_mtime,
+            'created': time.time()
+        }
+        self._save_manifest()
+        print(f"✓ Cached model artifact: {artifact_path}")
+        return artifact_path, self._encoder_config(source)
+
+    def load_state_dict(self, artifact_path):
+        """
+        Memory-map an artifact's tensors.
+
+        Args:
+            artifact_path: Path returned by get_artifact()
+
+        Returns:
+            dict: Parameter names mapped to CPU tensors backed by the file
+        """
+        from safetensors.torch import load_file
+        return load_file(artifact_path, device='cpu')
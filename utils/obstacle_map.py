@@ -0,0 +1,272 @@
+"""
+Obstacle Map Utilities
+Fuses the latest depth map and AI detections into a coarse obstacle grid in
+front of the robot, and precomputes the motion decision the movement
+endpoints read.
+
+The grid covers the camera image in rows x columns cells. The depth model
+is relative (Depth-Anything: larger values are nearer, up to scale), so
+values are divided by the floor at the bottom edge of the image, which for a
+fixed camera is always about the same distance away: nearness 1 is as close
+as that floor. On flat ground the floor's nearness grows roughly linearly
+with the image row; a line fitted to the lowest rows predicts the floor, and
+cells clearly nearer than the prediction are something standing on it (or a
+wall rising from it). The reference and the floor line are smoothed across
+frames. Detection
+boxes add weaker evidence and label the cells with their class. Occupancy is
+an exponential moving average of the evidence, so one noisy frame neither
+stops the robot nor clears a real obstacle.
+
+How old a map may get before it is stale follows the depth pipeline: the
+map records how old each map was when the next one replaced it, so on a slow
+CPU, where one pass takes seconds, the gate still runs on real evidence.
+"""
+
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from .latency import RollingLatency
+
+# Forward directions and the corridor sectors (left, center, right) they drive into
+FORWARD_SECTORS = {
+    'forward': (1,),
+    'forward-left': (0, 1),
+    'forward-right': (1, 2),
+}
+# Gate states: "active" (fresh map), "stale" (depth is on but the map is old,
+# e.g. depth paused), "inactive" (depth is off, nothing feeds the map)
+GATE_STATES = ('active', 'stale', 'inactive')
+CLEAR = {'action': 'clear', 'speed_limit': 100, 'hazard': 0.0, 'classes': []}
+
+
+class ObstacleMap:
+    """
+    Incrementally updated obstacle grid with an O(1) motion check.
+
+    update() runs on the depth worker thread once per depth map; all grid
+    work is vectorized numpy on a few hundred cells. It ends by swapping in a
+    new immutable state holding the per-direction decisions, so check() is a
+    dictionary lookup that never waits for an inference or a lock.
+
+    The owner sets `active` while the depth pipeline is expected to feed the
+    map. An active map fails safe once it is older than `max_age_factor`
+    times the p95 age maps reach before the next one replaces them (at least
+    `max_age`, at most `max_age_limit`): forward motion is slowed to
+    `slow_speed` until fresh depth arrives. While inactive nothing gates
+    motion and forward motion is limited to `inactive_speed_limit`.
+    """
+
+    def __init__(self, rows=12, cols=16, smoothing=0.5, floor_rows=4, margin=0.12, corridor=0.5,
+                 slow_threshold=0.35, stop_threshold=0.6, slow_speed=40, max_age=1.0,
+                 max_age_factor=2.0, max_age_limit=30.0, inactive_speed_limit=40, detection_evidence=0.5):
+        """
+        Initialize the map.
+
+        Args:
+            rows: Grid rows over the image height
+            cols: Grid columns over the image width
+            smoothing: Weight of the newest frame in the occupancy average (0..1]
+            floor_rows: Lowest grid rows used to fit the floor model
+            margin: Nearness above the floor prediction that counts as an obstacle
+            corridor: Fraction of the columns, centered, the robot drives into
+            slow_threshold: Hazard (occupancy x nearness) at which forward motion is slowed
+            stop_threshold: Hazard at which forward motion is refused
+            slow_speed: Speed limit (percent) while slowed or while the map is stale
+            max_age: Shortest age (seconds) after which the map is stale and not trusted
+            max_age_factor: Multiple of the p95 replacement age after which the map is stale
+            max_age_limit: Age (seconds) after which the map is always stale
+            inactive_speed_limit: Speed limit (percent) while the gate is inactive
+            detection_evidence: Obstacle evidence of a cell covered by a detection box
+        """
+        self.rows = rows
+        self.cols = cols
+        self.smoothing = smoothing
+        self.floor_rows = floor_rows
+        self.margin = margin
+        self.slow_threshold = slow_threshold
+        self.stop_threshold = stop_threshold
+        self.slow_speed = slow_speed
+        self.max_age = max_age
+        self.max_age_factor = max_age_factor
+        self.max_age_limit = max_age_limit
+        self.inactive_speed_limit = inactive_speed_limit
+        self.detection_evidence = detection_evidence
+        self.active = False
+        # Decisions without a fresh map, and for directions the gate does not check
+        self._unknown = {
+            'stale': {'action': 'unknown', 'speed_limit': slow_speed, 'hazard': None, 'classes': [],
+                      'gate': 'stale'},
+            'inactive': {'action': 'unknown', 'speed_limit': inactive_speed_limit, 'hazard': None,
+                         'classes': [], 'gate': 'inactive'}
+        }
+        self._clear = {gate: dict(CLEAR, gate=gate) for gate in GATE_STATES}
+        width = max(3, int(round(cols * corridor)))
+        start = (cols - width) // 2
+        bounds = np.linspace(start, start + width, 4).round().astype(int).tolist()
+        self.sectors = [slice(bounds[i], bounds[i + 1]) for i in range(3)]
+        self.updates = 0
+        # Age (ms) of each map when the next one replaced it
+        self._replaced_ages = RollingLatency(32)
+        self._row_index = np.arange(rows, dtype=np.float32)
+        self._occupancy = np.zeros((rows, cols), dtype=np.float32)
+        self._floor = None
+        self._reference = None
+        self._update_lock = threading.Lock()
+        self._state = None
+
+    def update(self, depth, detections=(), timestamp=None):
+        """
+        Fold one depth map and its detections into the grid.
+
+        Args:
+            depth: Raw depth map (larger values nearer), any resolution
+            detections: Detection dicts with bbox in depth-map pixels and class_name
+            timestamp: Capture time (unix seconds); now if None
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        height, width = depth.shape[:2]
+
+        # 2x2 sub-cells per cell, max-pooled: small near objects are not averaged away
+        small = cv2.resize(np.asarray(depth, dtype=np.float32), (self.cols * 2, self.rows * 2),
+                           interpolation=cv2.INTER_AREA)
+        reference = float(np.median(small[-1]))
+        with self._update_lock:
+            if self._reference is None or self._reference <= 0:
+                self._reference = reference
+            else:
+                self._reference += self.smoothing * (reference - self._reference)
+            reference = self._reference
+        nearness = np.clip(small / reference, 0.0, 1.0) if reference > 0 else np.zeros_like(small)
+        cells = nearness.reshape(self.rows, 2, self.cols, 2).max(axis=(1, 3))
+
+        # Floor model from the lower quartile of the lowest rows, where the floor dominates
+        fit_rows = self._row_index[-self.floor_rows:]
+        slope, intercept = np.polyfit(fit_rows, np.percentile(cells[-self.floor_rows:], 25, axis=1), 1)
+
+        labels = np.full((self.rows, self.cols), -1, dtype=np.int16)
+        names = []
+        boxes = []
+        for detection in detections:
+            x1, y1, x2, y2 = detection['bbox']
+            boxes.append((int(y1 * self.rows / height), int(np.ceil(y2 * self.rows / height)),
+                          int(x1 * self.cols / width), int(np.ceil(x2 * self.cols / width))))
+            names.append(detection.get('class_name', str(detection.get('class_id'))))
+
+        with self._update_lock:
+            if self._floor is None:
+                self._floor = (slope, intercept)
+            else:
+                self._floor = tuple(old + self.smoothing * (new - old)
+                                    for old, new in zip(self._floor, (slope, intercept)))
+            floor = np.clip(self._floor[0] * self._row_index + self._floor[1], 0.0, 1.0)[:, None]
+            evidence = (cells - floor > self.margin).astype(np.float32)
+            for index, (r0, r1, c0, c1) in enumerate(boxes):
+                region = (slice(max(0, r0), r1), slice(max(0, c0), c1))
+                np.maximum(evidence[region], self.detection_evidence, out=evidence[region])
+                labels[region] = index
+
+            self._occupancy += self.smoothing * (evidence - self._occupancy)
+            occupancy = self._occupancy.copy()
+            self.updates += 1
+            max_age = self._next_max_age(timestamp)
+
+        hazard = occupancy * cells
+        sector_hazard = [float(hazard[:, sector].max()) for sector in self.sectors]
+        sector_classes = []
+        for sector in self.sectors:
+            hot = labels[:, sector][hazard[:, sector] >= self.slow_threshold]
+            sector_classes.append(sorted({names[i] for i in np.unique(hot[hot >= 0]).tolist()}))
+
+        decisions = {}
+        for direction, sectors in FORWARD_SECTORS.items():
+            level = max(sector_hazard[i] for i in sectors)
+            classes = sorted({name for i in sectors for name in sector_classes[i]})
+            if level >= self.stop_threshold:
+                action, speed_limit = 'stop', 0
+            elif level >= self.slow_threshold:
+                action, speed_limit = 'slow', self.slow_speed
+            else:
+                action, speed_limit = 'clear', 100
+            decisions[direction] = {'action': action, 'speed_limit': speed_limit,
+                                    'hazard': round(level, 3), 'classes': classes, 'gate': 'active'}
+
+        self._state = {
+            'time': timestamp,
+            'max_age': max_age,
+            'occupancy': occupancy,
+            'nearness': cells,
+            'labels': labels,
+            'names': names,
+            'decisions': decisions
+        }
+
+    def _next_max_age(self, timestamp):
+        """Record the age of the map being replaced and get the stale age for the new one."""
+        now = time.time()
+        previous = self._state
+        # Longer gaps are pauses (depth off or paused), not the pipeline's pace
+        if previous is not None and now - previous['time'] <= self.max_age_limit:
+            self._replaced_ages.record((now - previous['time']) * 1000.0)
+        if self._replaced_ages.count:
+            expected = self._replaced_ages.summary()['p95'] / 1000.0
+        else:
+            # First map: the next one arrives at least one more pass later
+            expected = 2 * max(0.0, now - timestamp)
+        return min(self.max_age_limit, max(self.max_age, self.max_age_factor * expected))
+
+    def check(self, direction, now=None):
+        """
+        Get the motion decision for a direction.
+
+        Args:
+            direction: Movement direction, e.g. "forward" or "forward-left";
+                other directions are always clear
+            now: Current time (unix seconds); now if None
+
+        Returns:
+            dict: action ("clear", "slow", "stop" or "unknown" without a
+                fresh map), speed_limit in percent, hazard, the classes in the
+                way and the gate state (see GATE_STATES)
+        """
+        state = self._state
+        gate = self.gate_state(now, state)
+        if direction not in FORWARD_SECTORS:
+            return self._clear[gate]
+        if gate != 'active':
+            return self._unknown[gate]
+        return state['decisions'][direction]
+
+    def gate_state(self, now=None, state=None):
+        """Get the gate state: "active", "stale" or "inactive" (see GATE_STATES)."""
+        if not self.active:
+            return 'inactive'
+        state = self._state if state is None else state
+        now = time.time() if now is None else now
+        if state is None or now - state['time'] > state['max_age']:
+            return 'stale'
+        return 'active'
+
+    def get_grid(self):
+        """Get the current grid, labels and decisions for display and debugging."""
+        state = self._state
+        gate = self.gate_state(state=state)
+        if state is None:
+            return {'rows': self.rows, 'cols': self.cols, 'gate': gate, 'updates': 0, 'age': None,
+                    'max_age': None}
+        labels = state['labels']
+        return {
+            'rows': self.rows,
+            'cols': self.cols,
+            'gate': gate,
+            'updates': self.updates,
+            'age': round(time.time() - state['time'], 3),
+            'max_age': round(state['max_age'], 3),
+            'sectors': [[sector.start, sector.stop] for sector in self.sectors],
+            'occupancy': np.round(state['occupancy'], 2).tolist(),
+            'nearness': np.round(state['nearness'], 2).tolist(),
+            'labels': [[state['names'][i] if i >= 0 else None for i in row] for row in labels.tolist()],
+            'decisions': state['decisions']
+        }
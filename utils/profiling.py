@@ -0,0 +1,359 @@
+"""
+Profiling Utilities
+On-demand profilers for a running process: a sampling CPU profiler with
+flamegraph (folded stack) output, tracemalloc allocation snapshots and diffs,
+and a torch profiler capture around model inferences.
+
+Everything is bounded so it is safe to trigger in production: sampling runs
+for a limited time at a limited rate, the number of distinct stacks and
+snapshots kept is capped, and reports return only the top entries.
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler that periodically samples every thread's stack.
+
+    Samples are aggregated as folded stacks ("thread;outer;...;inner count"),
+    the input format of flamegraph.pl, speedscope and similar tools. Frames
+    are keyed by function (name, file and first line), not by the current
+    line, which keeps the number of distinct stacks small.
+    """
+
+    def __init__(self, max_seconds=60.0, max_hz=250, max_stacks=10000, max_depth=64):
+        """
+        Initialize the profiler.
+
+        Args:
+            max_seconds: Longest allowed capture
+            max_hz: Highest allowed sampling rate
+            max_stacks: Distinct stacks kept; further new stacks are counted as dropped
+            max_depth: Innermost frames kept per stack
+        """
+        self.max_seconds = max_seconds
+        self.max_hz = max_hz
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._counts = {}
+        self._info = {'state': 'idle'}
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds, hz=100, thread_id=None):
+        """
+        Start a capture; it stops by itself after `seconds`.
+
+        Args:
+            seconds: Capture length, clamped to max_seconds
+            hz: Samples per second, clamped to max_hz
+            thread_id: Only sample this thread (e.g. the event loop); all threads if None
+
+        Returns:
+            bool: False if a capture is already running
+        """
+        with self._lock:
+            if self.running:
+                return False
+            seconds = max(0.1, min(float(seconds), self.max_seconds))
+            hz = max(1.0, min(float(hz), self.max_hz))
+            self._counts = {}
+            self._info = {'state': 'running', 'started': time.time(), 'seconds': seconds, 'hz': hz,
+                          'thread_id': thread_id, 'samples': 0, 'dropped': 0, 'overhead_ms': 0.0}
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, args=(seconds, hz, thread_id),
+                                            name="sampling-profiler", daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        """Stop the running capture early and wait for it to finish."""
+        self._stop_event.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=2.0)
+
+    def _run(self, seconds, hz, thread_id):
+        own_id = threading.get_ident()
+        interval = 1.0 / hz
+        deadline = time.perf_counter() + seconds
+        names = {}
+        names_refreshed = 0.0
+        counts = self._counts
+        info = self._info
+        while not self._stop_event.wait(interval) and time.perf_counter() < deadline:
+            sample_start = time.perf_counter()
+            if sample_start - names_refreshed > 1.0:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                names_refreshed = sample_start
+            for ident, frame in sys._current_frames().items():
+                if ident == own_id or (thread_id is not None and ident != thread_id):
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                key = ";".join(reversed(stack))
+                if key in counts:
+                    counts[key] += 1
+                elif len(counts) < self.max_stacks:
+                    counts[key] = 1
+                else:
+                    info['dropped'] += 1
+            info['samples'] += 1
+            info['overhead_ms'] += (time.perf_counter() - sample_start) * 1000.0
+        info['state'] = 'finished'
+        info['finished'] = time.time()
+
+    def status(self):
+        """Get capture state: samples taken, stacks kept and sampling overhead."""
+        info = dict(self._info)
+        info['stacks'] = len(self._counts)
+        if 'overhead_ms' in info:
+            info['overhead_ms'] = round(info['overhead_ms'], 1)
+        return info
+
+    def folded(self):
+        """Get the last capture as folded stacks, heaviest first."""
+        counts = list(self._counts.items())
+        counts.sort(key=lambda item: item[1], reverse=True)
+        return "\n".join(f"{stack} {count}" for stack, count in counts) + "\n"
+
+
+class AllocationTracker:
+    """
+    tracemalloc-based allocation snapshots and diffs.
+
+    Tracing slows allocations down, so it only runs between start() and
+    stop(), and stops by itself after at most `max_seconds`; the snapshots
+    taken stay available after an automatic stop. At most `max_snapshots`
+    named snapshots are kept (oldest evicted).
+    """
+
+    def __init__(self, max_snapshots=4, max_frames=25, max_seconds=300.0):
+        self.max_snapshots = max_snapshots
+        self.max_frames = max_frames
+        self.max_seconds = max_seconds
+        self._snapshots = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer = None
+        self._stops_at = None
+
+    @property
+    def tracing(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=10, seconds=None):
+        """
+        Start tracing allocations; tracing stops by itself after `seconds`.
+
+        Args:
+            frames: Stack frames stored per allocation, clamped to max_frames
+            seconds: Tracing time, clamped to max_seconds (max_seconds if None)
+
+        Returns:
+            bool: False if tracing is already running
+        """
+        with self._lock:
+            if tracemalloc.is_tracing():
+                return False
+            seconds = self.max_seconds if seconds is None else max(1.0, min(float(seconds), self.max_seconds))
+            tracemalloc.start(max(1, min(int(frames), self.max_frames)))
+            self._stops_at = time.time() + seconds
+            self._timer = threading.Timer(seconds, self._expire)
+            self._timer.daemon = True
+            self._timer.start()
+            return True
+
+    def _expire(self):
+        """Stop tracing at the deadline, keeping the snapshots."""
+        with self._lock:
+            self._timer = None
+            self._stops_at = None
+            tracemalloc.stop()
+
+    def stop(self):
+        """Stop tracing and drop every snapshot."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._stops_at = None
+            self._snapshots.clear()
+            tracemalloc.stop()
+
+    def snapshot(self, name):
+        """
+        Take a named snapshot.
+
+        Returns:
+            dict: Snapshot name, traced memory and the snapshots kept
+
+        Raises:
+            RuntimeError: If tracing has not been started
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Allocation tracing is not running")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        with self._lock:
+            self._snapshots.pop(name, None)
+            self._snapshots[name] = snapshot
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+            names = list(self._snapshots)
+        current, peak = tracemalloc.get_traced_memory()
+        return {'name': name, 'traced_bytes': current, 'peak_bytes': peak, 'snapshots': names}
+
+    def _get(self, name):
+        with self._lock:
+            snapshot = self._snapshots.get(name)
+        if snapshot is None:
+            raise KeyError(name)
+        return snapshot
+
+    def top(self, name, limit=20, key_type='lineno'):
+        """
+        Get the largest allocation sites of a snapshot.
+
+        Returns:
+            list: {location, size_bytes, count} dicts, largest first
+        """
+        stats = self._get(name).statistics(key_type)[:limit]
+        return [{'location': self._location(stat.traceback), 'size_bytes': stat.size, 'count': stat.count}
+                for stat in stats]
+
+    def diff(self, old_name, new_name, limit=20, key_type='lineno'):
+        """
+        Compare two snapshots.
+
+        Returns:
+            list: {location, size_diff_bytes, size_bytes, count_diff} dicts,
+                largest absolute growth first
+        """
+        stats = self._get(new_name).compare_to(self._get(old_name), key_type)[:limit]
+        return [{'location': self._location(stat.traceback), 'size_diff_bytes': stat.size_diff,
+                 'size_bytes': stat.size, 'count_diff': stat.count_diff}
+                for stat in stats]
+
+    @staticmethod
+    def _location(traceback):
+        frame = traceback[0]
+        return f"{frame.filename}:{frame.lineno}"
+
+    def status(self):
+        """Get tracing state, when tracing stops, traced memory and the snapshots kept."""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            names = list(self._snapshots)
+            stops_at = self._stops_at
+        return {'tracing': tracemalloc.is_tracing(), 'frames': tracemalloc.get_traceback_limit(),
+                'stops_at': stops_at, 'traced_bytes': current, 'peak_bytes': peak, 'snapshots': names}
+
+
+class InferenceProfiler:
+    """
+    torch profiler capture around the next N model inferences.
+
+    Services wrap each inference in `capture()`; while nothing is armed this
+    costs one attribute check. When armed, the profiler starts at the next
+    inference and stops after the requested number of inferences, keeping a
+    bounded operator summary.
+    """
+
+    def __init__(self, max_inferences=50, row_limit=30):
+        self.max_inferences = max_inferences
+        self.row_limit = row_limit
+        self._remaining = 0
+        self._requested = 0
+        self._profile = None
+        self._lock = threading.Lock()
+        self.result = None
+
+    def arm(self, inferences):
+        """
+        Profile the next `inferences` inferences (clamped to max_inferences).
+
+        Returns:
+            bool: False if a capture is already armed or running
+        """
+        with self._lock:
+            if self._remaining:
+                return False
+            self._requested = self._remaining = max(1, min(int(inferences), self.max_inferences))
+            self.result = None
+            return True
+
+    def disarm(self):
+        """Cancel an armed capture that has not started."""
+        with self._lock:
+            if self._profile is None:
+                self._remaining = 0
+
+    @contextmanager
+    def capture(self):
+        """Wrap one inference; profiles it if a capture is armed."""
+        if not self._remaining:
+            yield
+            return
+
+        with self._lock:
+            if self._profile is None and self._remaining:
+                import torch
+                from torch.profiler import profile, ProfilerActivity
+                activities = [ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(ProfilerActivity.CUDA)
+                self._profile = profile(activities=activities)
+                self._profile.start()
+                self._started = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._profile is not None:
+                    self._remaining -= 1
+                    if self._remaining <= 0:
+                        self._finish()
+
+    def _finish(self):
+        profile, self._profile = self._profile, None
+        self._remaining = 0
+        profile.stop()
+        averages = profile.key_averages()
+        averages = sorted(averages, key=lambda event: event.self_cpu_time_total, reverse=True)[:self.row_limit]
+        self.result = {
+            'inferences': self._requested,
+            'started': self._started,
+            'seconds': round(time.time() - self._started, 3),
+            'operators': [{
+                'name': event.key,
+                'calls': event.count,
+                'self_cpu_ms': round(event.self_cpu_time_total / 1000.0, 3),
+                'cpu_total_ms': round(event.cpu_time_total / 1000.0, 3),
+                'device_total_ms': round(getattr(event, 'device_time_total', getattr(event, 'cuda_time_total', 0))
+                                         / 1000.0, 3)
+            } for event in averages]
+        }
+
+    def status(self):
+        """Get the capture state and the last result."""
+        state = 'running' if self._profile is not None else ('armed' if self._remaining else 'idle')
+        return {'state': state, 'remaining': self._remaining, 'result': self.result}
@@ -0,0 +1,392 @@
+"""
+Recording Utilities
+Records the camera stream, raw depth maps, detection results, GPS fixes and
+control commands to time-chunked segment files on a background writer, and
+reads them back (see replay_session.py for replaying a recording).
+
+Layout of a recording directory:
+    index.json              Closed segments: name, start/end time, bytes, record counts
+    seg-<start_ms>.dat      Records: <timestamp f64, stream u8, length u32> + payload
+    seg-<start_ms>.idx      One <timestamp f64, stream u8, offset u64, length u32>
+                            entry per record, for seeking without scanning the data
+
+Payloads are a <source u8> header plus JPEG bytes for camera frames (source:
+the pipeline the frame was uploaded to, see CAMERA_SOURCES; recordings without
+the header start directly with the JPEG), a <min f32, max f32> header plus a
+16-bit PNG for depth maps (depth = min + value / 65535 * (max - min)), and
+UTF-8 JSON for detections, GPS fixes and commands ({"path": ..., "body": ...}).
+"""
+
+import base64
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import cv2
+import numpy as np
+
+CAMERA = 0
+DEPTH = 1
+DETECTIONS = 2
+GPS = 3
+COMMAND = 4
+STREAM_NAMES = {CAMERA: 'camera', DEPTH: 'depth', DETECTIONS: 'detections', GPS: 'gps', COMMAND: 'command'}
+
+# Camera frame sources (the service the frame was uploaded to); 0 is unknown
+CAMERA_SOURCES = {'ai_detection': 1, 'depth_camera': 2}
+CAMERA_SOURCE_NAMES = {code: name for name, code in CAMERA_SOURCES.items()}
+
+RECORD_HEADER = struct.Struct('<dBI')
+INDEX_ENTRY = struct.Struct('<dBQI')
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('stream', 'u1'), ('offset', '<u8'), ('length', '<u4')])
+DEPTH_HEADER = struct.Struct('<ff')
+CAMERA_HEADER = struct.Struct('<B')
+JPEG_MAGIC = b'\xff\xd8'
+
+
+def encode_depth(depth):
+    """Encode a float depth map as a scale header plus a 16-bit PNG."""
+    depth = np.asarray(depth, dtype=np.float32)
+    low, high = float(depth.min()), float(depth.max())
+    span = high - low
+    scaled = (depth - low) * (65535.0 / span) if span > 0 else np.zeros_like(depth)
+    ok, png = cv2.imencode('.png', scaled.astype(np.uint16), [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if not ok:
+        raise ValueError("Failed to encode depth map")
+    return DEPTH_HEADER.pack(low, high) + png.tobytes()
+
+
+def decode_depth(payload):
+    """Decode a depth payload back into a float32 depth map."""
+    low, high = DEPTH_HEADER.unpack_from(payload)
+    image = cv2.imdecode(np.frombuffer(payload, np.uint8, offset=DEPTH_HEADER.size), cv2.IMREAD_UNCHANGED)
+    return low + image.astype(np.float32) * ((high - low) / 65535.0)
+
+
+def split_camera_payload(payload):
+    """
+    Split a camera payload into its source and JPEG bytes.
+
+    Returns:
+        tuple: (source service name, or None if unknown or not recorded, JPEG bytes)
+    """
+    if payload[:2] == JPEG_MAGIC:
+        return None, payload
+    source, = CAMERA_HEADER.unpack_from(payload)
+    return CAMERA_SOURCE_NAMES.get(source), payload[CAMERA_HEADER.size:]
+
+
+def decode_payload(stream, payload):
+    """
+    Decode a record payload.
+
+    Returns:
+        BGR frame for camera records, float32 depth map for depth records,
+        the decoded JSON for detection, GPS and command records
+    """
+    if stream == CAMERA:
+        _, jpeg = split_camera_payload(payload)
+        return cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+    if stream == DEPTH:
+        return decode_depth(payload)
+    return json.loads(payload.decode('utf-8'))
+
+
+class Recorder:
+    """
+    Background recorder with bounded buffering and quota rotation.
+
+    record_*() calls only enqueue references and never block: when the
+    buffer is full the record is dropped and counted, so recording can never
+    stall inference. JPEG/PNG encoding and disk writes run on the writer
+    thread. Segments rotate every `segment_seconds` (or at a quarter of the
+    quota), and the oldest segments are deleted to stay under `max_bytes`.
+    """
+
+    def __init__(self, output_dir, segment_seconds=60.0, max_bytes=2 * 1024 ** 3,
+                 queue_size=64, jpeg_quality=90, camera_interval=0.0):
+        """
+        Initialize the recorder.
+
+        Args:
+            output_dir: Recording directory
+            segment_seconds: Time span of one segment file
+            max_bytes: Disk quota for the whole recording directory
+            queue_size: Records buffered for the writer before dropping
+            jpeg_quality: Quality for camera frames given as arrays
+            camera_interval: Minimum seconds between recorded camera frames of one source
+        """
+        self.output_dir = output_dir
+        self.segment_seconds = segment_seconds
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self.camera_interval = camera_interval
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.is_recording = False
+        self.records_written = 0
+        self.records_dropped = 0
+        self.bytes_written = 0
+        self.last_error = None
+        self._last_camera_time = {}
+        self._thread = None
+        self._segment = None
+        self._segments = []
+
+    # Producer side (hot path)
+
+    def _enqueue(self, stream, timestamp, item):
+        if not self.is_recording:
+            return False
+        try:
+            self.queue.put_nowait((stream, timestamp if timestamp is not None else time.time(), item))
+            return True
+        except queue.Full:
+            self.records_dropped += 1
+            return False
+
+    def record_camera(self, frame, timestamp=None, source=None):
+        """
+        Record a camera frame.
+
+        Each source is limited to one frame per camera_interval on its own,
+        so one pipeline's uploads never crowd out another's.
+
+        Args:
+            frame: BGR array, JPEG bytes, or a base64 data URL as uploaded by the browser
+            timestamp: Capture time (unix seconds); now if None
+            source: Service the frame was uploaded to (a CAMERA_SOURCES key), or None
+
+        Returns:
+            bool: True if the frame was queued for writing
+        """
+        if not self.is_recording:
+            return False
+        now = time.time() if timestamp is None else timestamp
+        if now - self._last_camera_time.get(source, 0.0) < self.camera_interval:
+            return False
+        self._last_camera_time[source] = now
+        return self._enqueue(CAMERA, now, (CAMERA_SOURCES.get(source, 0), frame))
+
+    def record_depth(self, depth, timestamp=None):
+        """Record a raw (not colormapped) depth map."""
+        return self._enqueue(DEPTH, timestamp, depth)
+
+    def record_detections(self, detections, timestamp=None):
+        """Record the detection results of one frame (use the camera frame's timestamp)."""
+        return self._enqueue(DETECTIONS, timestamp, detections)
+
+    def record_gps(self, fix, timestamp=None):
+        """Record a GPS fix (position and fix quality fields)."""
+        return self._enqueue(GPS, timestamp, fix)
+
+    def record_command(self, path, body=None, timestamp=None):
+        """
+        Record a control command as the API request that carries it.
+
+        Args:
+            path: Endpoint path, e.g. "/api/move"
+            body: JSON request body, or None
+            timestamp: Command time (unix seconds); now if None
+        """
+        return self._enqueue(COMMAND, timestamp, {'path': path, 'body': body})
+
+    # Lifecycle
+
+    def start(self):
+        """Start recording into a new segment."""
+        if self.is_recording:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._segments = self._load_index()
+        self.is_recording = True
+        self._thread = threading.Thread(target=self._writer, name="recorder", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop recording, write out buffered records and close the segment."""
+        if not self.is_recording:
+            return
+        self.is_recording = False
+        self.queue.put(None)
+        self._thread.join(timeout=10.0)
+        self._thread = None
+
+    # Writer side
+
+    def _writer(self):
+        while True:
+            try:
+                entry = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                self._maybe_rotate(time.time())
+                if self._segment is not None:
+                    self._segment['data'].flush()
+                    self._segment['index'].flush()
+                continue
+            if entry is None:
+                break
+            stream, timestamp, item = entry
+            try:
+                self._write(stream, timestamp, self._encode(stream, item))
+            except Exception as e:
+                self.last_error = str(e)
+                self.records_dropped += 1
+        self._close_segment()
+
+    def _encode(self, stream, item):
+        if stream == CAMERA:
+            source, frame = item
+            if isinstance(frame, str):
+                jpeg = base64.b64decode(frame.split(',', 1)[1] if frame.startswith('data:') else frame)
+            elif isinstance(frame, (bytes, bytearray)):
+                jpeg = bytes(frame)
+            else:
+                ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    raise ValueError("Failed to encode camera frame")
+                jpeg = encoded.tobytes()
+            return CAMERA_HEADER.pack(source) + jpeg
+        if stream == DEPTH:
+            return encode_depth(item)
+        return json.dumps(item, separators=(',', ':')).encode('utf-8')
+
+    def _write(self, stream, timestamp, payload):
+        self._maybe_rotate(timestamp)
+        if self._segment is None:
+            self._open_segment(timestamp)
+        segment = self._segment
+        offset = segment['bytes']
+        segment['data'].write(RECORD_HEADER.pack(timestamp, stream, len(payload)))
+        segment['data'].write(payload)
+        segment['index'].write(INDEX_ENTRY.pack(timestamp, stream, offset + RECORD_HEADER.size, len(payload)))
+        size = RECORD_HEADER.size + len(payload)
+        segment['bytes'] += size
+        segment['start'] = min(segment['start'], timestamp)
+        segment['end'] = max(segment['end'], timestamp)
+        segment['records'][STREAM_NAMES[stream]] += 1
+        self.records_written += 1
+        self.bytes_written += size
+
+    def _maybe_rotate(self, now):
+        segment = self._segment
+        if segment is None:
+            return
+        if now - segment['opened'] >= self.segment_seconds or segment['bytes'] >= self.max_bytes // 4:
+            self._close_segment()
+
+    def _open_segment(self, timestamp):
+        name = f"seg-{int(timestamp * 1000)}"
+        self._segment = {
+            'name': name,
+            'opened': timestamp,
+            'start': timestamp,
+            'end': timestamp,
+            'bytes': 0,
+            'records': {stream: 0 for stream in STREAM_NAMES.values()},
+            'data': open(os.path.join(self.output_dir, name + '.dat'), 'ab'),
+            'index': open(os.path.join(self.output_dir, name + '.idx'), 'ab')
+        }
+
+    def _close_segment(self):
+        segment, self._segment = self._segment, None
+        if segment is None:
+            return
+        segment['data'].close()
+        segment['index'].close()
+        self._segments.append({key: segment[key] for key in ('name', 'start', 'end', 'bytes', 'records')})
+        self._enforce_quota()
+        self._save_index()
+
+    def _enforce_quota(self):
+        total = sum(segment['bytes'] for segment in self._segments)
+        while len(self._segments) > 1 and total > self.max_bytes:
+            oldest = self._segments.pop(0)
+            total -= oldest['bytes']
+            for extension in ('.dat', '.idx'):
+                try:
+                    os.remove(os.path.join(self.output_dir, oldest['name'] + extension))
+                except OSError:
+                    pass
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.output_dir, 'index.json')) as f:
+                return json.load(f)['segments']
+        except (OSError, ValueError, KeyError):
+            return []
+
+    def _save_index(self):
+        path = os.path.join(self.output_dir, 'index.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': 1, 'segments': self._segments}, f, indent=1)
+        os.replace(path + '.tmp', path)
+
+    def get_status(self):
+        """Get recording state, counters and disk usage."""
+        segment = self._segment
+        return {
+            'recording': self.is_recording,
+            'output_dir': os.path.abspath(self.output_dir),
+            'segments': len(self._segments) + (1 if segment else 0),
+            'disk_bytes': sum(s['bytes'] for s in self._segments) + (segment['bytes'] if segment else 0),
+            'max_bytes': self.max_bytes,
+            'queued': self.queue.qsize(),
+            'records_written': self.records_written,
+            'records_dropped': self.records_dropped,
+            'last_error': self.last_error
+        }
+
+
+class RecordingReader:
+    """Reads records of a recording directory by time range and stream."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'index.json')) as f:
+            self.segments = json.load(f)['segments']
+
+    @property
+    def start(self):
+        return self.segments[0]['start'] if self.segments else None
+
+    @property
+    def end(self):
+        return self.segments[-1]['end'] if self.segments else None
+
+    def records(self, start=None, end=None, streams=None, decode=True):
+        """
+        Iterate over records in time order.
+
+        Args:
+            start: Earliest timestamp (unix seconds), inclusive
+            end: Latest timestamp, inclusive
+            streams: Stream codes to include (CAMERA, DEPTH, DETECTIONS, GPS, COMMAND); all if None
+            decode: Decode payloads (see decode_payload) instead of returning bytes
+
+        Yields:
+            tuple: (timestamp, stream code, payload)
+        """
+        for segment in self.segments:
+            if (start is not None and segment['end'] < start) or (end is not None and segment['start'] > end):
+                continue
+            base = os.path.join(self.directory, segment['name'])
+            index = np.fromfile(base + '.idx', dtype=INDEX_DTYPE)
+            mask = np.ones(len(index), dtype=bool)
+            if start is not None:
+                mask &= index['time'] >= start
+            if end is not None:
+                mask &= index['time'] <= end
+            if streams is not None:
+                mask &= np.isin(index['stream'], list(streams))
+            selected = index[mask]
+            # Writers append in arrival order; sort by capture time
+            selected = selected[np.argsort(selected['time'], kind='stable')]
+            with open(base + '.dat', 'rb') as f:
+                for entry in selected:
+                    f.seek(int(entry['offset']))
+                    payload = f.read(int(entry['length']))
+                    stream = int(entry['stream'])
+                    yield float(entry['time']), stream, decode_payload(stream, payload) if decode else payload
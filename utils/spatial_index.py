@@ -0,0 +1,234 @@
+"""
+Spatial Index Utilities
+Uniform lat/lon grid over live robot positions for viewport (bounding box),
+k-nearest and geofence queries.
+"""
+
+import heapq
+import math
+import threading
+
+from .track_history import METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LON
+
+
+def distance_meters(lat1, lon1, lat2, lon2):
+    """
+    Approximate ground distance using an equirectangular projection.
+
+    Accurate to well under 1% over the few kilometers a fleet spans.
+    """
+    x = (lon2 - lon1) * METERS_PER_DEGREE_LON * math.cos(math.radians((lat1 + lat2) / 2))
+    y = (lat2 - lat1) * METERS_PER_DEGREE_LAT
+    return math.hypot(x, y)
+
+
+def point_in_polygon(lat, lon, polygon):
+    """
+    Ray-casting containment test.
+
+    Args:
+        lat: Point latitude
+        lon: Point longitude
+        polygon: List of (lat, lon) vertices; closing the ring is optional
+
+    Returns:
+        bool: True if the point lies inside the polygon
+    """
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lon_i = polygon[i]
+        lat_j, lon_j = polygon[j]
+        if (lat_i > lat) != (lat_j > lat):
+            crossing = lon_i + (lat - lat_i) * (lon_j - lon_i) / (lat_j - lat_i)
+            if lon < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+class SpatialIndex:
+    """
+    Grid index of point positions keyed by object id.
+
+    Positions are bucketed into square cells of `cell_size` degrees, so
+    updates are O(1) and range queries only visit the cells they overlap.
+    """
+
+    def __init__(self, cell_size=0.001):
+        """
+        Initialize the index.
+
+        Args:
+            cell_size: Cell edge in degrees (0.001 deg is about 110 m)
+        """
+        self.cell_size = cell_size
+        self._positions = {}
+        self._cells = {}
+        self._lock = threading.Lock()
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_size), math.floor(lon / self.cell_size))
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, item_id):
+        return item_id in self._positions
+
+    def update(self, item_id, lat, lon):
+        """Insert or move an item."""
+        cell = self._cell(lat, lon)
+        with self._lock:
+            old = self._positions.get(item_id)
+            if old is not None:
+                old_cell = self._cell(*old)
+                if old_cell != cell:
+                    self._discard(old_cell, item_id)
+            self._positions[item_id] = (lat, lon)
+            self._cells.setdefault(cell, set()).add(item_id)
+
+    def remove(self, item_id):
+        """Remove an item if present."""
+        with self._lock:
+            old = self._positions.pop(item_id, None)
+            if old is not None:
+                self._discard(self._cell(*old), item_id)
+
+    def _discard(self, cell, item_id):
+        items = self._cells.get(cell)
+        if items is not None:
+            items.discard(item_id)
+            if not items:
+                del self._cells[cell]
+
+    def get(self, item_id):
+        """Get an item's (lat, lon), or None."""
+        return self._positions.get(item_id)
+
+    def query_bbox(self, south, west, north, east):
+        """
+        Get the ids of items inside a bounding box (edges inclusive).
+
+        Returns:
+            set: Matching item ids
+        """
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        result = set()
+        with self._lock:
+            # Scan whichever is smaller: the overlapped cells or the occupied ones
+            if (max_row - min_row + 1) * (max_col - min_col + 1) <= len(self._cells):
+                cells = (
+                    self._cells.get((row, col), ())
+                    for row in range(min_row, max_row + 1)
+                    for col in range(min_col, max_col + 1)
+                )
+            else:
+                cells = (
+                    items for (row, col), items in self._cells.items()
+                    if min_row <= row <= max_row and min_col <= col <= max_col
+                )
+            for items in cells:
+                for item_id in items:
+                    lat, lon = self._positions[item_id]
+                    if south <= lat <= north and west <= lon <= east:
+                        result.add(item_id)
+        return result
+
+    def nearest(self, lat, lon, k=1, max_distance=None):
+        """
+        Get the k items nearest to a point.
+
+        Searches rings of cells around the point outwards and stops once no
+        unvisited cell can hold a closer item.
+
+        Args:
+            lat: Query latitude
+            lon: Query longitude
+            k: Number of items to return
+            max_distance: Optional search radius in meters
+
+        Returns:
+            list: (item_id, distance_meters) tuples, nearest first
+        """
+        if k <= 0:
+            return []
+        center_row, center_col = self._cell(lat, lon)
+        # Shortest ground distance spanned by one cell edge
+        cell_meters = self.cell_size * min(
+            METERS_PER_DEGREE_LAT, METERS_PER_DEGREE_LON * max(math.cos(math.radians(lat)), 1e-6)
+        )
+
+        best = []  # max-heap of (-distance, item_id)
+
+        def visit(cells):
+            for cell in cells:
+                for item_id in self._cells.get(cell, ()):
+                    distance = distance_meters(lat, lon, *self._positions[item_id])
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, item_id))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, item_id))
+
+        with self._lock:
+            ring = 0
+            while True:
+                # Items in this ring are at least (ring - 1) cells away
+                ring_min = max(ring - 1, 0) * cell_meters
+                if len(best) == k and ring_min > -best[0][0]:
+                    break
+                if max_distance is not None and ring_min > max_distance:
+                    break
+                if (2 * ring + 1) ** 2 > 4 * len(self._cells):
+                    # Sparse surroundings: checking the remaining occupied
+                    # cells directly is cheaper than walking more rings
+                    visit([
+                        (row, col) for row, col in self._cells
+                        if max(abs(row - center_row), abs(col - center_col)) >= ring
+                    ])
+                    break
+                visit(self._ring_cells(center_row, center_col, ring))
+                ring += 1
+
+        return [(item_id, -neg) for neg, item_id in sorted(best, reverse=True)]
+
+    @staticmethod
+    def _ring_cells(center_row, center_col, ring):
+        """Yield the cells on the square ring at Chebyshev distance `ring`."""
+        if ring == 0:
+            yield (center_row, center_col)
+            return
+        for col in range(center_col - ring, center_col + ring + 1):
+            yield (center_row - ring, col)
+            yield (center_row + ring, col)
+        for row in range(center_row - ring + 1, center_row + ring):
+            yield (row, center_col - ring)
+            yield (row, center_col + ring)
+
+    def query_polygon(self, polygon):
+        """
+        Get the ids of items inside a polygon (geofence).
+
+        Args:
+            polygon: List of (lat, lon) vertices
+
+        Returns:
+            set: Matching item ids
+        """
+        lats = [vertex[0] for vertex in polygon]
+        lons = [vertex[1] for vertex in polygon]
+        candidates = self.query_bbox(min(lats), min(lons), max(lats), max(lons))
+        return {item_id for item_id in candidates if self.contains(item_id, polygon)}
+
+    def contains(self, item_id, polygon):
+        """
+        Check whether an item lies inside a polygon.
+
+        Returns:
+            bool: True if inside; False if outside or not indexed
+        """
+        position = self._positions.get(item_id)
+        return position is not None and point_in_polygon(*position, polygon)
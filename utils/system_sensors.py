@@ -0,0 +1,199 @@
+"""
+System Sensor Utilities
+Reads temperature, CPU clock and battery state from Linux sysfs (thermal
+zones, cpufreq and power_supply).
+
+Paths are resolved below a root directory, normally "/". Pointing the root
+at a directory with the same layout (see write_sensor_standin) replaces the
+hardware with plain files for tests and development machines.
+"""
+
+import os
+
+
+THERMAL_DIR = "sys/class/thermal"
+CPUFREQ_DIR = "sys/devices/system/cpu/cpu0/cpufreq"
+POWER_SUPPLY_DIR = "sys/class/power_supply"
+
+
+def _read_text(path):
+    """Read a sysfs attribute, or None if it is missing or unreadable."""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_int(path):
+    value = _read_text(path)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ThermalSensor:
+    """
+    Reads thermal zone temperatures and the CPU clock.
+
+    The reported temperature is the hottest selected zone. The CPU clock is
+    reported as a fraction of its maximum; on a throttling Raspberry Pi it
+    stays well below 1 under load.
+    """
+
+    def __init__(self, root="/", zone_types=None):
+        """
+        Initialize the sensor.
+
+        Args:
+            root: Directory sysfs paths are resolved below
+            zone_types: Thermal zone types to use (e.g. ["cpu-thermal"]);
+                all zones if empty or None
+        """
+        self.thermal_dir = os.path.join(root, THERMAL_DIR)
+        self.cpufreq_dir = os.path.join(root, CPUFREQ_DIR)
+        self.zone_types = set(zone_types or ())
+        self.zones = []
+
+    def _find_zones(self):
+        """Get (zone, type, temp path) for every selected thermal zone."""
+        try:
+            names = sorted(name for name in os.listdir(self.thermal_dir) if name.startswith('thermal_zone'))
+        except OSError:
+            return []
+        zones = []
+        for name in names:
+            zone_type = _read_text(os.path.join(self.thermal_dir, name, 'type')) or name
+            if not self.zone_types or zone_type in self.zone_types:
+                zones.append((name, zone_type, os.path.join(self.thermal_dir, name, 'temp')))
+        return zones
+
+    def read(self):
+        """
+        Read the current temperatures and CPU clock.
+
+        Returns:
+            dict: temperature (hottest zone, °C), zones (zone, type and
+                temperature each), cpu_freq_mhz and cpu_freq_ratio (current /
+                maximum clock); None values when unavailable
+        """
+        if not self.zones:
+            self.zones = self._find_zones()
+        zones = []
+        for name, zone_type, path in self.zones:
+            millidegrees = _read_int(path)
+            if millidegrees is not None:
+                zones.append({'zone': name, 'type': zone_type, 'temperature': round(millidegrees / 1000.0, 1)})
+
+        current = _read_int(os.path.join(self.cpufreq_dir, 'scaling_cur_freq'))
+        maximum = _read_int(os.path.join(self.cpufreq_dir, 'cpuinfo_max_freq'))
+        return {
+            'temperature': max(zone['temperature'] for zone in zones) if zones else None,
+            'zones': zones,
+            'cpu_freq_mhz': round(current / 1000.0) if current else None,
+            'cpu_freq_ratio': round(current / maximum, 3) if current and maximum else None
+        }
+
+
+class PowerSupplySensor:
+    """
+    Reads battery charge and the charging state from power_supply devices.
+    """
+
+    def __init__(self, root="/"):
+        """
+        Initialize the sensor.
+
+        Args:
+            root: Directory sysfs paths are resolved below
+        """
+        self.power_dir = os.path.join(root, POWER_SUPPLY_DIR)
+
+    def read(self):
+        """
+        Read the current battery state.
+
+        Returns:
+            dict: battery (mean capacity of all batteries, percent),
+                battery_status ("Charging", "Discharging", "Full", ...),
+                external_power (True if a mains/USB supply is online) and
+                on_battery (True while running from the battery); None values
+                when unavailable
+        """
+        try:
+            names = sorted(os.listdir(self.power_dir))
+        except OSError:
+            names = []
+
+        capacities = []
+        status = None
+        external = []
+        for name in names:
+            supply_dir = os.path.join(self.power_dir, name)
+            supply_type = _read_text(os.path.join(supply_dir, 'type'))
+            if supply_type == 'Battery':
+                capacity = _read_int(os.path.join(supply_dir, 'capacity'))
+                if capacity is not None:
+                    capacities.append(capacity)
+                status = status or _read_text(os.path.join(supply_dir, 'status'))
+            elif supply_type is not None:
+                online = _read_int(os.path.join(supply_dir, 'online'))
+                if online is not None:
+                    external.append(online == 1)
+
+        external_power = any(external) if external else None
+        if status is not None:
+            on_battery = status == 'Discharging'
+        elif capacities and external_power is not None:
+            on_battery = not external_power
+        else:
+            on_battery = None
+        return {
+            'battery': round(sum(capacities) / len(capacities)) if capacities else None,
+            'battery_status': status,
+            'external_power': external_power,
+            'on_battery': on_battery
+        }
+
+
+def write_sensor_standin(root, temperature=None, zone_type='cpu-thermal', battery=None,
+                         battery_status='Discharging', external_power=None,
+                         cpu_freq_mhz=None, cpu_max_freq_mhz=None):
+    """
+    Write sysfs-style stand-in files that the sensors read instead of hardware.
+
+    Only the given values are written, so the function can be called again
+    to change one reading while leaving the others in place.
+
+    Args:
+        root: Directory to write below (pass the same root to the sensors)
+        temperature: Thermal zone 0 temperature in °C
+        zone_type: Type of thermal zone 0
+        battery: Battery capacity in percent
+        battery_status: Battery status written with the capacity
+        external_power: Whether the mains supply is online
+        cpu_freq_mhz: Current CPU clock
+        cpu_max_freq_mhz: Maximum CPU clock
+    """
+    def write(directory, name, value):
+        path = os.path.join(root, directory)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, name), 'w') as f:
+            f.write(f"{value}\n")
+
+    zone = os.path.join(THERMAL_DIR, 'thermal_zone0')
+    if temperature is not None:
+        write(zone, 'type', zone_type)
+        write(zone, 'temp', int(round(temperature * 1000)))
+    if battery is not None:
+        write(os.path.join(POWER_SUPPLY_DIR, 'BAT0'), 'type', 'Battery')
+        write(os.path.join(POWER_SUPPLY_DIR, 'BAT0'), 'capacity', int(battery))
+        write(os.path.join(POWER_SUPPLY_DIR, 'BAT0'), 'status', battery_status)
+    if external_power is not None:
+        write(os.path.join(POWER_SUPPLY_DIR, 'AC'), 'type', 'Mains')
+        write(os.path.join(POWER_SUPPLY_DIR, 'AC'), 'online', 1 if external_power else 0)
+    if cpu_freq_mhz is not None:
+        write(CPUFREQ_DIR, 'scaling_cur_freq', int(cpu_freq_mhz * 1000))
+    if cpu_max_freq_mhz is not None:
+        write(CPUFREQ_DIR, 'cpuinfo_max_freq', int(cpu_max_freq_mhz * 1000))
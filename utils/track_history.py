@@ -0,0 +1,239 @@
+"""
+Track History Utilities
+Fixed-size, array-backed position/heading history per robot with time-range
+queries and track downsampling for map display.
+"""
+
+import threading
+
+import numpy as np
+
+
+# Approximate meters per degree, used for local equirectangular projection
+METERS_PER_DEGREE_LAT = 110540.0
+METERS_PER_DEGREE_LON = 111320.0
+
+
+def douglas_peucker(x, y, tolerance):
+    """
+    Simplify a polyline with the Douglas-Peucker algorithm.
+
+    Args:
+        x: Array of x coordinates (meters)
+        y: Array of y coordinates (meters)
+        tolerance: Maximum allowed deviation from the simplified line (meters)
+
+    Returns:
+        numpy array: Sorted indices of the points to keep
+    """
+    n = len(x)
+    if n < 3:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+
+    # Iterative to avoid recursion limits on long tracks; each segment's
+    # distances are computed in one vectorized pass
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        xs = x[start + 1:end] - x[start]
+        ys = y[start + 1:end] - y[start]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(xs, ys)
+        else:
+            distances = np.abs(dy * xs - dx * ys) / length
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = start + 1 + index
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return np.flatnonzero(keep)
+
+
+def time_buckets(times, bucket_seconds):
+    """
+    Pick the last sample of every time bucket.
+
+    Args:
+        times: Sorted array of timestamps (seconds)
+        bucket_seconds: Bucket width in seconds
+
+    Returns:
+        numpy array: Sorted indices of the points to keep
+    """
+    if len(times) == 0:
+        return np.arange(0)
+    buckets = np.floor(times / bucket_seconds).astype(np.int64)
+    # Index of the last element of each run of equal bucket ids
+    last = np.flatnonzero(np.diff(buckets))
+    return np.append(last, len(times) - 1)
+
+
+class PositionHistory:
+    """
+    Ring buffer of (time, lat, lon, heading) samples backed by numpy arrays.
+
+    Memory is allocated once for `capacity` samples; when full, the oldest
+    samples are overwritten. Samples must be appended in time order.
+    """
+
+    def __init__(self, capacity):
+        """
+        Initialize the history.
+
+        Args:
+            capacity: Maximum number of samples kept
+        """
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.lat = np.zeros(capacity, dtype=np.float64)
+        self.lon = np.zeros(capacity, dtype=np.float64)
+        self.heading = np.zeros(capacity, dtype=np.float32)
+        self.count = 0
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, lat, lon, heading=0.0):
+        """Record one sample, overwriting the oldest when full."""
+        with self._lock:
+            i = self._next
+            self.times[i] = timestamp
+            self.lat[i] = lat
+            self.lon[i] = lon
+            self.heading[i] = heading
+            self._next = (i + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _ordered(self, array):
+        """Return the stored samples of an array, oldest first."""
+        if self.count < self.capacity:
+            return array[:self.count]
+        return np.concatenate((array[self._next:], array[:self._next]))
+
+    def query(self, start=None, end=None):
+        """
+        Get the samples within a time range, oldest first.
+
+        Args:
+            start: Earliest timestamp (inclusive), or None for the oldest sample
+            end: Latest timestamp (inclusive), or None for the newest sample
+
+        Returns:
+            dict: Arrays 'times', 'lat', 'lon' and 'heading'
+        """
+        with self._lock:
+            times = self._ordered(self.times)
+            lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+            hi = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+            return {
+                'times': times[lo:hi].copy(),
+                'lat': self._ordered(self.lat)[lo:hi].copy(),
+                'lon': self._ordered(self.lon)[lo:hi].copy(),
+                'heading': self._ordered(self.heading)[lo:hi].copy(),
+            }
+
+    def latest(self):
+        """Get the newest sample as a dict, or None if empty."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            i = (self._next - 1) % self.capacity
+            return {
+                'time': float(self.times[i]),
+                'lat': float(self.lat[i]),
+                'lon': float(self.lon[i]),
+                'heading': float(self.heading[i]),
+            }
+
+    def get_track(self, start=None, end=None, method='dp', tolerance=1.0, bucket_seconds=5.0):
+        """
+        Get a downsampled track for a time range.
+
+        Args:
+            start: Earliest timestamp, or None
+            end: Latest timestamp, or None
+            method: 'dp' (Douglas-Peucker), 'bucket' (one sample per time
+                bucket) or 'raw'
+            tolerance: Douglas-Peucker tolerance in meters
+            bucket_seconds: Bucket width for 'bucket'
+
+        Returns:
+            dict: 'points' as [time, lat, lon, heading] rows plus sample counts
+        """
+        samples = self.query(start, end)
+        total = len(samples['times'])
+
+        if method == 'dp' and total > 2:
+            # Project to local meters around the first sample
+            lat0 = samples['lat'][0]
+            x = (samples['lon'] - samples['lon'][0]) * METERS_PER_DEGREE_LON * np.cos(np.radians(lat0))
+            y = (samples['lat'] - lat0) * METERS_PER_DEGREE_LAT
+            indices = douglas_peucker(x, y, tolerance)
+        elif method == 'bucket':
+            indices = time_buckets(samples['times'], bucket_seconds)
+        elif method in ('dp', 'raw'):
+            indices = np.arange(total)
+        else:
+            raise ValueError(f"Unknown downsampling method: {method}")
+
+        points = np.column_stack((
+            samples['times'][indices],
+            samples['lat'][indices],
+            samples['lon'][indices],
+            samples['heading'][indices].astype(np.float64),
+        ))
+        return {
+            'method': method,
+            'total_samples': total,
+            'returned_samples': len(indices),
+            'points': points.tolist(),
+        }
+
+
+class TrackStore:
+    """Position histories for many robots, each with the same fixed capacity."""
+
+    def __init__(self, capacity_per_robot):
+        """
+        Initialize the store.
+
+        Args:
+            capacity_per_robot: Ring buffer size for each robot
+        """
+        self.capacity_per_robot = capacity_per_robot
+        self._histories = {}
+        self._lock = threading.Lock()
+
+    def history(self, robot_id):
+        """Get (creating if needed) the history for a robot."""
+        with self._lock:
+            history = self._histories.get(robot_id)
+            if history is None:
+                history = PositionHistory(self.capacity_per_robot)
+                self._histories[robot_id] = history
+            return history
+
+    def record(self, robot_id, timestamp, lat, lon, heading=0.0):
+        """Append a sample to a robot's history."""
+        self.history(robot_id).append(timestamp, lat, lon, heading)
+
+    def robot_ids(self):
+        """Get the ids of all robots with a history."""
+        with self._lock:
+            return list(self._histories)
+
+    def remove(self, robot_id):
+        """Drop a robot's history."""
+        with self._lock:
+            self._histories.pop(robot_id, None)
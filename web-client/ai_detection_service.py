@@ -10,22 +10,38 @@ import io
 import threading
 import time
 from typing import Dict, List, Optional, Tuple
-from ultralytics import YOLO
 import logging
+import sys
+import os
+
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.latency import StageLatency
+from utils.profiling import InferenceProfiler
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stages timed for every web frame; preprocess/inference/postprocess are
+# reported by ultralytics, total spans decode to encode
+AI_DETECTION_STAGES = (
+    'b64_decode', 'image_decode', 'preprocess', 'inference',
+    'postprocess', 'draw', 'encode', 'total'
+)
+
 class AIDetectionService:
     """Service for AI-powered object detection using YOLO models."""
     
-    def __init__(self, model_path: str = '../yolov5su.pt'):
+    def __init__(self, model_path: str = '../yolov5su.pt', model=None):
         """
         Initialize the AI detection service.
         
         Args:
             model_path: Path to the YOLO model file
+            model: Already loaded model to use instead of loading model_path
+                (e.g. a stub model in benchmarks)
         """
         self.model_path = model_path
         self.model = None
@@ -33,9 +49,33 @@ class AIDetectionService:
         self.is_processing = False
         self.confidence_threshold = 0.5
         self.detection_classes = []
+        self.class_names = []
         self.last_detection_time = 0
         self.detection_fps = 0
-        self.load_model()
+        self.warmup_stats = None
+        self.latency = StageLatency(AI_DETECTION_STAGES)
+        self.profiler = InferenceProfiler()
+        # Frame counters, read by the metrics endpoint; dropped covers frames
+        # refused by the rate limit and failed ones
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        # (time, (height, width), detections) of the last processed frame,
+        # read by the depth service for per-object distances
+        self.last_detections = None
+        # Output JPEG quality and model input size (None: model default),
+        # adjusted under load by the quality controller
+        self.jpeg_quality = 85
+        self.image_size = None
+        # Minimum seconds between processed frames, set by the compute governor
+        self.min_interval = 0.0
+        self.frames_throttled = 0
+        self._last_frame_start = 0.0
+        if model is not None:
+            self.model = model
+            self.class_names = list(model.names.values())
+        else:
+            self.load_model()
     
     def load_model(self) -> bool:
         """
@@ -45,14 +85,56 @@ class AIDetectionService:
             bool: True if model loaded successfully, False otherwise
         """
         try:
+            # Imported here so that importing this module does not pull in
+            # ultralytics/torch; the backend loads the model in the background.
+            from ultralytics import YOLO
             logger.info(f"Loading YOLO model from {self.model_path}")
             self.model = YOLO(self.model_path)
+            # Class names never change for a loaded model; build the list once
+            self.class_names = list(self.model.names.values())
             logger.info("YOLO model loaded successfully")
             return True
         except Exception as e:
             logger.error(f"Failed to load YOLO model: {e}")
             return False
     
+    def warmup(self, width: int, height: int, iterations: int = 3) -> Optional[Dict]:
+        """
+        Run synthetic frames through the model so that the first real frame
+        does not pay for predictor setup, allocator growth and kernel selection.
+        
+        Args:
+            width: Frame width, normally the configured camera width
+            height: Frame height, normally the configured camera height
+            iterations: Number of synthetic frames to run
+            
+        Returns:
+            Dict with warm-up timings, or None if the model is not loaded
+        """
+        if not self.model:
+            return None
+        
+        frame = np.random.randint(0, 256, (height, width, 3), dtype=np.uint8)
+        times_ms = []
+        for _ in range(iterations):
+            start_time = time.time()
+            try:
+                self.model(frame, conf=self.confidence_threshold, verbose=False)
+            except Exception as e:
+                logger.error(f"Error during YOLO warm-up: {e}")
+                break
+            times_ms.append(round((time.time() - start_time) * 1000, 1))
+        
+        self.warmup_stats = {
+            'iterations': iterations,
+            'frame_size': [width, height],
+            'times_ms': times_ms,
+            'first_ms': times_ms[0] if times_ms else None,
+            'last_ms': times_ms[-1] if times_ms else None
+        }
+        logger.info(f"YOLO warm-up finished: {times_ms} ms")
+        return self.warmup_stats
+    
     def set_confidence_threshold(self, threshold: float) -> None:
         """
         Set the confidence threshold for detections.
@@ -102,7 +184,10 @@ class AIDetectionService:
             start_time = time.time()
             
             # Run inference
-            results = self.model(frame, conf=self.confidence_threshold)
+            options = {'imgsz': self.image_size} if self.image_size else {}
+            with self.profiler.capture():
+                results = self.model(frame, conf=self.confidence_threshold, **options)
+            draw_start = time.perf_counter()
             
             # Process results
             detections = []
@@ -111,6 +196,12 @@ class AIDetectionService:
             if len(results) > 0:
                 result = results[0]
                 
+                # Per-stage times (ms) measured by ultralytics
+                speed = getattr(result, 'speed', None) or {}
+                for stage in ('preprocess', 'inference', 'postprocess'):
+                    if speed.get(stage) is not None:
+                        self.latency.record(stage, speed[stage] / 1000.0)
+                
                 # Extract detection information
                 if result.boxes is not None:
                     boxes = result.boxes.xyxy.cpu().numpy()
@@ -154,16 +245,23 @@ class AIDetectionService:
                                   cv2.FONT_HERSHEY_SIMPLEX, 0.6, 
                                   (255, 255, 255), 2)
             
-            # Update FPS calculation
+            # Update FPS from the rolling median of end-to-end frame times;
+            # fall back to this frame's time when only process_frame() is used
             processing_time = time.time() - start_time
-            self.detection_fps = 1.0 / processing_time if processing_time > 0 else 0
+            total_p50 = self.latency.percentile('total', 50)
+            if total_p50:
+                self.detection_fps = 1000.0 / total_p50
+            else:
+                self.detection_fps = 1.0 / processing_time if processing_time > 0 else 0
             self.last_detection_time = start_time
             
             # Add FPS overlay
             fps_text = f"AI FPS: {self.detection_fps:.1f} | Objects: {len(detections)}"
             cv2.putText(annotated_frame, fps_text, (10, 30), 
                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+            self.latency.record('draw', time.perf_counter() - draw_start)
             
+            self.last_detections = (time.time(), frame.shape[:2], detections)
             self.is_processing = False
             return annotated_frame, detections
             
@@ -172,6 +270,23 @@ class AIDetectionService:
             self.is_processing = False
             return frame, []
     
+    def throttle_delay(self) -> float:
+        """
+        Check a new frame against `min_interval`.
+        
+        Returns:
+            float: Seconds until a frame may be processed; 0 if it may run
+                now. A frame refused here is counted as received, throttled
+                and dropped.
+        """
+        delay = self._last_frame_start + self.min_interval - time.perf_counter()
+        if delay > 0:
+            self.frames_received += 1
+            self.frames_throttled += 1
+            self.frames_dropped += 1
+            return delay
+        return 0.0
+    
     def process_base64_frame(self, base64_data: str) -> Tuple[str, List[Dict]]:
         """
         Process a base64-encoded frame for object detection.
@@ -182,7 +297,11 @@ class AIDetectionService:
         Returns:
             Tuple of (base64_annotated_frame, detections_list)
         """
+        self.frames_received += 1
         try:
+            start_time = time.perf_counter()
+            self._last_frame_start = start_time
+            
             # Decode base64 to numpy array
             frame = self._base64_to_frame(base64_data)
             
@@ -190,12 +309,16 @@ class AIDetectionService:
             annotated_frame, detections = self.process_frame(frame)
             
             # Encode result back to base64
-            annotated_base64 = self._frame_to_base64(annotated_frame)
+            with self.latency.measure('encode'):
+                annotated_base64 = self._frame_to_base64(annotated_frame)
             
+            self.latency.record('total', time.perf_counter() - start_time)
+            self.frames_processed += 1
             return annotated_base64, detections
             
         except Exception as e:
             logger.error(f"Error processing base64 frame: {e}")
+            self.frames_dropped += 1
             return base64_data, []
     
     def _base64_to_frame(self, base64_data: str) -> np.ndarray:
@@ -205,18 +328,20 @@ class AIDetectionService:
             base64_data = base64_data.split(',')[1]
         
         # Decode base64
-        image_data = base64.b64decode(base64_data)
+        with self.latency.measure('b64_decode'):
+            image_data = base64.b64decode(base64_data)
         
         # Convert to numpy array
-        nparr = np.frombuffer(image_data, np.uint8)
-        frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        with self.latency.measure('image_decode'):
+            nparr = np.frombuffer(image_data, np.uint8)
+            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
         
         return frame
     
     def _frame_to_base64(self, frame: np.ndarray) -> str:
         """Convert numpy array frame to base64 string."""
         # Encode frame to JPEG
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
         
         # Convert to base64
         image_base64 = base64.b64encode(buffer).decode('utf-8')
@@ -243,10 +368,22 @@ class AIDetectionService:
             'model_loaded': self.model is not None,
             'confidence_threshold': self.confidence_threshold,
             'detection_fps': self.detection_fps,
+            'max_fps': round(1.0 / self.min_interval, 2) if self.min_interval else None,
+            'frames_throttled': self.frames_throttled,
             'last_detection_time': self.last_detection_time,
-            'available_classes': list(self.model.names.values()) if self.model else []
+            'warmup': self.warmup_stats,
+            'available_classes': self.class_names
         }
     
+    def get_latency(self) -> Dict:
+        """
+        Get rolling per-stage latency percentiles.
+        
+        Returns:
+            Dict mapping stage name to count, p50/p95/p99, mean, max and last (ms)
+        """
+        return self.latency.summary()
+    
     def get_detection_summary(self, detections: List[Dict]) -> Dict:
         """
         Generate a summary of detections.
@@ -272,5 +409,20 @@ class AIDetectionService:
             'detection_time': time.time()
         }
 
-# Global instance for the web service
-ai_detection_service = AIDetectionService() 
\ No newline at end of file
+# Global instance for the web service, created on first use
+_ai_detection_service = None
+_ai_detection_service_lock = threading.Lock()
+
+
+def get_ai_detection_service() -> AIDetectionService:
+    """
+    Get the shared AI detection service, loading the model on first call.
+    
+    Returns:
+        AIDetectionService: The global service instance
+    """
+    global _ai_detection_service
+    with _ai_detection_service_lock:
+        if _ai_detection_service is None:
+            _ai_detection_service = AIDetectionService()
+        return _ai_detection_service
@@ -1,38 +1,123 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import asyncio
 import json
 from datetime import datetime
-import random
 import platform
 from time import sleep
-from gps3 import gps3
+import time
 import threading
+import sys
+import os
 
-# Removed depth service - no longer needed
+# Add parent directory to path for imports
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Import AI detection service
-try:
-    from ai_detection_service import ai_detection_service
-    AI_DETECTION_AVAILABLE = True
-    print("[INFO] AI Detection service available")
-except ImportError as e:
-    print(f"[WARNING] AI Detection service not available: {e}")
-    AI_DETECTION_AVAILABLE = False
-
-# Import depth camera service
-try:
-    from depth_camera_service import depth_camera_service
-    DEPTH_CAMERA_AVAILABLE = True
-    print("[INFO] Depth Camera service available")
-except ImportError as e:
-    print(f"[WARNING] Depth Camera service not available: {e}")
-    DEPTH_CAMERA_AVAILABLE = False
+from config.backend_config import BackendConfig
+from config.camera_config import CameraConfig, PerformanceConfig, DebugConfig
+from service_registry import ServiceRegistry, LazyService
+from robot_state import RobotStateStore
+from telemetry import TelemetryPublisher
+from fleet_aggregator import FleetAggregator
+from fleet_protocol import FleetCodec
+from metrics import MetricsRegistry, RequestMetricsMiddleware, LOOP_LAG_BUCKETS, process_metrics
+from loop_watchdog import LoopWatchdog
+from quality_controller import QualityController, build_quality_levels
+from compute_governor import ComputeGovernor
+from utils.gps_reader import GPSReader, GpsdSource, NMEAFileSource, StaticSource, ReplaySource
+from utils.track_history import TrackStore
+from utils.profiling import SamplingProfiler, AllocationTracker
+from utils.recorder import Recorder
+from utils.detection_log import DetectionLog
+from utils.obstacle_map import ObstacleMap
+from utils.system_sensors import ThermalSensor, PowerSupplySensor
 
 SERVO_MOTOR_GPIO = 17
 
+# The AI detection and depth camera services import torch/ultralytics/transformers
+# and load models when constructed, so they are built in background threads.
+# Motion endpoints never touch them and are available as soon as the app starts.
+# Models are warmed up as part of the load so the first real frame after a toggle
+# runs at steady-state latency.
+def _load_ai_detection_service():
+    from ai_detection_service import get_ai_detection_service
+    service = get_ai_detection_service()
+    if service.model is None:
+        raise RuntimeError("Failed to load YOLO model")
+    service.warmup(CameraConfig.FRAME_WIDTH, CameraConfig.FRAME_HEIGHT,
+                   iterations=PerformanceConfig.WARMUP_ITERATIONS)
+    return service
+
+def _load_depth_camera_service():
+    from depth_camera_service import get_depth_camera_service
+    service = get_depth_camera_service()
+    if not service.is_available():
+        raise RuntimeError(service.load_error or "Depth processing not available")
+    service.warmup()
+    service.recorder = recorder
+    # Per-object depth reads the boxes of the latest AI frame, if AI detection is loaded
+    service.detection_source = lambda: getattr(services.get("ai_detection"), "last_detections", None)
+    service.obstacle_map = obstacle_map
+    return service
+
+services = ServiceRegistry()
+services.register("ai_detection", _load_ai_detection_service)
+services.register("depth_camera", _load_depth_camera_service)
+
+# Moves JPEG qualities, model input sizes and the depth rate between quality
+# levels to hold the latency targets; applied to each service once loaded
+quality = QualityController(
+    services.get,
+    interval=BackendConfig.QUALITY_INTERVAL,
+    ai_target_ms=BackendConfig.QUALITY_AI_TARGET_MS,
+    ai_target_fps=BackendConfig.QUALITY_AI_TARGET_FPS,
+    depth_target_ms=BackendConfig.QUALITY_DEPTH_TARGET_MS,
+    depth_target_fps=BackendConfig.QUALITY_DEPTH_TARGET_FPS,
+    cpu_high=BackendConfig.QUALITY_CPU_HIGH,
+    cpu_low=BackendConfig.QUALITY_CPU_LOW,
+    headroom=BackendConfig.QUALITY_HEADROOM,
+    degrade_after=BackendConfig.QUALITY_DEGRADE_AFTER,
+    improve_after=BackendConfig.QUALITY_IMPROVE_AFTER,
+    cooldown=BackendConfig.QUALITY_COOLDOWN,
+    min_level=BackendConfig.QUALITY_MIN_LEVEL,
+    max_level=BackendConfig.QUALITY_MAX_LEVEL,
+    mode=BackendConfig.QUALITY_MODE,
+    history=BackendConfig.QUALITY_HISTORY,
+    levels=build_quality_levels(
+        ai_jpeg_quality=CameraConfig.AI_JPEG_QUALITY,
+        depth_jpeg_quality=CameraConfig.DEPTH_JPEG_QUALITY,
+        upload_quality=CameraConfig.UPLOAD_JPEG_QUALITY,
+        depth_input_size=CameraConfig.DEPTH_INPUT_SIZE,
+        depth_interval=CameraConfig.DEPTH_PROCESS_INTERVAL,
+        yolo_imgsz=CameraConfig.YOLO_IMAGE_SIZE
+    )
+)
+
+def service_unavailable_response(name, label):
+    """Build the 503 response for a service that is still loading or failed."""
+    service_status = services[name].get_status()
+    if service_status["state"] == LazyService.FAILED:
+        message = f"{label} service not available: {service_status['error']}"
+    else:
+        message = f"{label} service is loading"
+    return JSONResponse({
+        "status": "error",
+        "message": message,
+        "service_state": service_status["state"]
+    }, status_code=503)
+
+async def wait_for_service(name):
+    """Return the named service, starting its load and waiting for it if needed."""
+    instance = services.ensure_loading(name)
+    if instance is None:
+        loop = asyncio.get_event_loop()
+        instance = await loop.run_in_executor(
+            None, services[name].wait, BackendConfig.MODEL_LOAD_WAIT_TIMEOUT
+        )
+    return instance
+
 # Mock servo class for development on non-Raspberry Pi systems
 class MockServo:
     def __init__(self, pin, min_angle=0, max_angle=180, min_pulse_width=0.5/1000, max_pulse_width=2.5/1000):
@@ -51,17 +136,41 @@ class MockServo:
         self._angle = max(self.min_angle, min(self.max_angle, value))
         print(f"Mock servo angle set to {self._angle} degrees")
 
-# Mock GPS module for development
-class MockGPS:
-    def __init__(self):
-        # University of Malaya, KK9, Kuala Lumpur, Malaysia coordinates
-        self.latitude = 3.1209
-        self.longitude = 101.6559
-        self.altitude = 58.0
-        print("Mock GPS initialized with University of Malaya, KK9 coordinates")
-
 app = FastAPI()
 
+# Prometheus-style metrics; request labels use route templates and are
+# pre-registered at startup so observations never allocate
+metrics = MetricsRegistry()
+request_latency = metrics.histogram(
+    "nautilus_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+request_responses = metrics.counter(
+    "nautilus_http_responses_total", "HTTP responses by route and status class.", ("method", "route", "status")
+)
+
+# Flags blocking work in async handlers: measures loop lag and captures the
+# stack of the blocking handler whenever a stall crosses the threshold
+loop_watchdog = LoopWatchdog(
+    interval=BackendConfig.LOOP_WATCHDOG_INTERVAL,
+    threshold=BackendConfig.LOOP_STALL_THRESHOLD,
+    history=BackendConfig.LOOP_STALL_HISTORY,
+    lag_histogram=metrics.histogram("nautilus_event_loop_lag_seconds", "Event loop scheduling lag.", buckets=LOOP_LAG_BUCKETS),
+    lag_gauge=metrics.gauge("nautilus_event_loop_lag_last_seconds", "Most recent event loop lag sample."),
+    stall_counter=metrics.counter("nautilus_event_loop_stalls_total", "Event loop stalls above the watchdog threshold.")
+)
+# On-demand profilers for the admin endpoints; idle unless a capture is requested
+cpu_profiler = SamplingProfiler(
+    max_seconds=BackendConfig.PROFILE_MAX_SECONDS,
+    max_hz=BackendConfig.PROFILE_MAX_HZ,
+    max_stacks=BackendConfig.PROFILE_MAX_STACKS
+)
+allocations = AllocationTracker(
+    max_snapshots=BackendConfig.ALLOC_MAX_SNAPSHOTS,
+    max_frames=BackendConfig.ALLOC_MAX_FRAMES,
+    max_seconds=BackendConfig.ALLOC_MAX_SECONDS
+)
+app.add_middleware(RequestMetricsMiddleware, latency=request_latency, responses=request_responses)
+
 # Mount static files and templates
 app.mount("/static", StaticFiles(directory="."), name="static")
 app.mount("/images", StaticFiles(directory="../images"), name="images")
@@ -76,89 +185,248 @@ except (ImportError, RuntimeError):
     # Fallback to mock if not on Raspberry Pi or gpiozero is unavailable
     servo = MockServo(SERVO_MOTOR_GPIO, min_angle=0, max_angle=180, min_pulse_width=0.5/1000, max_pulse_width=2.5/1000)
 
-# Global state for robot control
-robot_state = {
-    "posX": 101.6559,  # University of Malaya, KK9, Kuala Lumpur, Malaysia (longitude)
-    "posY": 3.1209,    # University of Malaya, KK9, Kuala Lumpur, Malaysia (latitude)
-    "heading": 0.0,
-    "motor_speed": 50,
-    "servo_angle": 0,
-    "camera_enabled": False,
-    "ai_detection_enabled": False,
-    "depth_camera_enabled": False,
-    "is_moving": False,
-    "current_direction": "stopped",
-    "gps_status": "initializing"
-}
-
-# GPS data collection variables
-gps_thread = None
-gps_running = False
+# Global state for robot control, shared by the GPS thread and the handlers.
+# Handlers respond with only the fields they changed plus the state version.
+robot_state = RobotStateStore()
+
+# Sysfs sensors (thermal zones, power supplies); None readings on machines without them
+thermal_sensor = ThermalSensor(BackendConfig.SENSOR_ROOT, zone_types=BackendConfig.THERMAL_ZONE_TYPES)
+power_sensor = PowerSupplySensor(BackendConfig.SENSOR_ROOT)
+
+# Sensor readers sampled by the telemetry publisher at their own rates
+def read_battery():
+    return {"battery": power_sensor.read()["battery"]}
+
+def read_temperature():
+    return {"temperature": thermal_sensor.read()["temperature"]}
+
+# Caps quality, AI rate and depth (smaller encoder, pause) when hot or low on battery
+governor = ComputeGovernor(
+    thermal_sensor,
+    power_sensor,
+    quality,
+    services.get,
+    interval=BackendConfig.GOVERNOR_INTERVAL,
+    temp_high=BackendConfig.GOVERNOR_TEMP_HIGH,
+    temp_critical=BackendConfig.GOVERNOR_TEMP_CRITICAL,
+    temp_hysteresis=BackendConfig.GOVERNOR_TEMP_HYSTERESIS,
+    battery_low=BackendConfig.GOVERNOR_BATTERY_LOW,
+    battery_critical=BackendConfig.GOVERNOR_BATTERY_CRITICAL,
+    battery_hysteresis=BackendConfig.GOVERNOR_BATTERY_HYSTERESIS,
+    relax_after=BackendConfig.GOVERNOR_RELAX_AFTER,
+    reduced_quality=BackendConfig.GOVERNOR_REDUCED_QUALITY,
+    critical_quality=BackendConfig.GOVERNOR_CRITICAL_QUALITY,
+    reduced_ai_fps=BackendConfig.GOVERNOR_REDUCED_AI_FPS,
+    critical_ai_fps=BackendConfig.GOVERNOR_CRITICAL_AI_FPS,
+    enabled=BackendConfig.GOVERNOR_ENABLED,
+    history=BackendConfig.GOVERNOR_HISTORY
+)
+
+def get_detection_classes():
+    ai_detection_service = services.get("ai_detection")
+    return ai_detection_service.class_names if ai_detection_service is not None else None
+
+# Pushes state deltas to dashboards; static data is sent once per connection
+telemetry = TelemetryPublisher(robot_state, max_rate=BackendConfig.TELEMETRY_MAX_RATE)
+telemetry.add_sensor("battery", read_battery, BackendConfig.BATTERY_SAMPLE_INTERVAL)
+telemetry.add_sensor("temperature", read_temperature, BackendConfig.TEMPERATURE_SAMPLE_INTERVAL)
+telemetry.add_static("detection_classes", get_detection_classes)
+telemetry.add_static("depth_colormaps", lambda: CameraConfig.COLORMAP_NAMES)
+telemetry.add_static("robot", lambda: {"id": BackendConfig.ROBOT_ID, "model": BackendConfig.ROBOT_MODEL})
+
+def create_gps_source():
+    """Build the GPS source selected by BackendConfig.GPS_SOURCE."""
+    if BackendConfig.GPS_SOURCE == "nmea":
+        return NMEAFileSource(BackendConfig.GPS_NMEA_FILE, rate=BackendConfig.GPS_NMEA_RATE)
+    if BackendConfig.GPS_SOURCE == "mock":
+        # University of Malaya, KK9, Kuala Lumpur, Malaysia coordinates
+        return StaticSource(lat=3.1209, lon=101.6559, alt=58.0)
+    if BackendConfig.GPS_SOURCE == "replay":
+        # Fixes are pushed by replay_session.py
+        return ReplaySource()
+    return GpsdSource(BackendConfig.GPSD_HOST, BackendConfig.GPSD_PORT)
+
+# Fix fields kept in recordings; replay pushes them back as updates
+GPS_RECORD_FIELDS = ("lat", "lon", "alt", "speed", "track", "mode", "satellites_used", "satellites_visible", "hdop")
+
+# Publish each GPS update into the robot state as soon as it is parsed
+def on_gps_update(fix):
+    fields = {
+        "gps_status": fix["status"],
+        "gps_fix_mode": fix["mode"],
+        "gps_satellites": fix["satellites_used"],
+        "gps_hdop": fix["hdop"]
+    }
+    if fix["lat"] is not None and fix["lon"] is not None:
+        fields["posY"] = fix["lat"]
+        fields["posX"] = fix["lon"]
+    robot_state.update(**fields)
+    if fix["status"] in ("active", "no fix"):
+        recorder.record_gps({key: fix[key] for key in GPS_RECORD_FIELDS})
+
+# Bounded position/heading history for map trails
+track_store = TrackStore(BackendConfig.POSITION_HISTORY_SIZE)
+
+def record_position(version, changes):
+    if "posX" in changes or "posY" in changes or "heading" in changes:
+        state = robot_state.snapshot()
+        track_store.record(BackendConfig.ROBOT_ID, time.time(), state["posY"], state["posX"], state["heading"])
+
+robot_state.subscribe(record_position)
+
+# Field recording of the camera stream, raw depth maps and detections;
+# encoding and disk writes happen on the recorder's own thread
+recorder = Recorder(
+    DebugConfig.DEBUG_OUTPUT_DIR,
+    segment_seconds=DebugConfig.RECORD_SEGMENT_SECONDS,
+    max_bytes=DebugConfig.RECORD_MAX_BYTES,
+    queue_size=DebugConfig.RECORD_QUEUE_SIZE,
+    camera_interval=DebugConfig.RECORD_CAMERA_INTERVAL
+)
+
+# Obstacle grid fused from depth maps and detections on the depth worker;
+# forward motion commands read its precomputed decision
+obstacle_map = ObstacleMap(
+    rows=BackendConfig.OBSTACLE_GRID_ROWS,
+    cols=BackendConfig.OBSTACLE_GRID_COLS,
+    smoothing=BackendConfig.OBSTACLE_SMOOTHING,
+    margin=BackendConfig.OBSTACLE_MARGIN,
+    corridor=BackendConfig.OBSTACLE_CORRIDOR,
+    slow_threshold=BackendConfig.OBSTACLE_SLOW_THRESHOLD,
+    stop_threshold=BackendConfig.OBSTACLE_STOP_THRESHOLD,
+    slow_speed=BackendConfig.OBSTACLE_SLOW_SPEED,
+    max_age=BackendConfig.OBSTACLE_MAX_AGE,
+    max_age_factor=BackendConfig.OBSTACLE_MAX_AGE_FACTOR,
+    max_age_limit=BackendConfig.OBSTACLE_MAX_AGE_LIMIT,
+    inactive_speed_limit=BackendConfig.OBSTACLE_INACTIVE_SPEED_LIMIT
+)
+
+# The gate is active while depth runs; a stale map then slows forward motion
+def track_obstacle_gate(version, changes):
+    if "depth_camera_enabled" in changes:
+        obstacle_map.active = changes["depth_camera_enabled"]
+
+robot_state.subscribe(track_obstacle_gate)
+
+# Long-term detection history with the robot position, batched to column files
+detection_log = DetectionLog(
+    BackendConfig.DETECTION_LOG_DIR,
+    segment_seconds=BackendConfig.DETECTION_LOG_SEGMENT_SECONDS,
+    flush_interval=BackendConfig.DETECTION_LOG_FLUSH_INTERVAL,
+    batch_size=BackendConfig.DETECTION_LOG_BATCH_SIZE,
+    retention_seconds=BackendConfig.DETECTION_LOG_RETENTION_DAYS * 86400
+)
+
+# Fleet view: this robot plus every configured controller, each followed over
+# one persistent telemetry connection
+fleet = FleetAggregator(
+    max_rate=BackendConfig.FLEET_MAX_RATE,
+    max_reconnect_delay=BackendConfig.FLEET_MAX_RECONNECT_DELAY,
+    track_store=track_store,
+    index_cell_size=BackendConfig.FLEET_INDEX_CELL_SIZE,
+    codec=FleetCodec(BackendConfig.FLEET_COORD_SCALE, BackendConfig.FLEET_BATTERY_STEP)
+)
+fleet.add_local(BackendConfig.ROBOT_ID, BackendConfig.ROBOT_MODEL, robot_state)
+for robot in BackendConfig.FLEET_ROBOTS:
+    fleet.add_remote(robot["id"], robot.get("model"), robot["url"])
+
+gps_reader = GPSReader(
+    create_gps_source(),
+    on_update=on_gps_update,
+    max_reconnect_delay=BackendConfig.GPS_MAX_RECONNECT_DELAY
+)
 
 # Function to set the servo angle
 def set_servo_angle(angle):
     servo.angle = angle
     sleep(0.05)
 
-# Function to collect GPS data in background
-def collect_gps_data():
-    global gps_socket, data_stream, gps_running
-    
-    print("[DEBUG] GPS thread: Starting GPS data collection with hardcoded coordinates")
-    
-    # University of Malaya, KK9, Kuala Lumpur, Malaysia coordinates
-    um_kk9_lat = 3.1209
-    um_kk9_lon = 101.6559
-    
-    try:
-        # Main data collection loop with hardcoded coordinates
-        while gps_running:
-            # Use hardcoded coordinates
-            robot_state["posY"] = um_kk9_lat
-            robot_state["posX"] = um_kk9_lon
-            robot_state["gps_status"] = "active"
-            
-            # Sleep between updates
-            sleep(1)
-            
-    except Exception as e:
-        print(f"[ERROR] GPS thread: Critical error: {str(e)}")
-        robot_state["gps_status"] = f"error: {str(e)}"
-    finally:
-        print("[DEBUG] GPS thread: GPS collection terminated")
-        robot_state["gps_status"] = "disconnected"
-
 # Start GPS data collection thread
 def start_gps():
-    global gps_thread, gps_running
-    print("[DEBUG] Attempting to start GPS thread...")
-    if gps_thread is None or not gps_thread.is_alive():
-        gps_running = True
-        gps_thread = threading.Thread(target=collect_gps_data)
-        gps_thread.daemon = True
-        gps_thread.start()
-        print(f"[DEBUG] GPS thread started successfully. Thread ID: {gps_thread.ident}")
-    else:
-        print("[DEBUG] GPS thread already running. Skipping initialization.")
+    print(f"[INFO] Starting GPS reader ({gps_reader.source.name})")
+    gps_reader.start()
 
 # Stop GPS data collection
 def stop_gps():
-    global gps_running
-    gps_running = False
-    if gps_thread is not None:
-        gps_thread.join(timeout=2.0)
+    gps_reader.stop()
     print("GPS data collection stopped")
 
 # Start GPS on application startup
 @app.on_event("startup")
 async def startup_event():
+    register_route_metrics()
+    loop_watchdog.start()
+    quality.start()
+    governor.start()
     start_gps()
+    await telemetry.start()
+    await fleet.start()
+    if BackendConfig.PRELOAD_MODELS:
+        services.preload()
+    if DebugConfig.SAVE_DEBUG_FRAMES:
+        recorder.start()
+    detection_log.start()
 
 # Stop GPS on application shutdown
 @app.on_event("shutdown")
 async def shutdown_event():
+    await fleet.stop()
+    await telemetry.stop()
+    await loop_watchdog.stop()
+    await governor.stop()
+    await quality.stop()
+    recorder.stop()
+    detection_log.stop()
     stop_gps()
 
+def register_route_metrics():
+    """Pre-register request metric labels for every HTTP route."""
+    label_sets = [(method, "other") for method in ("GET", "POST")]
+    for route in app.routes:
+        label_sets.extend((method, route.path) for method in getattr(route, "methods", None) or ())
+    for method, path in label_sets:
+        request_latency.labels(method, path)
+        for status in ("2xx", "4xx", "5xx"):
+            request_responses.labels(method, path, status)
+
+def collect_service_metrics():
+    """Read frame counters, queue depths and model load state at scrape time."""
+    received, processed, dropped, load_time, ready = [], [], [], [], []
+    for name in ("ai_detection", "depth_camera"):
+        labels = {"service": name}
+        service_status = services[name].get_status()
+        load_time.append((labels, service_status["load_time"]))
+        ready.append((labels, 1 if service_status["ready"] else 0))
+        instance = services.get(name)
+        if instance is not None:
+            received.append((labels, instance.frames_received))
+            processed.append((labels, instance.frames_processed))
+            dropped.append((labels, instance.frames_dropped))
+    yield ("nautilus_frames_received_total", "counter", "Frames received per service.", received)
+    yield ("nautilus_frames_processed_total", "counter", "Frames fully processed per service.", processed)
+    yield ("nautilus_frames_dropped_total", "counter", "Frames shed (rate limited, paused or superseded in the queue) or failed per service.", dropped)
+    yield ("nautilus_model_load_seconds", "gauge", "Time taken to load and warm up each service.", load_time)
+    yield ("nautilus_service_ready", "gauge", "Whether each model service is loaded.", ready)
+
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is not None:
+        yield ("nautilus_depth_queue_depth", "gauge", "Items waiting in the depth camera queues.", [
+            ({"queue": "frame"}, depth_camera_service.frame_queue.qsize()),
+            ({"queue": "depth"}, depth_camera_service.depth_queue.qsize())
+        ])
+    yield ("nautilus_quality_level", "gauge", "Effective vision quality level (0 = best).",
+           [({}, quality.effective_level)])
+    yield ("nautilus_quality_changes_total", "counter", "Quality level changes.", [({}, quality.change_count)])
+    yield ("nautilus_governor_tier", "gauge", "Compute governor tier (0 normal, 1 reduced, 2 critical).",
+           [({}, governor.tier)])
+    ai_detection_service = services.get("ai_detection")
+    if ai_detection_service is not None:
+        yield ("nautilus_frames_throttled_total", "counter", "AI frames refused by the governor's rate limit.",
+               [({"service": "ai_detection"}, ai_detection_service.frames_throttled)])
+
+metrics.add_collector(collect_service_metrics)
+metrics.add_collector(process_metrics)
+
 @app.get("/")
 async def root(request: Request):
     # Redirect to fleet management page as the default landing page
@@ -173,120 +441,481 @@ async def fleet_management(request: Request):
 async def controller(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
+def apply_move(direction, intensity=None):
+    """
+    Apply a movement command to the robot state.
+    
+    Forward directions are checked against the obstacle map first: near an
+    obstacle the speed limit is lowered, and when the way is blocked the
+    robot is stopped instead.
+    
+    Args:
+        direction: Movement direction
+        intensity: Joystick deflection in percent; caps the speed limit
+            (None for full speed, e.g. button controls)
+    
+    Returns:
+        Tuple of (version, changes, obstacle check)
+    """
+    check = obstacle_map.check(direction)
+    if check["action"] == "stop":
+        version, changes = robot_state.update(is_moving=False, current_direction="stopped", speed_limit=0)
+        return version, changes, check
+    with robot_state.lock:
+        # Note: No need to modify GPS coordinates as they come from the GPS module
+        # Just update the heading based on direction
+        heading = robot_state.get("heading")
+        if direction == "left":
+            heading = (heading - 5) % 360
+        elif direction == "right":
+            heading = (heading + 5) % 360
+        
+        speed_limit = check["speed_limit"]
+        if intensity is not None:
+            speed_limit = min(speed_limit, max(0, min(100, round(intensity))))
+        version, changes = robot_state.update(is_moving=True, current_direction=direction, heading=heading,
+                                              speed_limit=speed_limit)
+        return version, changes, check
+
+def apply_stop():
+    """Stop the robot; returns (version, changes)."""
+    return robot_state.update(is_moving=False, current_direction="stopped")
+
 @app.post("/api/move")
 async def move_robot(request: Request):
     data = await request.json()
     direction = data.get("direction")
+    intensity = data.get("intensity")
+    if not isinstance(intensity, (int, float)):
+        intensity = None
     
-    robot_state["is_moving"] = True
-    robot_state["current_direction"] = direction
+    version, changes, check = apply_move(direction, intensity)
+    recorder.record_command("/api/move", {"direction": direction, "intensity": intensity})
     
-    # Note: No need to modify GPS coordinates as they come from the GPS module
-    # Just update the heading based on direction
-    if direction == "left":
-        robot_state["heading"] = (robot_state["heading"] - 5) % 360
-    elif direction == "right":
-        robot_state["heading"] = (robot_state["heading"] + 5) % 360
-    
-    return JSONResponse({"status": "success", "direction": direction, "state": robot_state})
+    if check["action"] == "stop":
+        return JSONResponse({
+            "status": "error",
+            "message": f"Forward motion blocked: obstacle ahead ({', '.join(check['classes']) or 'depth'})",
+            "obstacle": check,
+            "state": changes,
+            "version": version
+        }, status_code=409)
+    return JSONResponse({"status": "success", "direction": direction, "obstacle": check,
+                         "state": changes, "version": version})
 
 @app.post("/api/stop")
 async def stop_robot():
-    robot_state["is_moving"] = False
-    robot_state["current_direction"] = "stopped"
-    return JSONResponse({"status": "success", "state": robot_state})
+    version, changes = apply_stop()
+    recorder.record_command("/api/stop")
+    return JSONResponse({"status": "success", "state": changes, "version": version})
+
+@app.websocket("/ws/teleop")
+async def teleop_socket(websocket: WebSocket):
+    """
+    Teleoperation channel for high-rate movement commands.
+    
+    Clients send compact frames {"d": direction, "i": intensity, "s": seq}
+    and receive acks {"s": seq, "v": state_version}. The intensity (joystick
+    deflection in percent, optional) caps the speed limit. Frames with a
+    sequence number not above the last one are acked with "stale" and
+    ignored. A move refused by the obstacle gate is acked with
+    {"s": seq, "v": state_version, "blocked": obstacle check}.
+    While moving, the robot is stopped if no frame arrives within
+    BackendConfig.TELEOP_DEADMAN_TIMEOUT (dead-man switch), and the client
+    is told with {"stop": "deadman"}. Disconnecting also stops the robot.
+    """
+    await websocket.accept()
+    last_seq = -1
+    moving = False
+    
+    try:
+        while True:
+            try:
+                timeout = BackendConfig.TELEOP_DEADMAN_TIMEOUT if moving else None
+                message = await asyncio.wait_for(websocket.receive_text(), timeout)
+            except asyncio.TimeoutError:
+                version, _ = apply_stop()
+                moving = False
+                await websocket.send_text(json.dumps({"stop": "deadman", "v": version}))
+                continue
+            
+            try:
+                frame = json.loads(message)
+                direction = frame["d"]
+                seq = int(frame["s"])
+                intensity = float(frame["i"]) if frame.get("i") is not None else None
+            except (ValueError, KeyError, TypeError):
+                await websocket.send_text(json.dumps({"error": "bad frame"}))
+                continue
+            
+            if seq <= last_seq:
+                await websocket.send_text(json.dumps({"s": seq, "stale": True}))
+                continue
+            last_seq = seq
+            
+            if direction == "stop":
+                version, _ = apply_stop()
+                recorder.record_command("/api/stop")
+                moving = False
+            else:
+                version, _, check = apply_move(direction, intensity)
+                recorder.record_command("/api/move", {"direction": direction, "intensity": intensity})
+                moving = check["action"] != "stop"
+                if not moving:
+                    await websocket.send_text(json.dumps({"s": seq, "v": version, "blocked": check}))
+                    continue
+            
+            await websocket.send_text(json.dumps({"s": seq, "v": version}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if moving:
+            apply_stop()
 
 @app.post("/api/servo/toggle")
 async def toggle_servo():
     # Toggle between 0 and 180 degrees
-    new_angle = 180 if robot_state["servo_angle"] == 0 else 0
-    robot_state["servo_angle"] = new_angle
+    with robot_state.lock:
+        new_angle = 180 if robot_state.get("servo_angle") == 0 else 0
+        version, changes = robot_state.update(servo_angle=new_angle)
     
     # Actually control the physical servo
     set_servo_angle(new_angle)
+    recorder.record_command("/api/servo/toggle")
     
     return JSONResponse({
         "status": "success", 
-        "servo_angle": robot_state["servo_angle"],
-        "state": robot_state
+        "servo_angle": new_angle,
+        "state": changes,
+        "version": version
     })
 
+@app.get("/api/gps")
+async def get_gps():
+    """Get the full GPS fix including fix quality and reader status."""
+    fix = gps_reader.get_fix()
+    fix["updates_received"] = gps_reader.updates_received
+    fix["reconnects"] = gps_reader.reconnects
+    return JSONResponse(fix)
+
 @app.get("/api/coordinates")
 async def get_coordinates():
     """
     Returns the current GPS coordinates of the robot.
     This endpoint provides just the raw latitude and longitude values.
     """
+    state = robot_state.snapshot()
     return JSONResponse({
-        "posY": robot_state.get("posY", 0.0),  # Latitude
-        "posX": robot_state.get("posX", 0.0),  # Longitude
-        "success": robot_state.get("gps_status") == "active"
+        "posY": state["posY"],  # Latitude
+        "posX": state["posX"],  # Longitude
+        "success": state["gps_status"] == "active"
     })
 
+@app.get("/api/track")
+async def get_track(robot_id: str = BackendConfig.ROBOT_ID, start: float = None, end: float = None, method: str = "dp",
+                    tolerance: float = BackendConfig.TRACK_DP_TOLERANCE,
+                    bucket: float = BackendConfig.TRACK_BUCKET_SECONDS):
+    """
+    Returns the robot's position history between two unix timestamps.
+    method is "dp" (Douglas-Peucker, tolerance in meters), "bucket" (last
+    sample per `bucket` seconds) or "raw"; points are [time, lat, lon, heading].
+    """
+    if robot_id not in track_store.robot_ids():
+        return JSONResponse({"status": "error", "message": f"No track for robot {robot_id}"}, status_code=404)
+    if method not in ("dp", "bucket", "raw") or tolerance < 0 or bucket <= 0:
+        return JSONResponse({"status": "error", "message": "Invalid track query"}, status_code=400)
+
+    track = track_store.history(robot_id).get_track(
+        start, end, method=method, tolerance=tolerance, bucket_seconds=bucket
+    )
+    track["status"] = "success"
+    track["robot_id"] = robot_id
+    return JSONResponse(track)
+
 @app.post("/api/servo/set")
 async def set_servo(request: Request):
     data = await request.json()
     angle = max(0, min(180, int(data.get("angle", 0))))
-    robot_state["servo_angle"] = angle
+    version, changes = robot_state.update(servo_angle=angle)
     
     # Actually control the physical servo
     set_servo_angle(angle)
+    recorder.record_command("/api/servo/set", {"angle": angle})
     
     return JSONResponse({
         "status": "success", 
-        "servo_angle": robot_state["servo_angle"],
-        "state": robot_state
+        "servo_angle": angle,
+        "state": changes,
+        "version": version
     })
 
 @app.post("/api/camera/toggle")
 async def toggle_camera():
-    robot_state["camera_enabled"] = not robot_state["camera_enabled"]
+    with robot_state.lock:
+        camera_enabled = not robot_state.get("camera_enabled")
+        version, changes = robot_state.update(camera_enabled=camera_enabled)
+    recorder.record_command("/api/camera/toggle")
     return JSONResponse({
         "status": "success", 
-        "camera_enabled": robot_state["camera_enabled"],
-        "state": robot_state
+        "camera_enabled": camera_enabled,
+        "state": changes,
+        "version": version
     })
 
 @app.post("/api/speed")
 async def set_speed(request: Request):
     data = await request.json()
     speed = max(0, min(100, int(data.get("speed", 50))))
-    robot_state["motor_speed"] = speed
-    return JSONResponse({"status": "success", "speed": speed, "state": robot_state})
+    version, changes = robot_state.update(motor_speed=speed)
+    recorder.record_command("/api/speed", {"speed": speed})
+    return JSONResponse({"status": "success", "speed": speed, "state": changes, "version": version})
 
 @app.get("/api/status")
-async def get_status():
-    # Add some random sensor data for realism
-    robot_state["timestamp"] = datetime.now().isoformat()
-    robot_state["battery"] = random.randint(70, 100)
-    robot_state["temperature"] = round(random.uniform(20, 100), 1)
+async def get_status(since: int = None):
+    """
+    Get the robot status. With ?since=<version>, only the state fields that
+    changed after that version are returned.
+    """
+    # Battery and temperature are sampled by the telemetry publisher. The
+    # response time is not state: writing it would bump the version on every poll.
+    status = robot_state.snapshot() if since is None else robot_state.changes_since(since)
+    status["timestamp"] = datetime.now().isoformat()
     
     # Add AI detection status if available
-    if AI_DETECTION_AVAILABLE:
+    ai_detection_service = services.get("ai_detection")
+    if ai_detection_service is not None:
         ai_status = ai_detection_service.get_status()
-        robot_state["ai_detection_status"] = ai_status
+        status["ai_detection_status"] = ai_status
+    
+    # Report model readiness so clients know when vision features are usable
+    status["services"] = services.get_status()
+    # Sensor readings and the workload limits they caused
+    status["governor"] = governor.get_status(limit=0)
     
-    return JSONResponse(robot_state)
+    return JSONResponse(status)
+
+@app.websocket("/ws/telemetry")
+async def telemetry_socket(websocket: WebSocket):
+    """Push robot state deltas to a dashboard."""
+    await telemetry.handle_client(websocket)
+
+@app.get("/api/telemetry/static")
+async def get_telemetry_static():
+    """Get static data (class list, colormaps) that dashboards fetch once."""
+    return JSONResponse(telemetry.get_static())
+
+@app.get("/api/telemetry/status")
+async def get_telemetry_status():
+    """Get telemetry publisher statistics."""
+    return JSONResponse(telemetry.get_status())
+
+# Fleet endpoints
+def parse_bbox(bbox):
+    """Parse a "south,west,north,east" query value; returns None if invalid."""
+    try:
+        values = tuple(float(value) for value in bbox.split(","))
+    except ValueError:
+        return None
+    return values if len(values) == 4 else None
+
+@app.get("/api/fleet")
+async def get_fleet(since: int = None, bbox: str = None):
+    """
+    Returns the fleet snapshot in the compact fleet protocol, or with `since`
+    only the changed fields of robots that changed after that fleet version.
+    With `bbox` ("south,west,north,east") only robots inside the viewport are
+    sent; changed robots outside it are listed under "x".
+    """
+    viewport = None
+    if bbox is not None:
+        viewport = parse_bbox(bbox)
+        if viewport is None:
+            return JSONResponse({"status": "error", "message": "Invalid bbox"}, status_code=400)
+
+    # Pre-encoded and cached per version, so concurrent dashboards share one encode
+    return Response(fleet.encoded_changes(since, viewport), media_type="application/json")
+
+@app.get("/api/fleet/nearest")
+async def get_nearest_robots(lat: float, lng: float, k: int = 1, max_distance: float = None):
+    """Returns the k robots nearest to a point, with distances in meters."""
+    return JSONResponse({"status": "success", "robots": fleet.nearest(lat, lng, k, max_distance)})
+
+@app.get("/api/fleet/geofences")
+async def get_geofences():
+    """Returns the ids of the robots inside each configured geofence."""
+    return JSONResponse({
+        "status": "success",
+        "geofences": {
+            name: fleet.in_geofence(polygon) for name, polygon in BackendConfig.GEOFENCES.items()
+        }
+    })
+
+@app.websocket("/ws/fleet")
+async def fleet_socket(websocket: WebSocket):
+    """Push fleet deltas to a fleet dashboard."""
+    await fleet.handle_client(websocket)
+
+@app.get("/api/fleet/status")
+async def get_fleet_status():
+    return JSONResponse(fleet.get_status())
+
+# Metrics endpoints
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of request, pipeline and process metrics."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/metrics/latency")
+async def get_latency_metrics():
+    """
+    Returns rolling per-stage latency percentiles (ms) for the vision
+    pipelines; services that are not loaded report null.
+    """
+    ai_detection_service = services.get("ai_detection")
+    depth_camera_service = services.get("depth_camera")
+    return JSONResponse({
+        "status": "success",
+        "ai_detection": ai_detection_service.get_latency() if ai_detection_service else None,
+        "depth_camera": depth_camera_service.get_latency() if depth_camera_service else None
+    })
+
+@app.get("/api/metrics/loop-stalls")
+async def get_loop_stalls(limit: int = None):
+    """
+    Returns recent event-loop stalls (newest first) with their duration and
+    the handler and stack that blocked the loop.
+    """
+    stalls = loop_watchdog.get_stalls(limit)
+    stalls["status"] = "success"
+    return JSONResponse(stalls)
+
+# Profiling admin endpoints
+@app.post("/api/admin/profile/cpu/start")
+async def start_cpu_profile(request: Request):
+    """
+    Start a sampling CPU profile of every thread (or only the event loop with
+    "loop_only") that stops by itself after "seconds" (default 10) at "hz"
+    samples per second (default 100); both are capped by BackendConfig.
+    """
+    data = await request.json() if await request.body() else {}
+    try:
+        seconds = float(data.get("seconds", 10))
+        hz = float(data.get("hz", 100))
+    except (TypeError, ValueError):
+        return JSONResponse({"status": "error", "message": "Invalid profile parameters"}, status_code=400)
+    thread_id = threading.get_ident() if data.get("loop_only") else None
+    if not cpu_profiler.start(seconds, hz, thread_id):
+        return JSONResponse({"status": "error", "message": "A CPU profile is already running"}, status_code=409)
+    return JSONResponse({"status": "success", "profile": cpu_profiler.status()})
+
+@app.post("/api/admin/profile/cpu/stop")
+async def stop_cpu_profile():
+    """Stop the running CPU profile early."""
+    await asyncio.get_event_loop().run_in_executor(None, cpu_profiler.stop)
+    return JSONResponse({"status": "success", "profile": cpu_profiler.status()})
+
+@app.get("/api/admin/profile/cpu")
+async def get_cpu_profile():
+    """Get the state of the current or last CPU profile."""
+    return JSONResponse({"status": "success", "profile": cpu_profiler.status()})
+
+@app.get("/api/admin/profile/cpu/folded")
+async def get_cpu_profile_folded():
+    """Get the last CPU profile as folded stacks (input for flamegraph.pl or speedscope)."""
+    return PlainTextResponse(cpu_profiler.folded())
+
+@app.post("/api/admin/profile/memory/start")
+async def start_allocation_tracing(frames: int = 10, seconds: float = None):
+    """Start tracemalloc with `frames` stack frames per allocation for at most `seconds`."""
+    if not allocations.start(frames, seconds):
+        return JSONResponse({"status": "error", "message": "Allocation tracing is already running"}, status_code=409)
+    return JSONResponse({"status": "success", "memory": allocations.status()})
+
+@app.post("/api/admin/profile/memory/stop")
+async def stop_allocation_tracing():
+    """Stop tracemalloc and drop all snapshots."""
+    allocations.stop()
+    return JSONResponse({"status": "success", "memory": allocations.status()})
+
+@app.get("/api/admin/profile/memory")
+async def get_allocation_status():
+    """Get tracing state, traced memory and the kept snapshot names."""
+    return JSONResponse({"status": "success", "memory": allocations.status()})
+
+@app.post("/api/admin/profile/memory/snapshot")
+async def take_allocation_snapshot(name: str, limit: int = 20):
+    """Take a named allocation snapshot and return its largest allocation sites."""
+    limit = max(1, min(limit, 100))
+    loop = asyncio.get_event_loop()
+    try:
+        snapshot = await loop.run_in_executor(None, allocations.snapshot, name)
+    except RuntimeError as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=409)
+    snapshot["top"] = await loop.run_in_executor(None, allocations.top, name, limit)
+    snapshot["status"] = "success"
+    return JSONResponse(snapshot)
+
+@app.get("/api/admin/profile/memory/diff")
+async def diff_allocation_snapshots(old: str, new: str, limit: int = 20):
+    """Compare two named snapshots; sites with the largest growth come first."""
+    limit = max(1, min(limit, 100))
+    try:
+        diff = await asyncio.get_event_loop().run_in_executor(None, allocations.diff, old, new, limit)
+    except KeyError as e:
+        return JSONResponse({"status": "error", "message": f"Unknown snapshot {e}"}, status_code=404)
+    return JSONResponse({"status": "success", "old": old, "new": new, "diff": diff})
+
+def get_inference_profiler(name):
+    """Get the torch inference profiler of a loaded vision service, or None."""
+    if name == "ai_detection":
+        service = services.get("ai_detection")
+        return service.profiler if service is not None else None
+    if name == "depth_camera":
+        service = services.get("depth_camera")
+        if service is None or service.depth_processor is None:
+            return None
+        return service.depth_processor.profiler
+    return None
+
+@app.post("/api/admin/profile/torch")
+async def start_torch_profile(service: str, inferences: int = 10):
+    """
+    Capture a torch profile around the next `inferences` inferences of the
+    "ai_detection" or "depth_camera" service.
+    """
+    profiler = get_inference_profiler(service)
+    if profiler is None:
+        return JSONResponse({"status": "error", "message": f"Service {service} is not loaded"}, status_code=404)
+    inferences = min(inferences, BackendConfig.TORCH_PROFILE_MAX_INFERENCES)
+    if not profiler.arm(inferences):
+        return JSONResponse({"status": "error", "message": "A torch profile is already pending"}, status_code=409)
+    return JSONResponse({"status": "success", "profile": profiler.status()})
+
+@app.get("/api/admin/profile/torch")
+async def get_torch_profile(service: str):
+    """Get the state and last operator summary of a service's torch profile."""
+    profiler = get_inference_profiler(service)
+    if profiler is None:
+        return JSONResponse({"status": "error", "message": f"Service {service} is not loaded"}, status_code=404)
+    return JSONResponse({"status": "success", "profile": profiler.status()})
 
 # AI Detection endpoints
 @app.post("/api/ai-detection/toggle")
 async def toggle_ai_detection():
     """Toggle AI detection on/off"""
-    if not AI_DETECTION_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "AI Detection service not available"
-        }, status_code=503)
+    ai_detection_service = await wait_for_service("ai_detection")
+    if ai_detection_service is None:
+        return service_unavailable_response("ai_detection", "AI Detection")
     
     try:
-        if robot_state["ai_detection_enabled"]:
+        if robot_state.get("ai_detection_enabled"):
             ai_detection_service.disable_detection()
-            robot_state["ai_detection_enabled"] = False
+            version, changes = robot_state.update(ai_detection_enabled=False)
             message = "AI detection disabled"
         else:
             success = ai_detection_service.enable_detection()
             if success:
-                robot_state["ai_detection_enabled"] = True
+                version, changes = robot_state.update(ai_detection_enabled=True)
                 message = "AI detection enabled"
             else:
                 return JSONResponse({
@@ -297,8 +926,9 @@ async def toggle_ai_detection():
         return JSONResponse({
             "status": "success",
             "message": message,
-            "ai_detection_enabled": robot_state["ai_detection_enabled"],
-            "state": robot_state
+            "ai_detection_enabled": robot_state.get("ai_detection_enabled"),
+            "state": changes,
+            "version": version
         })
     except Exception as e:
         return JSONResponse({
@@ -309,18 +939,24 @@ async def toggle_ai_detection():
 @app.post("/api/ai-detection/process-frame")
 async def process_frame(request: Request):
     """Process a frame for AI detection"""
-    if not AI_DETECTION_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "AI Detection service not available"
-        }, status_code=503)
+    ai_detection_service = services.get("ai_detection")
+    if ai_detection_service is None:
+        return service_unavailable_response("ai_detection", "AI Detection")
     
-    if not robot_state["ai_detection_enabled"]:
+    if not robot_state.get("ai_detection_enabled"):
         return JSONResponse({
             "status": "error",
             "message": "AI detection is not enabled"
         }, status_code=400)
     
+    retry_after = ai_detection_service.throttle_delay()
+    if retry_after > 0:
+        return JSONResponse({
+            "status": "throttled",
+            "message": "AI detection rate limited by the compute governor",
+            "retry_after": round(retry_after, 3)
+        }, status_code=429)
+    
     try:
         data = await request.json()
         base64_frame = data.get("frame")
@@ -332,7 +968,17 @@ async def process_frame(request: Request):
             }, status_code=400)
         
         # Process the frame
+        received_at = time.time()
         annotated_frame, detections = ai_detection_service.process_base64_frame(base64_frame)
+        # Detections are only useful next to the frame they came from
+        if recorder.record_camera(base64_frame, received_at, source="ai_detection"):
+            recorder.record_detections(detections, received_at)
+        # Without an active fix posY/posX are the store defaults or a stale position
+        state = robot_state.snapshot()
+        if state["gps_status"] == "active":
+            detection_log.append(received_at, detections, state["posY"], state["posX"])
+        else:
+            detection_log.append(received_at, detections)
         
         # Generate detection summary
         detection_summary = ai_detection_service.get_detection_summary(detections)
@@ -342,7 +988,8 @@ async def process_frame(request: Request):
             "annotated_frame": annotated_frame,
             "detections": detections,
             "summary": detection_summary,
-            "ai_status": ai_detection_service.get_status()
+            "ai_status": ai_detection_service.get_status(),
+            "upload_quality": quality.settings["upload_quality"]
         })
         
     except Exception as e:
@@ -354,17 +1001,16 @@ async def process_frame(request: Request):
 @app.post("/api/ai-detection/set-confidence")
 async def set_confidence_threshold(request: Request):
     """Set the confidence threshold for AI detection"""
-    if not AI_DETECTION_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "AI Detection service not available"
-        }, status_code=503)
+    ai_detection_service = services.get("ai_detection")
+    if ai_detection_service is None:
+        return service_unavailable_response("ai_detection", "AI Detection")
     
     try:
         data = await request.json()
         threshold = float(data.get("threshold", 0.5))
         
         ai_detection_service.set_confidence_threshold(threshold)
+        recorder.record_command("/api/ai-detection/set-confidence", {"threshold": threshold})
         
         return JSONResponse({
             "status": "success",
@@ -382,42 +1028,41 @@ async def set_confidence_threshold(request: Request):
 @app.get("/api/ai-detection/status")
 async def get_ai_detection_status():
     """Get AI detection service status"""
-    if not AI_DETECTION_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "AI Detection service not available"
-        }, status_code=503)
+    ai_detection_service = services.get("ai_detection")
+    if ai_detection_service is None:
+        return service_unavailable_response("ai_detection", "AI Detection")
     
     return JSONResponse({
         "status": "success",
         "ai_status": ai_detection_service.get_status(),
-        "enabled": robot_state["ai_detection_enabled"]
+        "enabled": robot_state.get("ai_detection_enabled")
     })
 
 # Depth Camera endpoints
 @app.post("/api/depth-camera/toggle")
 async def toggle_depth_camera():
     """Toggle depth camera on/off"""
-    if not DEPTH_CAMERA_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "Depth Camera service not available"
-        }, status_code=503)
+    depth_camera_service = await wait_for_service("depth_camera")
+    if depth_camera_service is None:
+        return service_unavailable_response("depth_camera", "Depth Camera")
     
     try:
-        if robot_state["depth_camera_enabled"]:
+        if robot_state.get("depth_camera_enabled"):
             result = depth_camera_service.stop_depth_processing()
-            robot_state["depth_camera_enabled"] = False
+            version, changes = robot_state.update(depth_camera_enabled=False)
         else:
             result = depth_camera_service.start_depth_processing()
             if result["status"] == "success":
-                robot_state["depth_camera_enabled"] = True
+                version, changes = robot_state.update(depth_camera_enabled=True)
+            else:
+                version, changes = robot_state.version, {}
         
         return JSONResponse({
             "status": result["status"],
             "message": result["message"],
-            "depth_camera_enabled": robot_state["depth_camera_enabled"],
-            "state": robot_state
+            "depth_camera_enabled": robot_state.get("depth_camera_enabled"),
+            "state": changes,
+            "version": version
         })
         
     except Exception as e:
@@ -429,13 +1074,11 @@ async def toggle_depth_camera():
 @app.post("/api/depth-camera/process-frame")
 async def process_depth_frame(request: Request):
     """Process a frame for depth estimation"""
-    if not DEPTH_CAMERA_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "Depth Camera service not available"
-        }, status_code=503)
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is None:
+        return service_unavailable_response("depth_camera", "Depth Camera")
     
-    if not robot_state["depth_camera_enabled"]:
+    if not robot_state.get("depth_camera_enabled"):
         return JSONResponse({
             "status": "error",
             "message": "Depth camera is not enabled"
@@ -452,7 +1095,10 @@ async def process_depth_frame(request: Request):
             }, status_code=400)
         
         # Process the frame for depth estimation
+        recorder.record_camera(base64_frame, source="depth_camera")
         result = depth_camera_service.process_frame(base64_frame)
+        # JPEG quality the browser should capture the next frame at
+        result["upload_quality"] = quality.settings["upload_quality"]
         
         return JSONResponse(result)
         
@@ -462,14 +1108,35 @@ async def process_depth_frame(request: Request):
             "message": f"Error processing depth frame: {str(e)}"
         }, status_code=500)
 
+@app.post("/api/depth-camera/mode")
+async def set_depth_mode(request: Request):
+    """Switch depth between the full colormapped frame ("full") and per-object depth ("objects")."""
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is None:
+        return service_unavailable_response("depth_camera", "Depth Camera")
+    
+    data = await request.json()
+    result = depth_camera_service.set_depth_mode(data.get("mode"))
+    return JSONResponse(result, status_code=200 if result["status"] == "success" else 400)
+
+@app.get("/api/depth-camera/objects")
+async def get_object_depths():
+    """Get the latest per-object depth estimates (objects mode)."""
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is None:
+        return service_unavailable_response("depth_camera", "Depth Camera")
+    return JSONResponse({
+        "status": "success",
+        "mode": depth_camera_service.depth_mode,
+        "objects": depth_camera_service.last_objects
+    })
+
 @app.post("/api/depth-camera/change-colormap")
 async def change_depth_colormap():
     """Change depth visualization colormap"""
-    if not DEPTH_CAMERA_AVAILABLE:
-        return JSONResponse({
-            "status": "error",
-            "message": "Depth Camera service not available"
-        }, status_code=503)
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is None:
+        return service_unavailable_response("depth_camera", "Depth Camera")
     
     try:
         result = depth_camera_service.change_colormap()
@@ -484,10 +1151,12 @@ async def change_depth_colormap():
 @app.get("/api/depth-camera/status")
 async def get_depth_camera_status():
     """Get depth camera service status"""
-    if not DEPTH_CAMERA_AVAILABLE:
+    depth_camera_service = services.get("depth_camera")
+    if depth_camera_service is None:
         return JSONResponse({
             "status": "error",
             "message": "Depth Camera service not available",
+            "service_state": services["depth_camera"].get_status()["state"],
             "depth_status": {
                 "available": False,
                 "colormap": "Plasma"
@@ -498,13 +1167,105 @@ async def get_depth_camera_status():
     return JSONResponse({
         "status": "success",
         "depth_status": depth_camera_service.get_status(),
-        "enabled": robot_state["depth_camera_enabled"]
+        "enabled": robot_state.get("depth_camera_enabled")
     })
 
+# Recording endpoints
+@app.post("/api/recording/start")
+async def start_recording():
+    """Start recording camera frames, raw depth maps and detections to disk."""
+    recorder.start()
+    return JSONResponse({"status": "success", "recording": recorder.get_status()})
+
+@app.post("/api/recording/stop")
+async def stop_recording():
+    """Stop recording and close the current segment."""
+    await asyncio.get_event_loop().run_in_executor(None, recorder.stop)
+    return JSONResponse({"status": "success", "recording": recorder.get_status()})
+
+@app.get("/api/recording/status")
+async def get_recording_status():
+    """Get recording state, record counters and disk usage."""
+    return JSONResponse({"status": "success", "recording": recorder.get_status()})
+
+# Detection history endpoints
+@app.get("/api/detections")
+async def get_detections(start: float = None, end: float = None, class_name: str = None, limit: int = 1000):
+    """
+    Get logged detections, newest first.
+
+    start/end are unix seconds (default: the last hour); class_name is a
+    comma-separated list of class names.
+    """
+    if start is None:
+        start = (end if end is not None else time.time()) - 3600
+    class_ids = None if not class_name else detection_log.class_ids(class_name.split(","))
+    result = await asyncio.get_event_loop().run_in_executor(
+        None, detection_log.query, start, end, class_ids, max(1, min(limit, 10000)))
+    return JSONResponse({"status": "success", "start": start, "end": end, **result})
+
+@app.get("/api/detections/counts")
+async def get_detection_counts(start: float = None, end: float = None, bucket: float = 60, class_name: str = None):
+    """Count logged detections per class in time buckets of `bucket` seconds."""
+    if start is None:
+        start = (end if end is not None else time.time()) - 3600
+    if bucket <= 0:
+        return JSONResponse({"status": "error", "message": "bucket must be positive"}, status_code=400)
+    class_ids = None if not class_name else detection_log.class_ids(class_name.split(","))
+    buckets = await asyncio.get_event_loop().run_in_executor(
+        None, detection_log.counts, start, end, bucket, class_ids)
+    return JSONResponse({"status": "success", "start": start, "end": end, "bucket": bucket, "buckets": buckets})
+
+@app.get("/api/detections/status")
+async def get_detection_log_status():
+    """Get the detection log's size and time span."""
+    return JSONResponse({"status": "success", "detection_log": detection_log.get_status()})
+
+# Obstacle map endpoints
+@app.get("/api/obstacles")
+async def get_obstacles():
+    """
+    Returns the obstacle grid (occupancy, nearness and detection labels per
+    cell), the current decision for each forward direction and the gate
+    state: "active", "stale" (depth is on but the map is old; forward motion
+    is slowed) or "inactive" (depth is off).
+    """
+    grid = obstacle_map.get_grid()
+    grid["status"] = "success"
+    return JSONResponse(grid)
+
+# Quality control endpoints
+@app.get("/api/quality")
+async def get_quality(limit: int = None):
+    """Get the quality level, its settings, the last measurements and recent changes."""
+    status = quality.get_status(limit)
+    status["status"] = "success"
+    return JSONResponse(status)
+
+@app.post("/api/quality")
+async def set_quality(request: Request):
+    """Switch quality control between "auto" and a fixed "manual" level."""
+    data = await request.json()
+    try:
+        quality.set_mode(data.get("mode", "manual"), data.get("level"))
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"status": "error", "message": str(e)}, status_code=400)
+    status = quality.get_status(0)
+    status["status"] = "success"
+    return JSONResponse(status)
+
+# Compute governor endpoints
+@app.get("/api/governor")
+async def get_governor(limit: int = None):
+    """Get the governor tier, sensor readings, actions in force and recent tier changes."""
+    status = governor.get_status(limit)
+    status["status"] = "success"
+    return JSONResponse(status)
+
 if __name__ == "__main__":
     import uvicorn
     try:
-        uvicorn.run(app, host="0.0.0.0", port=8000)
+        uvicorn.run(app, host=BackendConfig.HOST, port=BackendConfig.PORT)
     finally:
         # Reset servo position when exiting
         servo.angle = 0
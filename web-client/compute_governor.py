@@ -0,0 +1,263 @@
+"""
+Compute Governor for Nautilus Controller
+Limits the vision workload from temperature and battery readings so the
+robot holds a sustainable frame rate instead of bursting into thermal
+throttling or draining its battery.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Governor tiers, least restricted first
+TIERS = ("normal", "reduced", "critical")
+
+
+class ComputeGovernor:
+    """
+    Steps the vision pipelines between workload tiers from sensor readings.
+
+    normal: no restrictions.
+    reduced (temperature >= temp_high, or on battery at <= battery_low):
+        quality capped at `reduced_quality`, AI detection limited to
+        `reduced_ai_fps` and depth switched to the smaller fallback encoder.
+    critical (temperature >= temp_critical, or on battery at <=
+        battery_critical): quality capped at `critical_quality`, AI detection
+        limited to `critical_ai_fps` and depth paused.
+
+    A higher tier takes effect on the first reading that calls for it. A
+    lower tier takes effect only after the readings have cleared the
+    thresholds by the hysteresis margins for `relax_after` seconds, so the
+    pipelines do not flap around a threshold. Quality caps go through the
+    quality controller's set_limit(); the other actions are service
+    attributes, reapplied every tick so services loaded later pick them up.
+    """
+
+    def __init__(self, thermal_sensor, power_sensor, quality, get_service: Callable[[str], Optional[object]],
+                 interval: float = 5.0, temp_high: float = 70.0, temp_critical: float = 80.0,
+                 temp_hysteresis: float = 5.0, battery_low: int = 30, battery_critical: int = 15,
+                 battery_hysteresis: int = 5, relax_after: float = 30.0, reduced_quality: int = 2,
+                 critical_quality: int = 4, reduced_ai_fps: float = 2.0, critical_ai_fps: float = 1.0,
+                 enabled: bool = True, history: int = 50):
+        """
+        Initialize the governor.
+
+        Args:
+            thermal_sensor: utils.system_sensors.ThermalSensor
+            power_sensor: utils.system_sensors.PowerSupplySensor
+            quality: QualityController capped in the restricted tiers
+            get_service: Callable returning a loaded service by name, or None
+            interval: Seconds between sensor readings
+            temp_high: Temperature (°C) that enters the reduced tier
+            temp_critical: Temperature (°C) that enters the critical tier
+            temp_hysteresis: Degrees below a threshold before it counts as cleared
+            battery_low: Battery percent (on battery) that enters the reduced tier
+            battery_critical: Battery percent (on battery) that enters the critical tier
+            battery_hysteresis: Percent above a threshold before it counts as cleared
+            relax_after: Seconds the readings must stay clear before a lower tier
+            reduced_quality: Best quality level in the reduced tier
+            critical_quality: Best quality level in the critical tier
+            reduced_ai_fps: Most AI frames per second in the reduced tier
+            critical_ai_fps: Most AI frames per second in the critical tier
+            enabled: Act on the readings; when False the governor only reads
+            history: Number of recent tier changes kept
+        """
+        self.thermal_sensor = thermal_sensor
+        self.power_sensor = power_sensor
+        self.quality = quality
+        self.get_service = get_service
+        self.interval = interval
+        self.temp_high = temp_high
+        self.temp_critical = temp_critical
+        self.temp_hysteresis = temp_hysteresis
+        self.battery_low = battery_low
+        self.battery_critical = battery_critical
+        self.battery_hysteresis = battery_hysteresis
+        self.relax_after = relax_after
+        self.actions = (
+            {'quality_limit': None, 'ai_max_fps': None, 'depth_fallback': False, 'depth_paused': False},
+            {'quality_limit': reduced_quality, 'ai_max_fps': reduced_ai_fps,
+             'depth_fallback': True, 'depth_paused': False},
+            {'quality_limit': critical_quality, 'ai_max_fps': critical_ai_fps,
+             'depth_fallback': True, 'depth_paused': True},
+        )
+        self.enabled = enabled
+        self.tier = 0
+        self.reasons = []
+        self.since = time.time()
+        self.reading = None
+        self.changes = deque(maxlen=history)
+        self._clear_since = None
+        self._switching = None
+        self._task = None
+
+    def start(self) -> None:
+        """Start the governor task (call from the event loop)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the governor task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.tick()
+                self._sync_depth_model()
+            except Exception as e:
+                logger.error(f"Compute governor tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def read(self) -> Dict:
+        """Read both sensors into one reading."""
+        reading = self.thermal_sensor.read()
+        reading.update(self.power_sensor.read())
+        reading['time'] = time.time()
+        return reading
+
+    def classify(self, reading: Dict, margin: float = 0.0) -> Tuple[int, List[str]]:
+        """
+        Get the tier a reading calls for.
+
+        Args:
+            reading: Sensor reading from read()
+            margin: 1 to apply the hysteresis margins (a reading must clear
+                thresholds by them), 0 for the plain thresholds
+
+        Returns:
+            tuple: (tier index, list of reasons)
+        """
+        tier, reasons = 0, []
+        temperature = reading.get('temperature')
+        if temperature is not None:
+            offset = margin * self.temp_hysteresis
+            if temperature >= self.temp_critical - offset:
+                tier = 2
+                reasons.append(f"temperature {temperature:.1f} °C >= {self.temp_critical - offset:g} °C")
+            elif temperature >= self.temp_high - offset:
+                tier = 1
+                reasons.append(f"temperature {temperature:.1f} °C >= {self.temp_high - offset:g} °C")
+        battery = reading.get('battery')
+        if battery is not None and reading.get('on_battery'):
+            offset = margin * self.battery_hysteresis
+            if battery <= self.battery_critical + offset:
+                tier = 2
+                reasons.append(f"battery {battery}% <= {self.battery_critical + offset:g}%")
+            elif battery <= self.battery_low + offset:
+                tier = max(tier, 1)
+                reasons.append(f"battery {battery}% <= {self.battery_low + offset:g}%")
+        return tier, reasons
+
+    def tick(self, reading: Optional[Dict] = None) -> int:
+        """
+        Take one reading, change tier if needed and apply the tier's actions.
+
+        Args:
+            reading: Sensor reading to use instead of reading the sensors
+
+        Returns:
+            int: The current tier index
+        """
+        reading = self.read() if reading is None else reading
+        self.reading = reading
+        now = reading['time']
+        tier, reasons = self.classify(reading)
+        if tier >= self.tier:
+            self._clear_since = None
+            if tier > self.tier:
+                self._set_tier(tier, reasons, now)
+            else:
+                self.reasons = reasons
+        else:
+            # Relax only to the tier the readings call for with hysteresis applied
+            held, held_reasons = self.classify(reading, margin=1.0)
+            self.reasons = held_reasons
+            if held >= self.tier:
+                self._clear_since = None
+            elif self._clear_since is None:
+                self._clear_since = now
+            elif now - self._clear_since >= self.relax_after:
+                self._clear_since = None
+                self._set_tier(held, held_reasons or ["readings within limits"], now)
+        self.apply()
+        return self.tier
+
+    def _set_tier(self, tier: int, reasons: List[str], now: float) -> None:
+        """Change the tier and log why."""
+        change = {'time': now, 'from': TIERS[self.tier], 'to': TIERS[tier], 'reasons': reasons}
+        self.changes.append(change)
+        logger.warning(f"Compute governor {TIERS[self.tier]} -> {TIERS[tier]}: {'; '.join(reasons)}")
+        self.tier = tier
+        self.reasons = reasons
+        self.since = now
+
+    def apply(self) -> None:
+        """Push the current tier's quality cap, AI rate and depth pause into the services."""
+        actions = self.actions[self.tier] if self.enabled else self.actions[0]
+        reason = "; ".join(self.reasons)
+        self.quality.set_limit("governor", actions['quality_limit'], f"{TIERS[self.tier]}: {reason}")
+        ai_detection_service = self.get_service("ai_detection")
+        if ai_detection_service is not None:
+            ai_detection_service.min_interval = 1.0 / actions['ai_max_fps'] if actions['ai_max_fps'] else 0.0
+        depth_camera_service = self.get_service("depth_camera")
+        if depth_camera_service is not None:
+            depth_camera_service.paused = actions['depth_paused']
+
+    def _sync_depth_model(self) -> None:
+        """Switch the depth encoder in the background; loading the fallback takes seconds."""
+        actions = self.actions[self.tier] if self.enabled else self.actions[0]
+        depth_camera_service = self.get_service("depth_camera")
+        if depth_camera_service is None or self._switching is not None:
+            return
+        wanted = actions['depth_fallback']
+        if depth_camera_service.using_fallback == wanted:
+            return
+        if wanted and depth_camera_service.fallback_error is not None:
+            return  # fallback failed to load once; keep the configured model
+        loop = asyncio.get_running_loop()
+        self._switching = loop.run_in_executor(None, depth_camera_service.use_fallback_model, wanted)
+        self._switching.add_done_callback(self._switch_done)
+
+    def _switch_done(self, future) -> None:
+        self._switching = None
+        if future.exception() is not None:
+            logger.error(f"Depth model switch failed: {future.exception()}")
+
+    def get_status(self, limit: Optional[int] = None) -> Dict:
+        """
+        Get the tier, the readings behind it and the actions in force.
+
+        Returns:
+            dict: enabled, tier, since, reasons, relax_at (when a pending
+                lower tier takes effect), reading, actions,
+                thresholds and recent tier changes (newest first)
+        """
+        changes = list(self.changes)[::-1]
+        if limit is not None:
+            changes = changes[:limit]
+        depth_camera_service = self.get_service("depth_camera")
+        return {
+            'enabled': self.enabled,
+            'tier': TIERS[self.tier],
+            'since': self.since,
+            'reasons': self.reasons,
+            'relax_at': self._clear_since + self.relax_after if self._clear_since is not None else None,
+            'reading': self.reading,
+            'actions': self.actions[self.tier] if self.enabled else self.actions[0],
+            'depth_fallback_active': depth_camera_service.using_fallback if depth_camera_service else None,
+            'thresholds': {
+                'temp_high': self.temp_high,
+                'temp_critical': self.temp_critical,
+                'battery_low': self.battery_low,
+                'battery_critical': self.battery_critical
+            },
+            'changes': changes
+        }
@@ -13,6 +13,7 @@ class DepthCameraController {
         this.lastDepthFrame = null;
         this.frameProcessRate = 3; // Process every 3 frames for performance
         this.frameCounter = 0;
+        this.uploadQuality = 0.8; // JPEG quality of uploads, set by the backend's quality controller
         this.init();
     }
 
@@ -283,8 +284,8 @@ class DepthCameraController {
             const ctx = canvas.getContext('2d');
             ctx.drawImage(video, 0, 0);
             
-            // Convert to base64
-            const frameData = canvas.toDataURL('image/jpeg', 0.8);
+            // Convert to base64 at the quality the backend currently asks for
+            const frameData = canvas.toDataURL('image/jpeg', this.uploadQuality);
 
             // Send frame for depth processing
             const response = await fetch('/api/depth-camera/process-frame', {
@@ -298,6 +299,9 @@ class DepthCameraController {
             }
 
             const result = await response.json();
+            if (result.upload_quality) {
+                this.uploadQuality = result.upload_quality;
+            }
 
             if (result.status === 'success' && result.depth_frame) {
                 this.displayDepthFrame(result.depth_frame);
@@ -306,6 +310,8 @@ class DepthCameraController {
                 this.updateColormapDisplay();
             } else if (result.status === 'processing') {
                 this.updateDepthStatus('Processing...');
+            } else if (result.status === 'paused') {
+                this.updateDepthStatus('Paused (power/thermal)');
             } else {
                 console.warn('Depth processing issue:', result.message || result.status);
                 this.updateDepthStatus('Error');
@@ -15,9 +15,15 @@ import os
 # Add parent directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
+from utils.latency import StageLatency
+
+# Stages timed by the service; model stages are timed by the DepthProcessor.
+# total spans from a frame entering the queue to its depth frame being encoded.
+DEPTH_SERVICE_STAGES = ('b64_decode', 'image_decode', 'queue_wait', 'encode', 'total')
+
 try:
     from utils.depth_processor import DepthProcessor
-    from config.camera_config import CameraConfig
+    from config.camera_config import CameraConfig, PerformanceConfig
     DEPTH_PROCESSOR_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Depth processor not available: {e}")
@@ -30,9 +36,15 @@ class DepthCameraService:
     Processes frames from the normal camera and provides depth estimation.
     """
     
-    def __init__(self):
-        """Initialize the depth camera service."""
-        self.depth_processor = None
+    def __init__(self, depth_processor=None):
+        """
+        Initialize the depth camera service.
+        
+        Args:
+            depth_processor: Already loaded processor to use instead of loading
+                the configured depth model (e.g. a stub in benchmarks)
+        """
+        self.depth_processor = depth_processor
         self.is_enabled = False
         self.is_processing = False
         self.last_depth_frame = None
@@ -41,25 +53,123 @@ class DepthCameraService:
         self.frame_queue = queue.Queue(maxsize=2)
         self.depth_queue = queue.Queue(maxsize=2)
         self.current_colormap_index = 0
+        self.load_error = None
+        self.latency = StageLatency(DEPTH_SERVICE_STAGES)
+        # Frame counters, read by the metrics endpoint; dropped covers frames
+        # shed under load (paused, replaced in the queue) and failed ones
+        self.frames_received = 0
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        # Optional utils.recorder.Recorder receiving raw depth maps
+        self.recorder = None
+        # "full" produces a colormapped depth frame; "objects" only estimates
+        # the depth of the boxes returned by `detection_source`, a callable
+        # giving AIDetectionService.last_detections
+        self.depth_mode = CameraConfig.DEPTH_MODE if DEPTH_PROCESSOR_AVAILABLE else "full"
+        self.detection_source = None
+        self.last_objects = None
+        # Optional utils.obstacle_map.ObstacleMap updated with every depth map
+        # (in objects mode, the reduced full-frame pass)
+        self.obstacle_map = None
+        self.last_map_pass = 0.0
+        # Output JPEG quality and pause between depth frames, adjusted under
+        # load by the quality controller
+        self.jpeg_quality = CameraConfig.DEPTH_JPEG_QUALITY if DEPTH_PROCESSOR_AVAILABLE else 80
+        self.process_interval = CameraConfig.DEPTH_PROCESS_INTERVAL if DEPTH_PROCESSOR_AVAILABLE else 0.1
+        # Set by the compute governor: paused drops incoming frames, and the
+        # fallback processor (smaller encoder) replaces the configured one
+        self.paused = False
+        self.primary_processor = None
+        self.fallback_processor = None
+        self.using_fallback = False
+        self.fallback_error = None
         
         # Initialize depth processor if available
-        if DEPTH_PROCESSOR_AVAILABLE:
+        if DEPTH_PROCESSOR_AVAILABLE and depth_processor is None:
             self._initialize_depth_processor()
     
-    def _initialize_depth_processor(self):
-        """Initialize the depth processor."""
+    def _create_depth_processor(self, checkpoint):
+        """
+        Create and load a depth processor for a checkpoint.
+        
+        Returns:
+            tuple: (DepthProcessor or None, error message or None)
+        """
         try:
-            self.depth_processor = DepthProcessor(
+            processor = DepthProcessor(
                 model_name=CameraConfig.DEPTH_MODEL,
-                local_checkpoint=CameraConfig.LOCAL_DEPTH_CHECKPOINT
+                local_checkpoint=checkpoint,
+                cache_dir=CameraConfig.DEPTH_MODEL_CACHE_DIR,
+                dtype=CameraConfig.DEPTH_MODEL_DTYPE,
+                verify_checksums=CameraConfig.VERIFY_MODEL_CHECKSUMS,
+                pipeline_dir=CameraConfig.DEPTH_PIPELINE_DIR,
+                offline=CameraConfig.DEPTH_MODEL_OFFLINE
             )
-            success = self.depth_processor.load_model()
-            if not success:
-                self.depth_processor = None
+            if not processor.load_model():
                 print("Failed to load depth model")
+                return None, processor.load_error or "Failed to load depth model"
+            return processor, None
         except Exception as e:
             print(f"Error initializing depth processor: {e}")
-            self.depth_processor = None
+            return None, f"Error initializing depth processor: {e}"
+    
+    def _initialize_depth_processor(self):
+        """Initialize the depth processor."""
+        self.depth_processor, self.load_error = self._create_depth_processor(CameraConfig.LOCAL_DEPTH_CHECKPOINT)
+    
+    def use_fallback_model(self, enabled):
+        """
+        Switch between the configured depth model and the smaller fallback.
+        
+        The fallback is loaded and warmed up on first use, which blocks for
+        seconds; both stay loaded afterwards so later switches are instant.
+        
+        Args:
+            enabled: True for the fallback model, False for the configured one
+            
+        Returns:
+            bool: True if the requested model is in use
+        """
+        if not self.is_available() or enabled == self.using_fallback:
+            return self.is_available()
+        if enabled:
+            if self.fallback_processor is None:
+                if not DEPTH_PROCESSOR_AVAILABLE or not CameraConfig.FALLBACK_DEPTH_CHECKPOINT:
+                    self.fallback_error = "No fallback depth model configured"
+                    return False
+                processor, self.fallback_error = self._create_depth_processor(CameraConfig.FALLBACK_DEPTH_CHECKPOINT)
+                if processor is None:
+                    return False
+                processor.warmup(CameraConfig.FRAME_WIDTH, CameraConfig.FRAME_HEIGHT,
+                                 iterations=PerformanceConfig.WARMUP_ITERATIONS)
+                self.fallback_processor = processor
+            self.primary_processor = self.depth_processor
+            processor = self.fallback_processor
+        else:
+            processor = self.primary_processor
+        processor.input_size = self.depth_processor.input_size
+        self.depth_processor = processor
+        self.using_fallback = enabled
+        print(f"Depth model switched to {'fallback' if enabled else 'configured'} model "
+              f"({processor.encoder or processor.model_name})")
+        return True
+    
+    def warmup(self):
+        """
+        Warm up the depth model with synthetic frames at the camera resolution.
+        
+        Returns:
+            dict: Warm-up timings, or None if depth processing is not available
+        """
+        if not self.is_available():
+            return None
+        
+        return self.depth_processor.warmup(
+            CameraConfig.FRAME_WIDTH,
+            CameraConfig.FRAME_HEIGHT,
+            iterations=PerformanceConfig.WARMUP_ITERATIONS,
+            compile_model=PerformanceConfig.COMPILE_DEPTH_MODEL
+        )
     
     def is_available(self):
         """Check if depth camera service is available."""
@@ -130,21 +240,28 @@ class DepthCameraService:
         """
         if not self.is_enabled or not self.is_available():
             return {"status": "error", "message": "Depth processing not enabled or available"}
+        self.frames_received += 1
+        if self.paused:
+            self.frames_dropped += 1
+            return {"status": "paused", "message": "Depth processing paused by the compute governor"}
         
         try:
             # Decode frame
             frame = self._decode_frame(frame_data)
             if frame is None:
+                self.frames_dropped += 1
                 return {"status": "error", "message": "Failed to decode frame"}
             
-            # Add frame to processing queue (non-blocking)
+            # Add frame to processing queue (non-blocking), stamped for queue-wait timing
+            item = (frame, time.perf_counter())
             try:
-                self.frame_queue.put(frame, block=False)
+                self.frame_queue.put(item, block=False)
             except queue.Full:
                 # Remove old frame and add new one
                 try:
                     self.frame_queue.get(block=False)
-                    self.frame_queue.put(frame, block=False)
+                    self.frames_dropped += 1
+                    self.frame_queue.put(item, block=False)
                 except queue.Empty:
                     pass
             
@@ -158,13 +275,16 @@ class DepthCameraService:
             
             # Return the latest depth frame or placeholder
             if depth_frame_b64:
-                return {
+                result = {
                     "status": "success", 
                     "depth_frame": depth_frame_b64,
                     "colormap": CameraConfig.COLORMAP_NAMES[self.current_colormap_index]
                 }
             else:
-                return {"status": "processing", "message": "Depth frame being processed"}
+                result = {"status": "processing", "message": "Depth frame being processed"}
+            if self.depth_mode == "objects":
+                result["objects"] = self.last_objects
+            return result
                 
         except Exception as e:
             return {"status": "error", "message": f"Frame processing error: {str(e)}"}
@@ -175,19 +295,36 @@ class DepthCameraService:
             try:
                 # Get frame from queue
                 try:
-                    frame = self.frame_queue.get(timeout=0.1)
+                    frame, enqueued_at = self.frame_queue.get(timeout=0.1)
                 except queue.Empty:
                     continue
+                self.latency.record('queue_wait', time.perf_counter() - enqueued_at)
                 
-                # Process depth
-                if self.depth_processor:
-                    current_colormap = CameraConfig.AVAILABLE_COLORMAPS[self.current_colormap_index]
-                    self.depth_processor.set_colormap(current_colormap)
-                    depth_frame = self.depth_processor.process_frame(frame)
+                # Process depth; the governor may swap the processor between frames
+                processor = self.depth_processor
+                if processor:
+                    consumers = self.obstacle_map is not None or self.recorder is not None
+                    if self.depth_mode == "objects":
+                        depth_frame, last_depth = self._process_objects(frame, processor)
+                    else:
+                        current_colormap = CameraConfig.AVAILABLE_COLORMAPS[self.current_colormap_index]
+                        processor.set_colormap(current_colormap)
+                        depth_frame = processor.process_frame(frame)
+                        last_depth = processor.last_depth if consumers else None
                     
                     if depth_frame is not None:
                         # Encode depth frame
-                        depth_frame_b64 = self._encode_frame(depth_frame)
+                        with self.latency.measure('encode'):
+                            depth_frame_b64 = self._encode_frame(depth_frame)
+                        self.latency.record('total', time.perf_counter() - enqueued_at)
+                        self.frames_processed += 1
+                        if last_depth is not None:
+                            captured_at = time.time() - (time.perf_counter() - enqueued_at)
+                            if self.obstacle_map is not None:
+                                self.obstacle_map.update(last_depth, self._current_detections(last_depth.shape),
+                                                         captured_at)
+                            if self.recorder is not None:
+                                self.recorder.record_depth(last_depth, captured_at)
                         
                         # Add to depth queue (non-blocking)
                         try:
@@ -199,14 +336,97 @@ class DepthCameraService:
                                 self.depth_queue.put(depth_frame_b64, block=False)
                             except queue.Empty:
                                 pass
+                    else:
+                        self.frames_dropped += 1
                 
                 # Small delay to control processing rate
-                time.sleep(CameraConfig.DEPTH_PROCESS_INTERVAL)
+                time.sleep(self.process_interval)
                 
             except Exception as e:
                 print(f"Error in depth processing worker: {e}")
+                self.frames_dropped += 1
                 time.sleep(1)
     
+    def _current_detections(self, frame_shape):
+        """Get the latest AI detections, scaled to this frame, or [] if stale."""
+        last = self.detection_source() if self.detection_source is not None else None
+        if last is None:
+            return []
+        detected_at, (height, width), detections = last
+        if time.time() - detected_at > CameraConfig.DEPTH_ROI_MAX_AGE:
+            return []
+        scale_x = frame_shape[1] / width
+        scale_y = frame_shape[0] / height
+        if scale_x == 1 and scale_y == 1:
+            return detections
+        return [dict(d, bbox=[int(d['bbox'][0] * scale_x), int(d['bbox'][1] * scale_y),
+                              int(d['bbox'][2] * scale_x), int(d['bbox'][3] * scale_y)])
+                for d in detections]
+    
+    def _process_objects(self, frame, processor):
+        """
+        Estimate the depth of each detected object and draw it on the frame.
+        
+        The obstacle map still needs depth for the whole frame. With the
+        "frame" method the reduced full-frame pass serves both, and while a
+        map is attached it runs on every frame (also without detections).
+        With "crops" the map gets its own pass at the obstacle grid's
+        resolution (DEPTH_ROI_MAP_INPUT_SIZE), at most once per
+        DEPTH_ROI_MAP_INTERVAL: the crops keep their cost, at the price of a
+        coarser map that is refreshed less often (its stale age follows).
+        
+        Args:
+            frame: Camera frame
+            processor: Depth processor the worker captured for this frame
+        
+        Returns:
+            tuple: (camera frame annotated with per-object depth, depth map of
+                the full-frame pass or None if it did not run)
+        """
+        detections = self._current_detections(frame.shape)
+        method = CameraConfig.DEPTH_ROI_METHOD
+        depth = None
+        if self.obstacle_map is not None:
+            if method == "frame":
+                depth = processor.estimate_depth(frame, CameraConfig.DEPTH_ROI_INPUT_SIZE)
+            elif time.time() - self.last_map_pass >= CameraConfig.DEPTH_ROI_MAP_INTERVAL:
+                self.last_map_pass = time.time()
+                depth = processor.estimate_depth(frame, CameraConfig.DEPTH_ROI_MAP_INPUT_SIZE)
+        objects = processor.estimate_object_depths(
+            frame, [d['bbox'] for d in detections],
+            padding=CameraConfig.DEPTH_ROI_PADDING,
+            input_size=CameraConfig.DEPTH_ROI_INPUT_SIZE,
+            max_area_fraction=CameraConfig.DEPTH_ROI_MAX_AREA,
+            method=method,
+            depth=depth if method == "frame" else None
+        ) if detections else []
+        for detection, obj in zip(detections, objects):
+            obj['class_name'] = detection.get('class_name')
+            obj['confidence'] = detection.get('confidence')
+        self.last_objects = {"time": time.time(), "objects": objects}
+        
+        with processor.latency.measure('draw'):
+            annotated = frame.copy()
+            for obj in objects:
+                x1, y1, x2, y2 = obj['bbox']
+                label = f"{obj['class_name']}: {obj['depth']:.2f}" if obj['depth'] is not None else obj['class_name']
+                cv2.rectangle(annotated, (x1, y1), (x2, y2), (0, 255, 255), 2)
+                cv2.putText(annotated, label, (x1, max(15, y1 - 5)), CameraConfig.FONT, 0.6, (0, 255, 255), 2)
+            return annotated, depth
+    
+    def set_depth_mode(self, mode):
+        """
+        Switch between full-frame depth and per-object depth.
+        
+        Args:
+            mode: "full" or "objects"
+        """
+        if mode not in ("full", "objects"):
+            return {"status": "error", "message": f"Unknown depth mode: {mode}"}
+        self.depth_mode = mode
+        self.last_objects = None
+        return {"status": "success", "mode": mode}
+    
     def change_colormap(self):
         """Change the depth visualization colormap."""
         if not self.is_available():
@@ -231,11 +451,33 @@ class DepthCameraService:
             "available": self.is_available(),
             "enabled": self.is_enabled,
             "processing": self.is_processing,
+            "mode": self.depth_mode,
+            "paused": self.paused,
+            "encoder": getattr(self.depth_processor, "encoder", None),
+            "fallback_model": self.using_fallback,
+            "fallback_error": self.fallback_error,
             "colormap": CameraConfig.COLORMAP_NAMES[self.current_colormap_index] if self.is_available() else None,
             "colormap_index": self.current_colormap_index if self.is_available() else None,
-            "available_colormaps": CameraConfig.COLORMAP_NAMES if self.is_available() else []
+            "available_colormaps": CameraConfig.COLORMAP_NAMES if self.is_available() else [],
+            "warmup": self.depth_processor.warmup_stats if self.is_available() else None,
+            "load_error": self.load_error
         }
     
+    def get_latency(self):
+        """
+        Get rolling per-stage latency percentiles for the service and model stages.
+        
+        Returns:
+            dict: Stage name -> count, p50/p95/p99, mean, max and last (ms), in pipeline order
+        """
+        service = self.latency.summary()
+        stages = {name: service[name] for name in ('b64_decode', 'image_decode', 'queue_wait')}
+        if self.depth_processor is not None:
+            stages.update(self.depth_processor.latency.summary())
+        stages['encode'] = service['encode']
+        stages['total'] = service['total']
+        return stages
+    
     def _decode_frame(self, frame_data):
         """Decode base64 frame data to numpy array."""
         try:
@@ -244,13 +486,15 @@ class DepthCameraService:
                 frame_data = frame_data.split(',')[1]
             
             # Decode base64
-            img_data = base64.b64decode(frame_data)
+            with self.latency.measure('b64_decode'):
+                img_data = base64.b64decode(frame_data)
             
-            # Convert to numpy array
-            nparr = np.frombuffer(img_data, np.uint8)
-            
-            # Decode image
-            frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            with self.latency.measure('image_decode'):
+                # Convert to numpy array
+                nparr = np.frombuffer(img_data, np.uint8)
+                
+                # Decode image
+                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
             return frame
             
@@ -262,7 +506,7 @@ class DepthCameraService:
         """Encode numpy array frame to base64."""
         try:
             # Encode frame as JPEG
-            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+            _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
             
             # Convert to base64
             frame_b64 = base64.b64encode(buffer).decode('utf-8')
@@ -274,5 +518,20 @@ class DepthCameraService:
             return None
 
 
-# Global service instance
-depth_camera_service = DepthCameraService() 
\ No newline at end of file
+# Global service instance, created on first use
+_depth_camera_service = None
+_depth_camera_service_lock = threading.Lock()
+
+
+def get_depth_camera_service():
+    """
+    Get the shared depth camera service, loading the depth model on first call.
+    
+    Returns:
+        DepthCameraService: The global service instance
+    """
+    global _depth_camera_service
+    with _depth_camera_service_lock:
+        if _depth_camera_service is None:
+            _depth_camera_service = DepthCameraService()
+        return _depth_camera_service
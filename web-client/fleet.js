@@ -1,68 +1,20 @@
 // Fleet Management JavaScript
 
-// Mock Nautilus Data - 5 robots near University of Malaya
-const mockFleetData = [
-    {
-        id: 'NAUT-001',
-        model: 'Nautilus Explorer Pro',
-        ip: '192.168.1.101',
-        position: {
-            lat: 3.1209,
-            lng: 101.6559
-        },
-        battery: 87,
-        status: 'online',
-        lastUpdate: '2024-01-15 14:30:22'
-    },
-    {
-        id: 'NAUT-002', 
-        model: 'Nautilus Scout Advanced',
-        ip: '192.168.1.102',
-        position: {
-            lat: 3.1215,
-            lng: 101.6565
-        },
-        battery: 63,
-        status: 'online',
-        lastUpdate: '2024-01-15 14:29:45'
-    },
-    {
-        id: 'NAUT-003',
-        model: 'Nautilus Deep Sea',
-        ip: '192.168.1.103', 
-        position: {
-            lat: 3.1203,
-            lng: 101.6553
-        },
-        battery: 94,
-        status: 'online',
-        lastUpdate: '2024-01-15 14:30:10'
-    },
-    {
-        id: 'NAUT-004',
-        model: 'Nautilus Research Unit',
-        ip: '192.168.1.104',
-        position: {
-            lat: 3.1212,
-            lng: 101.6550
-        },
-        battery: 28,
-        status: 'online',
-        lastUpdate: '2024-01-15 14:25:18'
-    },
-    {
-        id: 'NAUT-005',
-        model: 'Nautilus Surveyor',
-        ip: '192.168.1.105',
-        position: {
-            lat: 3.1206,
-            lng: 101.6562
-        },
-        battery: 75,
-        status: 'online',
-        lastUpdate: '2024-01-15 14:30:33'
-    }
-];
+// Fleet data pushed by the backend fleet aggregator, keyed by robot id
+const fleetData = {};
+let fleetVersion = 0;
+let fleetSocket = null;
+let fleetPollTimer = null;
+let fleetMapFitted = false;
+
+// Compact fleet protocol: wire code -> record field. Coordinates arrive as
+// integers in units of 1/coordScale degrees (sent with every snapshot).
+const FLEET_FIELD_NAMES = {
+    m: 'model', i: 'ip', s: 'status', a: 'lat', o: 'lng', h: 'heading',
+    b: 'battery', t: 'temperature', v: 'is_moving', g: 'gps_status'
+};
+const FLEET_STATUS_NAMES = ['connecting', 'online', 'offline'];
+let fleetCoordScale = 100000;
 
 // Global variables
 let fleetMap;
@@ -82,6 +34,7 @@ document.addEventListener('DOMContentLoaded', function() {
             populateFleetTable();
             initializeFleetMap();
             setupTableInteractions();
+            connectFleet();
             
             console.log('Fleet management initialized successfully');
         } catch (error) {
@@ -91,6 +44,7 @@ document.addEventListener('DOMContentLoaded', function() {
             try {
                 populateFleetTable();
                 setupTableInteractions();
+                connectFleet();
             } catch (tableError) {
                 console.error('Error populating table:', tableError);
             }
@@ -128,17 +82,14 @@ function initializeFleetMap() {
         console.log('Map created, adding markers...');
 
         // Add markers for each nautilus
-        mockFleetData.forEach(nautilus => {
+        Object.values(fleetData).forEach(nautilus => {
             addNautilusMarker(nautilus);
         });
 
         console.log('Markers added:', Object.keys(fleetMarkers).length);
 
-        // Fit map to show all markers
-        if (Object.keys(fleetMarkers).length > 0) {
-            const group = new L.featureGroup(Object.values(fleetMarkers));
-            fleetMap.fitBounds(group.getBounds().pad(0.1));
-        }
+        // Only robots inside the visible area are sent once the map reports its viewport
+        fleetMap.on('moveend', sendViewport);
         
         console.log('Map initialization complete');
         
@@ -162,8 +113,45 @@ function initializeFleetMap() {
     }
 }
 
+// Fit map to show all markers (once, on the first fleet snapshot)
+function fitMapToFleet() {
+    if (fleetMap && !fleetMapFitted && Object.keys(fleetMarkers).length > 0) {
+        fleetMapFitted = true;
+        const group = new L.featureGroup(Object.values(fleetMarkers));
+        fleetMap.fitBounds(group.getBounds().pad(0.1), { maxZoom: 18 });
+    }
+}
+
+// Build the popup content for a nautilus marker
+function createPopupContent(nautilus) {
+    return `
+        <div class="nautilus-popup">
+            <h6 class="mb-2"><i class="fas fa-robot me-1"></i>${nautilus.id}</h6>
+            <p class="mb-1"><strong>Model:</strong> ${nautilus.model || 'Unknown'}</p>
+            <p class="mb-1"><strong>Battery:</strong> ${formatBattery(nautilus.battery)}</p>
+            <p class="mb-1"><strong>Status:</strong> <span class="text-capitalize">${nautilus.status}</span></p>
+            <div class="mt-2">
+                <button class="btn btn-primary btn-sm" onclick="controlNautilus('${nautilus.id}')">
+                    <i class="fas fa-gamepad me-1"></i>Control
+                </button>
+            </div>
+        </div>
+    `;
+}
+
+// Robots without a position yet are listed in the table but not on the map
+function hasPosition(nautilus) {
+    return nautilus.lat !== null && nautilus.lng !== null;
+}
+
+function formatBattery(battery) {
+    return battery === null || battery === undefined ? '--' : `${battery}%`;
+}
+
 // Add a nautilus marker to the map
 function addNautilusMarker(nautilus) {
+    if (!fleetMap || !hasPosition(nautilus)) return;
+
     // Create custom marker
     const markerIcon = L.divIcon({
         className: 'nautilus-marker',
@@ -173,26 +161,12 @@ function addNautilusMarker(nautilus) {
     });
 
     // Create marker
-    const marker = L.marker([nautilus.position.lat, nautilus.position.lng], {
+    const marker = L.marker([nautilus.lat, nautilus.lng], {
         icon: markerIcon
     }).addTo(fleetMap);
 
     // Add popup with nautilus info
-    const popupContent = `
-        <div class="nautilus-popup">
-            <h6 class="mb-2"><i class="fas fa-robot me-1"></i>${nautilus.id}</h6>
-            <p class="mb-1"><strong>Model:</strong> ${nautilus.model}</p>
-            <p class="mb-1"><strong>Battery:</strong> ${nautilus.battery}%</p>
-            <p class="mb-1"><strong>Status:</strong> <span class="text-capitalize">${nautilus.status}</span></p>
-            <div class="mt-2">
-                <button class="btn btn-primary btn-sm" onclick="controlNautilus('${nautilus.id}')">
-                    <i class="fas fa-gamepad me-1"></i>Control
-                </button>
-            </div>
-        </div>
-    `;
-    
-    marker.bindPopup(popupContent);
+    marker.bindPopup(createPopupContent(nautilus));
 
     // Store marker reference
     fleetMarkers[nautilus.id] = marker;
@@ -215,13 +189,11 @@ function populateFleetTable() {
         
         tableBody.innerHTML = '';
 
-        console.log('Mock fleet data:', mockFleetData.length, 'items');
-
-        mockFleetData.forEach((nautilus, index) => {
-            console.log(`Creating row for ${nautilus.id}...`);
+        Object.values(fleetData).forEach(nautilus => {
             const row = createTableRow(nautilus);
             tableBody.appendChild(row);
         });
+        updateActiveCount();
         
         console.log('Fleet table populated successfully');
         
@@ -250,7 +222,7 @@ function createTableRow(nautilus) {
         <td>
             <div class="nautilus-model">
                 <i class="fas fa-water text-primary"></i>
-                ${nautilus.model}
+                ${nautilus.model || 'Unknown'}
             </div>
         </td>
         <td>
@@ -258,15 +230,15 @@ function createTableRow(nautilus) {
         </td>
         <td>
             <div class="coordinates">
-                <span class="lat">Lat: ${nautilus.position.lat.toFixed(4)}</span>
-                <span class="lng">Lng: ${nautilus.position.lng.toFixed(4)}</span>
+                <span class="lat">Lat: ${hasPosition(nautilus) ? nautilus.lat.toFixed(4) : '--'}</span>
+                <span class="lng">Lng: ${hasPosition(nautilus) ? nautilus.lng.toFixed(4) : '--'}</span>
             </div>
         </td>
         <td class="text-center">
             <div class="battery-indicator">
                 <span class="battery-level ${batteryClass}">
                     <i class="fas ${batteryIcon}"></i>
-                    ${nautilus.battery}%
+                    ${formatBattery(nautilus.battery)}
                 </span>
             </div>
         </td>
@@ -295,6 +267,7 @@ function createTableRow(nautilus) {
 
 // Get battery level class
 function getBatteryClass(battery) {
+    if (battery === null || battery === undefined) return 'battery-medium';
     if (battery >= 70) return 'battery-high';
     if (battery >= 30) return 'battery-medium';
     return 'battery-low';
@@ -302,6 +275,7 @@ function getBatteryClass(battery) {
 
 // Get battery icon
 function getBatteryIcon(battery) {
+    if (battery === null || battery === undefined) return 'fa-battery-half';
     if (battery >= 90) return 'fa-battery-full';
     if (battery >= 70) return 'fa-battery-three-quarters';
     if (battery >= 50) return 'fa-battery-half';
@@ -316,6 +290,7 @@ function getStatusClass(status) {
         case 'idle': return 'status-idle';
         case 'maintenance': return 'status-maintenance';
         case 'offline': return 'status-offline';
+        case 'connecting': return 'status-idle';
         default: return 'status-offline';
     }
 }
@@ -327,6 +302,7 @@ function getStatusIcon(status) {
         case 'idle': return 'fa-clock';
         case 'maintenance': return 'fa-wrench';
         case 'offline': return 'fa-circle-xmark';
+        case 'connecting': return 'fa-spinner';
         default: return 'fa-circle-xmark';
     }
 }
@@ -425,13 +401,13 @@ function controlNautilus(nautilusId) {
 
 // Show nautilus info
 function showNautilusInfo(nautilusId) {
-    const nautilus = mockFleetData.find(n => n.id === nautilusId);
+    const nautilus = fleetData[nautilusId];
     if (!nautilus) return;
 
     // Focus on the nautilus on the map
     const marker = fleetMarkers[nautilusId];
     if (marker) {
-        fleetMap.setView([nautilus.position.lat, nautilus.position.lng], 19);
+        fleetMap.setView([nautilus.lat, nautilus.lng], 19);
         marker.openPopup();
     }
 
@@ -445,48 +421,170 @@ function showNautilusInfo(nautilusId) {
     }
 }
 
-// Utility function to update fleet data (for future real-time updates)
-function updateFleetData(newData) {
-    // Update mock data
-    mockFleetData.length = 0;
-    mockFleetData.push(...newData);
-    
-    // Refresh table
-    populateFleetTable();
-    setupTableInteractions();
-    
-    // Update map markers
+// Get the map viewport as [south, west, north, east], or null without a map
+function getViewport() {
+    if (!fleetMap || !fleetMapFitted) return null;
+    const bounds = fleetMap.getBounds();
+    return [bounds.getSouth(), bounds.getWest(), bounds.getNorth(), bounds.getEast()];
+}
+
+// Tell the backend which area is visible; it answers with a snapshot of that area
+function sendViewport() {
+    const viewport = getViewport();
+    if (viewport && fleetSocket && fleetSocket.readyState === WebSocket.OPEN) {
+        fleetSocket.send(JSON.stringify({ bbox: viewport }));
+    }
+}
+
+// Remove robots that left the viewport
+function removeFromFleet(ids) {
+    ids.forEach(id => {
+        delete fleetData[id];
+        const row = document.querySelector(`tr[data-id="${id}"]`);
+        if (row) {
+            row.remove();
+        }
+        if (fleetMarkers[id]) {
+            fleetMap.removeLayer(fleetMarkers[id]);
+            delete fleetMarkers[id];
+        }
+    });
+}
+
+// Merge the changed wire fields of one robot into a copy of its record
+function decodeRobot(id, fields) {
+    const nautilus = Object.assign({
+        id: id, model: null, ip: null, status: 'connecting', lat: null, lng: null,
+        heading: null, battery: null, temperature: null, is_moving: false, gps_status: null
+    }, fleetData[id]);
+
+    Object.entries(fields).forEach(([code, value]) => {
+        const name = FLEET_FIELD_NAMES[code];
+        if (!name) return;
+        if ((code === 'a' || code === 'o') && value !== null) {
+            value = value / fleetCoordScale;
+        } else if (code === 's') {
+            value = FLEET_STATUS_NAMES[value] || 'offline';
+        } else if (code === 'v') {
+            value = Boolean(value);
+        }
+        nautilus[name] = value;
+    });
+    return nautilus;
+}
+
+// Apply a fleet snapshot ("t": "s") or delta ("t": "d") message
+function applyFleetMessage(message) {
+    if (message.t === 's') {
+        fleetCoordScale = message.q.coord_scale;
+        resetFleet();
+    }
+    const robots = Object.entries(message.r).map(([id, fields]) => decodeRobot(id, fields));
+    applyFleetUpdate(robots, message.x || []);
+    fleetVersion = message.v;
+}
+
+// Apply updated robot records: replace their table rows and move their markers
+function applyFleetUpdate(robots, removed = []) {
+    const tableBody = document.getElementById('fleetTableBody');
+    removeFromFleet(removed);
+
+    robots.forEach(nautilus => {
+        fleetData[nautilus.id] = nautilus;
+
+        // Update table row
+        const newRow = createTableRow(nautilus);
+        const oldRow = tableBody ? tableBody.querySelector(`tr[data-id="${nautilus.id}"]`) : null;
+        if (oldRow) {
+            if (oldRow.classList.contains('highlighted')) {
+                newRow.classList.add('highlighted');
+            }
+            oldRow.replaceWith(newRow);
+        } else if (tableBody) {
+            tableBody.appendChild(newRow);
+        }
+
+        // Update map marker
+        const marker = fleetMarkers[nautilus.id];
+        if (marker && hasPosition(nautilus)) {
+            marker.setLatLng([nautilus.lat, nautilus.lng]);
+            marker.setPopupContent(createPopupContent(nautilus));
+        } else if (!marker && hasPosition(nautilus)) {
+            addNautilusMarker(nautilus);
+        }
+    });
+
+    fitMapToFleet();
+    updateActiveCount();
+}
+
+// Drop all robots, e.g. before applying a fresh snapshot
+function resetFleet() {
+    Object.keys(fleetData).forEach(id => delete fleetData[id]);
     Object.values(fleetMarkers).forEach(marker => {
         fleetMap.removeLayer(marker);
     });
     fleetMarkers = {};
-    
-    newData.forEach(nautilus => {
-        addNautilusMarker(nautilus);
-    });
+    const tableBody = document.getElementById('fleetTableBody');
+    if (tableBody) {
+        tableBody.innerHTML = '';
+    }
 }
 
-// Simulate real-time updates (for demonstration)
-function simulateRealTimeUpdates() {
-    setInterval(() => {
-        // Randomly update battery levels and status
-        mockFleetData.forEach(nautilus => {
-            // Small random battery change
-            if (nautilus.battery > 0) {
-                nautilus.battery = Math.max(0, nautilus.battery + (Math.random() - 0.6) * 2);
-                nautilus.battery = Math.round(nautilus.battery);
-            }
-            
-            // Update timestamp
-            nautilus.lastUpdate = new Date().toISOString().replace('T', ' ').slice(0, 19);
-        });
-        
-        // Refresh table to show updates
-        populateFleetTable();
-        setupTableInteractions();
-        
-    }, 30000); // Update every 30 seconds
+// Update the active robot badge in the overview header
+function updateActiveCount() {
+    const badge = document.getElementById('fleetActiveCount');
+    if (badge) {
+        const online = Object.values(fleetData).filter(n => n.status === 'online').length;
+        badge.textContent = `${online} Active`;
+    }
 }
 
-// Start real-time simulation
-simulateRealTimeUpdates(); 
\ No newline at end of file
+// Subscribe to fleet updates: a snapshot on connect, then deltas
+function connectFleet() {
+    if (fleetSocket && fleetSocket.readyState <= WebSocket.OPEN) return;
+
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    fleetSocket = new WebSocket(`${protocol}//${window.location.host}/ws/fleet`);
+
+    fleetSocket.onopen = () => {
+        stopFleetPolling();
+        sendViewport();
+    };
+
+    fleetSocket.onmessage = (event) => {
+        applyFleetMessage(JSON.parse(event.data));
+    };
+
+    fleetSocket.onclose = () => {
+        fleetSocket = null;
+        // Poll for deltas while the socket is down, then try to reconnect
+        startFleetPolling();
+        setTimeout(connectFleet, 5000);
+    };
+}
+
+async function pollFleet() {
+    try {
+        const viewport = getViewport();
+        const bbox = viewport ? `&bbox=${viewport.join(',')}` : '';
+        const response = await fetch(`/api/fleet?since=${fleetVersion}${bbox}`);
+        applyFleetMessage(await response.json());
+    } catch (error) {
+        console.error('Error polling fleet:', error);
+    }
+}
+
+function startFleetPolling() {
+    if (!fleetPollTimer) {
+        pollFleet();
+        fleetPollTimer = setInterval(pollFleet, 5000);
+    }
+}
+
+function stopFleetPolling() {
+    if (fleetPollTimer) {
+        clearInterval(fleetPollTimer);
+        fleetPollTimer = null;
+    }
+}
@@ -0,0 +1,502 @@
+"""
+Fleet Aggregator for Nautilus Controller
+Keeps a persistent telemetry connection to every robot controller and merges
+their state into one versioned fleet snapshot pushed to fleet dashboards.
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import urlparse
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+from fleet_protocol import FleetCodec, DeltaCache, POSITION_CODES, encode
+from utils.spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+# Robot state field -> fleet record field
+STATE_TO_FLEET_FIELDS = {
+    "posY": "lat",
+    "posX": "lng",
+    "heading": "heading",
+    "battery": "battery",
+    "temperature": "temperature",
+    "is_moving": "is_moving",
+    "gps_status": "gps_status",
+}
+
+
+def telemetry_url(url: str) -> str:
+    """Convert a controller base URL (http://host:port) to its telemetry WebSocket URL."""
+    parsed = urlparse(url)
+    scheme = "wss" if parsed.scheme == "https" else "ws"
+    return f"{scheme}://{parsed.netloc}{parsed.path.rstrip('/')}/ws/telemetry"
+
+
+class FleetAggregator:
+    """
+    Merges the telemetry of many robots into one in-memory fleet snapshot.
+
+    Each remote controller is followed over a single persistent connection to
+    its /ws/telemetry stream, so the aggregator only receives state deltas.
+    The local robot is read directly from its state store. Every change bumps
+    the fleet version; dashboards receive coalesced deltas encoded once per
+    push, so robot and dashboard counts do not multiply into polls.
+
+    Robot positions are kept in a grid spatial index; dashboards that send
+    their map viewport only receive the robots inside it.
+
+    Dashboards are served in the compact fleet protocol: every wire field of
+    every robot carries the fleet version it last changed at, so a client
+    that reports its last-seen version gets back only the changed fields of
+    the changed robots. Encoded deltas are cached per (from, to, viewport).
+    """
+
+    def __init__(self, max_rate: float = 2.0, send_timeout: float = 1.0,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0,
+                 track_store=None, index_cell_size: float = 0.001,
+                 codec: Optional[FleetCodec] = None):
+        """
+        Initialize the aggregator.
+
+        Args:
+            max_rate: Maximum number of pushes per second to dashboards
+            send_timeout: Seconds before a slow dashboard is dropped
+            reconnect_delay: Initial reconnect delay for remote robots
+            max_reconnect_delay: Upper bound for the reconnect delay
+            track_store: Optional TrackStore that records remote robot positions
+            index_cell_size: Spatial index cell edge in degrees
+            codec: FleetCodec used to quantize fields (defaults to FleetCodec())
+        """
+        self.min_interval = 1.0 / max_rate
+        self.send_timeout = send_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.track_store = track_store
+        self.version = 0
+        self.index = SpatialIndex(index_cell_size)
+        self.codec = codec or FleetCodec()
+        self.cache = DeltaCache()
+        # Dashboard websocket -> viewport (south, west, north, east) or None
+        self.clients = {}
+        self.messages_encoded = 0
+        self._robots = {}
+        self._packed = {}
+        self._field_versions = {}
+        self._versions = {}
+        self._remotes = {}
+        self._locals = {}
+        self._local_callbacks = {}
+        self._lock = threading.Lock()
+        self._last_version = 0
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+
+    def _add_robot(self, robot_id: str, model: str, ip: str) -> None:
+        with self._lock:
+            self.version += 1
+            record = self._robots[robot_id] = {
+                "id": robot_id,
+                "model": model,
+                "ip": ip,
+                "status": "connecting",
+                "lat": None,
+                "lng": None,
+                "heading": None,
+                "battery": None,
+                "temperature": None,
+                "is_moving": False,
+                "gps_status": None,
+                "last_update": None,
+            }
+            self._packed[robot_id] = self.codec.pack(record)
+            self._field_versions[robot_id] = {code: self.version for code in self._packed[robot_id]}
+            self._versions[robot_id] = self.version
+
+    def add_local(self, robot_id: str, model: str, state_store) -> None:
+        """
+        Add the robot served by this backend, read from its state store.
+
+        Args:
+            robot_id: Fleet id of the robot
+            model: Model name shown on the dashboard
+            state_store: The backend's RobotStateStore
+        """
+        self._add_robot(robot_id, model, "local")
+        self._locals[robot_id] = state_store
+        self._apply_state(robot_id, state_store.snapshot())
+        self.update_robot(robot_id, status="online")
+
+    def add_remote(self, robot_id: str, model: str, url: str) -> None:
+        """
+        Add a robot controller followed over its telemetry WebSocket.
+
+        Args:
+            robot_id: Fleet id of the robot
+            model: Model name shown on the dashboard (None to use the robot's own)
+            url: Controller base URL, e.g. http://192.168.1.101:8000
+        """
+        self._add_robot(robot_id, model, urlparse(url).hostname)
+        self._remotes[robot_id] = url
+
+    def update_robot(self, robot_id: str, **fields) -> bool:
+        """
+        Merge fields into a robot's record.
+
+        The fleet version only advances when a field changes at wire
+        resolution; smaller changes are stored without producing a delta.
+
+        Returns:
+            bool: True if any field changed on the wire
+        """
+        with self._lock:
+            record = self._robots.get(robot_id)
+            if record is None:
+                return False
+            changes = {name: value for name, value in fields.items() if record.get(name) != value}
+            if not changes:
+                return False
+            record.update(changes)
+            position = (record["lat"], record["lng"], record["heading"] or 0.0)
+
+            packed = self._packed[robot_id]
+            wire_changes = {
+                code: value for code, value in self.codec.pack(changes).items()
+                if packed.get(code) != value
+            }
+            if wire_changes:
+                self.version += 1
+                packed.update(wire_changes)
+                field_versions = self._field_versions[robot_id]
+                for code in wire_changes:
+                    field_versions[code] = self.version
+                self._versions[robot_id] = self.version
+
+        if (("lat" in changes or "lng" in changes or "heading" in changes)
+                and position[0] is not None and position[1] is not None):
+            self.index.update(robot_id, position[0], position[1])
+            if self.track_store is not None and robot_id in self._remotes:
+                self.track_store.record(robot_id, time.time(), *position)
+
+        if not wire_changes:
+            return False
+        # Wake the broadcaster even without dashboards so its version stays current
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def _apply_state(self, robot_id: str, state: Dict) -> None:
+        """Map robot state fields onto the fleet record."""
+        fields = {
+            fleet_name: state[state_name]
+            for state_name, fleet_name in STATE_TO_FLEET_FIELDS.items()
+            if state_name in state
+        }
+        if fields:
+            fields["last_update"] = time.time()
+            self.update_robot(robot_id, **fields)
+
+    def _on_local_change(self, robot_id: str):
+        def callback(version, changes):
+            self._apply_state(robot_id, changes)
+        return callback
+
+    def snapshot(self, bbox: Optional[Sequence[float]] = None) -> Dict:
+        """
+        Get a full fleet snapshot in the compact protocol.
+
+        Args:
+            bbox: Optional viewport (south, west, north, east); only robots
+                inside it are included
+
+        Returns:
+            Dict: {"t": "s", "v": version, "q": codec params, "r": {id: fields}}
+        """
+        visible = self.index.query_bbox(*bbox) if bbox is not None else None
+        with self._lock:
+            return {
+                "t": "s",
+                "v": self.version,
+                "q": self.codec.params(),
+                "r": {
+                    robot_id: dict(packed) for robot_id, packed in self._packed.items()
+                    if visible is None or robot_id in visible
+                }
+            }
+
+    def changes_since(self, version: int, bbox: Optional[Sequence[float]] = None) -> Dict:
+        """
+        Get the fields that changed after a given fleet version.
+
+        Args:
+            version: Last fleet version the caller has seen
+            bbox: Optional viewport (south, west, north, east); changed robots
+                outside it are listed by id under "x"
+
+        Returns:
+            Dict: {"t": "d", "f": version, "v": current version,
+                "r": {id: changed fields}} plus "x" when filtered by viewport
+        """
+        with self._lock:
+            changes = {
+                "t": "d",
+                "f": version,
+                "v": self.version,
+                "r": {
+                    robot_id: {
+                        code: self._packed[robot_id][code]
+                        for code, field_version in self._field_versions[robot_id].items()
+                        if field_version > version
+                    }
+                    for robot_id, robot_version in self._versions.items()
+                    if robot_version > version
+                }
+            }
+        if bbox is not None:
+            changes = self._filter_viewport(changes, bbox)
+        return changes
+
+    def _filter_viewport(self, changes: Dict, bbox: Sequence[float]) -> Dict:
+        """
+        Split changed robots into those inside a viewport and removed ids.
+
+        A robot that moved may have just entered the viewport, so its full
+        record is sent instead of only the changed fields.
+        """
+        visible = self.index.query_bbox(*bbox)
+        robots = {}
+        with self._lock:
+            for robot_id, fields in changes["r"].items():
+                if robot_id not in visible:
+                    continue
+                if any(code in fields for code in POSITION_CODES):
+                    fields = dict(self._packed[robot_id])
+                robots[robot_id] = fields
+        return {
+            "t": "d",
+            "f": changes["f"],
+            "v": changes["v"],
+            "r": robots,
+            "x": [robot_id for robot_id in changes["r"] if robot_id not in visible]
+        }
+
+    def encoded_changes(self, version: Optional[int], bbox: Optional[Sequence[float]] = None) -> str:
+        """
+        Get the encoded update for a client at `version`, using the cache.
+
+        A client without a version, or with one this aggregator never issued
+        (e.g. from before a restart), gets a full snapshot instead.
+
+        Returns:
+            str: Encoded snapshot or delta message
+        """
+        if version is None or version <= 0 or version > self.version:
+            return encode(self.snapshot(bbox))
+        return self._cached_delta(version, bbox)[0]
+
+    def _cached_delta(self, version: int, bbox: Optional[Sequence[float]]):
+        """Get (encoded delta, whether it carries any robot) from the cache."""
+        key = (version, self.version, bbox)
+        entry = self.cache.get(key)
+        if entry is None:
+            changes = self.changes_since(version, bbox)
+            entry = (encode(changes), bool(changes["r"] or changes.get("x")))
+            self.messages_encoded += 1
+            self.cache.put(key, entry)
+        return entry
+
+    def get_robot(self, robot_id: str) -> Optional[Dict]:
+        """Get a copy of a robot's full-precision record, or None."""
+        with self._lock:
+            record = self._robots.get(robot_id)
+            return dict(record) if record is not None else None
+
+    def nearest(self, lat: float, lng: float, k: int = 1, max_distance: Optional[float] = None) -> List[Dict]:
+        """
+        Get the k robots nearest to a point.
+
+        Returns:
+            list: Robot records with an added "distance" in meters, nearest first
+        """
+        result = []
+        for robot_id, distance in self.index.nearest(lat, lng, k, max_distance):
+            with self._lock:
+                record = dict(self._robots[robot_id])
+            record["distance"] = round(distance, 2)
+            result.append(record)
+        return result
+
+    def in_geofence(self, polygon: Sequence[Sequence[float]]) -> List[str]:
+        """Get the ids of robots inside a polygon of (lat, lng) vertices."""
+        return sorted(self.index.query_polygon(polygon))
+
+    def robot_ids(self) -> List[str]:
+        """Get the ids of all robots in the fleet."""
+        with self._lock:
+            return list(self._robots)
+
+    async def start(self) -> None:
+        """Subscribe to the local robots and connect to every remote robot."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._last_version = self.version
+
+        for robot_id, state_store in self._locals.items():
+            callback = self._on_local_change(robot_id)
+            state_store.subscribe(callback)
+            self._local_callbacks[robot_id] = callback
+            # Pick up changes made between add_local() and now
+            self._apply_state(robot_id, state_store.snapshot())
+
+        self._tasks = [asyncio.create_task(self._broadcast_loop())]
+        for robot_id, url in self._remotes.items():
+            self._tasks.append(asyncio.create_task(self._follow_remote(robot_id, url)))
+
+    async def stop(self) -> None:
+        """Stop all aggregator tasks."""
+        for robot_id, callback in self._local_callbacks.items():
+            self._locals[robot_id].unsubscribe(callback)
+        self._local_callbacks = {}
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _follow_remote(self, robot_id: str, url: str) -> None:
+        """Stream one remote robot's telemetry, reconnecting with exponential backoff."""
+        import websockets
+
+        delay = self.reconnect_delay
+        ws_url = telemetry_url(url)
+        while True:
+            try:
+                async with websockets.connect(ws_url, open_timeout=5) as connection:
+                    self.update_robot(robot_id, status="online")
+                    delay = self.reconnect_delay
+                    async for message in connection:
+                        data = json.loads(message)
+                        if data.get("type") == "snapshot":
+                            robot = data.get("static", {}).get("robot")
+                            if robot and self._robots[robot_id]["model"] is None:
+                                self.update_robot(robot_id, model=robot.get("model"))
+                        self._apply_state(robot_id, data.get("state", {}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Only log the transition so unreachable robots do not flood the log
+                if self._robots[robot_id]["status"] != "offline":
+                    logger.warning(f"Fleet connection to {robot_id} ({ws_url}) failed: {e}")
+
+            self.update_robot(robot_id, status="offline")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _broadcast_loop(self) -> None:
+        """Send coalesced fleet deltas to all dashboards, at most max_rate per second."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            current = self.version
+            if current > self._last_version and self.clients:
+                await self._send_all(self._last_version)
+            self._last_version = current
+
+            # Changes arriving during this sleep are merged into the next push
+            await asyncio.sleep(self.min_interval)
+
+    async def _send_all(self, version: int) -> None:
+        """
+        Send the changes since `version` to every dashboard, dropping slow or
+        closed ones.
+
+        Messages come from the delta cache, so dashboards showing the same
+        viewport share one encoding.
+        """
+        clients = list(self.clients.items())
+        messages = {}
+        for _, bbox in clients:
+            if bbox not in messages:
+                message, has_changes = self._cached_delta(version, bbox)
+                # Skip viewports where nothing visible changed
+                messages[bbox] = message if has_changes else None
+
+        sends = [(client, messages[bbox]) for client, bbox in clients if messages[bbox] is not None]
+        results = await asyncio.gather(
+            *(asyncio.wait_for(client.send_text(message), self.send_timeout) for client, message in sends),
+            return_exceptions=True
+        )
+        for (client, _), result in zip(sends, results):
+            if isinstance(result, Exception):
+                self.clients.pop(client, None)
+
+    async def _subscribe(self, websocket: WebSocket, bbox: Optional[Sequence[float]]) -> None:
+        """
+        Send a dashboard a snapshot of its viewport and subscribe it to deltas.
+
+        Broadcasts made while the snapshot is being sent skip the socket, so it
+        is caught up with deltas from the snapshot version and joins the
+        broadcast with no await in between; at worst it then receives a few
+        fields it already has.
+        """
+        self.clients.pop(websocket, None)
+        snapshot = self.snapshot(bbox)
+        await websocket.send_text(encode(snapshot))
+        version = snapshot["v"]
+        while version != self.version:
+            current = self.version
+            message, has_changes = self._cached_delta(version, bbox)
+            if has_changes:
+                await websocket.send_text(message)
+            version = current
+        self.clients[websocket] = bbox
+
+    async def handle_client(self, websocket: WebSocket) -> None:
+        """
+        Serve one fleet dashboard: send the full fleet snapshot, then keep the
+        socket subscribed to deltas until it disconnects.
+
+        A dashboard may send {"bbox": [south, west, north, east]} at any time
+        to restrict updates to its map viewport ({"bbox": null} clears it);
+        it then receives a fresh snapshot of the robots in view.
+        """
+        await websocket.accept()
+        await self._subscribe(websocket, None)
+        try:
+            while True:
+                message = await websocket.receive_text()
+                try:
+                    bbox = json.loads(message).get("bbox")
+                    bbox = tuple(float(value) for value in bbox) if bbox is not None else None
+                    if bbox is not None and len(bbox) != 4:
+                        raise ValueError("bbox needs four values")
+                except (ValueError, TypeError, AttributeError):
+                    continue
+                await self._subscribe(websocket, bbox)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.clients.pop(websocket, None)
+
+    def get_status(self) -> Dict:
+        """Get aggregator statistics."""
+        with self._lock:
+            statuses = [record["status"] for record in self._robots.values()]
+        return {
+            "robots": len(statuses),
+            "online": statuses.count("online"),
+            "offline": statuses.count("offline"),
+            "remote": len(self._remotes),
+            "clients": len(self.clients),
+            "indexed": len(self.index),
+            "messages_encoded": self.messages_encoded,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "version": self.version
+        }
@@ -0,0 +1,116 @@
+"""
+Fleet Protocol for Nautilus Controller
+Compact wire format for fleet snapshots and deltas: short field codes and
+quantized values, so a delta carries only the fields that visibly changed.
+"""
+
+import json
+from collections import OrderedDict
+from typing import Dict
+
+# Fleet record field -> wire code
+FIELD_CODES = {
+    "model": "m",
+    "ip": "i",
+    "status": "s",
+    "lat": "a",
+    "lng": "o",
+    "heading": "h",
+    "battery": "b",
+    "temperature": "t",
+    "is_moving": "v",
+    "gps_status": "g",
+}
+
+# Position codes; a robot whose position changed may have entered a viewport
+POSITION_CODES = ("a", "o")
+
+STATUS_CODES = {"connecting": 0, "online": 1, "offline": 2}
+
+
+class FleetCodec:
+    """
+    Quantizes fleet record fields into their wire representation.
+
+    Coordinates are sent as integers in units of 1/coord_scale degrees and
+    battery in steps of battery_step percent. Values are compared after
+    quantization, so changes below the wire resolution (GPS jitter, battery
+    noise) do not produce deltas.
+    """
+
+    def __init__(self, coord_scale: int = 100000, battery_step: int = 1):
+        """
+        Initialize the codec.
+
+        Args:
+            coord_scale: Coordinate units per degree (100000 is about 1.1 m)
+            battery_step: Battery quantization step in percent
+        """
+        self.coord_scale = coord_scale
+        self.battery_step = battery_step
+
+    def params(self) -> Dict:
+        """Get the quantization parameters clients need to decode values."""
+        return {"coord_scale": self.coord_scale, "battery_step": self.battery_step}
+
+    def pack(self, fields: Dict) -> Dict:
+        """
+        Convert fleet record fields to wire codes and quantized values.
+
+        Fields without a wire code (e.g. last_update) are skipped.
+        """
+        packed = {}
+        for name, value in fields.items():
+            code = FIELD_CODES.get(name)
+            if code is None:
+                continue
+            if value is not None:
+                if code in POSITION_CODES:
+                    value = round(value * self.coord_scale)
+                elif code == "b":
+                    value = round(value / self.battery_step) * self.battery_step
+                elif code in ("h", "t"):
+                    value = round(value)
+                elif code == "v":
+                    value = 1 if value else 0
+                elif code == "s":
+                    value = STATUS_CODES.get(value, STATUS_CODES["offline"])
+            packed[code] = value
+        return packed
+
+
+class DeltaCache:
+    """
+    Bounded LRU cache of encoded fleet deltas keyed by (from, to, viewport).
+
+    Dashboards that saw the same version receive byte-identical deltas, so
+    each delta is encoded once no matter how many dashboards ask for it.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        """Get a cached entry, or None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry) -> None:
+        """Store an entry, evicting the least recently used beyond max_entries."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def encode(message: Dict) -> str:
+    """Encode a fleet message as compact JSON."""
+    return json.dumps(message, separators=(",", ":"))
@@ -25,6 +25,14 @@ class JoystickController {
         this.movementInterval = null;
         this.movementDelay = 100; // ms between movement commands
         
+        // Teleop WebSocket (falls back to HTTP while disconnected)
+        this.teleopSocket = null;
+        this.teleopSeq = 0;
+        this.teleopSentAt = new Map(); // seq -> send time, for ack latency
+        this.teleopLatency = null; // ms, last command round trip
+        this.teleopReconnectDelay = 2000;
+        this.blockedDirection = null; // direction the obstacle gate refused
+        
         this.init();
     }
 
@@ -39,6 +47,58 @@ class JoystickController {
 
         this.setupEventListeners();
         this.updateBaseMetrics();
+        this.connectTeleop();
+    }
+
+    connectTeleop() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        try {
+            this.teleopSocket = new WebSocket(`${protocol}//${window.location.host}/ws/teleop`);
+        } catch (error) {
+            console.error('Teleop WebSocket error:', error);
+            return;
+        }
+
+        this.teleopSocket.onmessage = (event) => this.handleTeleopMessage(JSON.parse(event.data));
+        this.teleopSocket.onclose = () => {
+            this.teleopSocket = null;
+            this.teleopSentAt.clear();
+            setTimeout(() => this.connectTeleop(), this.teleopReconnectDelay);
+        };
+    }
+
+    isTeleopConnected() {
+        return this.teleopSocket !== null && this.teleopSocket.readyState === WebSocket.OPEN;
+    }
+
+    sendTeleopFrame(direction) {
+        this.teleopSeq += 1;
+        this.teleopSentAt.set(this.teleopSeq, performance.now());
+        this.teleopSocket.send(JSON.stringify({
+            d: direction,
+            i: Math.round(this.currentIntensity * 100) / 100,
+            s: this.teleopSeq
+        }));
+    }
+
+    handleTeleopMessage(message) {
+        if (message.stop) {
+            // Backend dead-man switch stopped the robot
+            this.nautilusController.isMoving = false;
+            this.nautilusController.currentDirection = 'stopped';
+            this.nautilusController.updateButtonStates();
+            return;
+        }
+
+        if (message.blocked) {
+            this.showBlocked(message.blocked);
+        }
+
+        const sentAt = this.teleopSentAt.get(message.s);
+        if (sentAt !== undefined) {
+            this.teleopLatency = performance.now() - sentAt;
+            this.teleopSentAt.delete(message.s);
+        }
     }
 
     setupEventListeners() {
@@ -263,7 +323,10 @@ class JoystickController {
     updateUI() {
         // Update direction display
         const directionDisplay = document.getElementById('currentJoystickDirection');
-        if (directionDisplay) {
+        // showBlocked() owns the badge while the knob stays in a refused direction
+        const blocked = this.currentDirection && this.currentDirection.code === this.blockedDirection;
+        if (directionDisplay && !blocked) {
+            directionDisplay.title = '';
             const directionText = this.currentDirection ? 
                 this.currentDirection.name.toUpperCase() : 'CENTER';
             directionDisplay.textContent = directionText;
@@ -330,6 +393,10 @@ class JoystickController {
 
         if (!this.currentDirection || this.currentIntensity === 0) return;
 
+        // Don't keep resending a direction the obstacle gate refused
+        if (this.currentDirection.code === this.blockedDirection) return;
+        this.blockedDirection = null;
+
         // Send initial movement command
         this.sendMovementCommand();
 
@@ -348,9 +415,17 @@ class JoystickController {
             clearInterval(this.movementInterval);
             this.movementInterval = null;
         }
+        this.blockedDirection = null;
 
         // Send stop command
-        this.nautilusController.stopMovement();
+        if (this.isTeleopConnected()) {
+            this.sendTeleopFrame('stop');
+            this.nautilusController.isMoving = false;
+            this.nautilusController.currentDirection = 'stopped';
+            this.nautilusController.updateButtonStates();
+        } else {
+            this.nautilusController.stopMovement();
+        }
         
         // Update UI
         this.currentDirection = null;
@@ -361,6 +436,13 @@ class JoystickController {
     async sendMovementCommand() {
         if (!this.currentDirection) return;
 
+        if (this.isTeleopConnected()) {
+            this.sendTeleopFrame(this.currentDirection.code);
+            this.nautilusController.isMoving = true;
+            this.nautilusController.currentDirection = this.currentDirection.name;
+            return;
+        }
+
         try {
             // Prepare movement data
             const movementData = {
@@ -378,7 +460,10 @@ class JoystickController {
                 body: JSON.stringify(movementData)
             });
 
-            if (response.ok) {
+            if (response.status === 409) {
+                const data = await response.json();
+                this.showBlocked(data.obstacle);
+            } else if (response.ok) {
                 const data = await response.json();
                 // Update nautilus controller state
                 this.nautilusController.isMoving = true;
@@ -391,6 +476,31 @@ class JoystickController {
         }
     }
 
+    showBlocked(obstacle) {
+        // The backend already stopped the robot; stop the local movement loop
+        if (this.movementInterval) {
+            clearInterval(this.movementInterval);
+            this.movementInterval = null;
+        }
+        if (this.currentDirection) {
+            this.blockedDirection = this.currentDirection.code;
+        }
+        this.nautilusController.isMoving = false;
+        this.nautilusController.currentDirection = 'stopped';
+        this.nautilusController.updateButtonStates();
+
+        const classes = obstacle && obstacle.classes && obstacle.classes.length ?
+            obstacle.classes.join(', ') : 'depth';
+        console.warn(`Forward motion blocked: obstacle ahead (${classes})`);
+
+        const directionDisplay = document.getElementById('currentJoystickDirection');
+        if (directionDisplay) {
+            directionDisplay.textContent = 'BLOCKED';
+            directionDisplay.title = `Obstacle ahead: ${classes}`;
+            directionDisplay.className = 'badge bg-danger rounded-pill';
+        }
+    }
+
     toggleControlMode() {
         this.isJoystickMode = !this.isJoystickMode;
         
@@ -0,0 +1,163 @@
+"""
+Event-Loop Watchdog for Nautilus Controller
+Measures event-loop scheduling lag continuously and captures the stack of
+whatever is blocking the loop when the lag crosses a threshold.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LoopWatchdog:
+    """
+    Detects event-loop stalls and records which code caused them.
+
+    A heartbeat task on the loop wakes every `interval` seconds and measures
+    how late it woke (the scheduling lag). A monitor thread watches the
+    heartbeat; once it is overdue by `threshold`, the thread grabs the loop
+    thread's current stack, which at that moment is the blocking handler.
+    When the loop recovers the stall is finished with its full duration and
+    kept in a bounded ring of recent stalls.
+    """
+
+    def __init__(self, interval: float = 0.05, threshold: float = 0.1, history: int = 50,
+                 lag_histogram=None, lag_gauge=None, stall_counter=None, app_root: Optional[str] = None):
+        """
+        Initialize the watchdog.
+
+        Args:
+            interval: Seconds between heartbeats
+            threshold: Lag in seconds recorded as a stall
+            history: Number of recent stalls kept
+            lag_histogram: Optional metrics histogram observing every lag sample
+            lag_gauge: Optional metrics gauge set to the latest lag sample
+            stall_counter: Optional metrics counter incremented per stall
+            app_root: Directory whose frames identify the offending handler
+                (defaults to this module's directory)
+        """
+        self.interval = interval
+        self.threshold = threshold
+        self.lag_histogram = lag_histogram
+        self.lag_gauge = lag_gauge
+        self.stall_counter = stall_counter
+        self.app_root = os.path.abspath(app_root or os.path.dirname(os.path.abspath(__file__)))
+        self.stalls = deque(maxlen=history)
+        self.stall_count = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+        self._beat = 0
+        self._last_beat = None
+        self._pending = None
+        self._loop_thread_id = None
+        self._task = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    async def _heartbeat(self):
+        self._loop_thread_id = threading.get_ident()
+        while True:
+            expected = time.perf_counter() + self.interval
+            with self._lock:
+                self._last_beat = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - expected)
+            with self._lock:
+                self._beat += 1
+                pending, self._pending = self._pending, None
+            if self.lag_histogram is not None:
+                self.lag_histogram.observe(lag)
+            if self.lag_gauge is not None:
+                self.lag_gauge.set(lag)
+            self.max_lag = max(self.max_lag, lag)
+            if lag >= self.threshold:
+                self._finish_stall(lag, pending)
+
+    def _monitor(self):
+        captured_beat = None
+        while not self._stop_event.wait(self.interval / 2):
+            with self._lock:
+                last_beat, beat = self._last_beat, self._beat
+            if last_beat is None or beat == captured_beat:
+                continue
+            overdue = time.perf_counter() - last_beat - self.interval
+            if overdue >= self.threshold:
+                stall = self._capture(overdue)
+                captured_beat = beat
+                with self._lock:
+                    # The loop may have recovered while the stack was captured
+                    if self._beat == beat:
+                        self._pending = stall
+                logger.warning(f"Event loop blocked for {overdue * 1000:.0f} ms in {stall['handler']}")
+
+    def _capture(self, overdue: float) -> Dict:
+        """Capture the loop thread's stack while it is blocked."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        return {
+            "time": time.time() - overdue,
+            "handler": self._find_handler(stack),
+            "stack": [f"{entry.filename}:{entry.lineno} in {entry.name}" for entry in stack]
+        }
+
+    def _find_handler(self, stack: List) -> Optional[str]:
+        """Get the innermost application frame, skipping framework and library code."""
+        for entry in reversed(stack):
+            filename = os.path.abspath(entry.filename)
+            if filename.startswith(self.app_root) and filename != os.path.abspath(__file__):
+                return f"{os.path.basename(filename)}:{entry.lineno} in {entry.name}"
+        return stack[-1].name if stack else None
+
+    def _finish_stall(self, lag: float, pending: Optional[Dict]) -> None:
+        stall = pending or {"time": time.time() - lag, "handler": None, "stack": []}
+        stall["lag_ms"] = round(lag * 1000, 1)
+        self.stalls.append(stall)
+        self.stall_count += 1
+        if self.stall_counter is not None:
+            self.stall_counter.inc()
+
+    def start(self) -> None:
+        """Start the heartbeat task and the monitor thread (call from the event loop)."""
+        if self._task is not None:
+            return
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._monitor, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """Stop the heartbeat task and the monitor thread."""
+        self._stop_event.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def get_stalls(self, limit: Optional[int] = None) -> Dict:
+        """
+        Get recent stalls, newest first.
+
+        Returns:
+            dict: threshold_ms, stall_count, max_lag_ms and recent stalls
+                with time, lag_ms, handler and stack
+        """
+        stalls = list(self.stalls)[::-1]
+        if limit is not None:
+            stalls = stalls[:limit]
+        return {
+            "threshold_ms": self.threshold * 1000,
+            "stall_count": self.stall_count,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": stalls
+        }
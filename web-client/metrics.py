@@ -0,0 +1,289 @@
+"""
+Metrics for Nautilus Controller
+Minimal Prometheus-style counters, gauges and histograms with a text
+exposition endpoint, plus collectors read only at scrape time.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Event-loop lag buckets in seconds
+LOOP_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str]) -> str:
+    if not labelnames:
+        return ""
+    pairs = ",".join(
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(labelnames, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class holding one child per label-value tuple."""
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """
+        Get the child for a label-value tuple, creating it on first use.
+
+        Hot paths should call this once up front and keep the child, so an
+        observation is only an index update.
+        """
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def register_labels(self, label_sets: Iterable[Sequence[str]]) -> None:
+        """Pre-register label sets so they are exported (as zero) before first use."""
+        for values in label_sets:
+            self.labels(*values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            lines.extend(child.render(self.name, _format_labels(self.labelnames, values), self.labelnames, values))
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def render(self, name, labels, labelnames, values):
+        return [f"{name}{labels} {_format_value(self.value)}"]
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One slot per bucket plus the +Inf overflow; allocated once
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels, labelnames, values):
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.bounds + (float("inf"),), self.counts):
+            cumulative += bucket_count
+            bucket_labels = _format_labels(labelnames + ("le",), values + (_format_value(bound),))
+            lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+        lines.append(f"{name}_sum{labels} {_format_value(self.sum)}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """Increment the unlabelled counter."""
+        self._children[()].inc(amount)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        """Set the unlabelled gauge."""
+        self._children[()].set(value)
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed bucket bounds."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value):
+        """Observe a value on the unlabelled histogram."""
+        self._children[()].observe(value)
+
+
+# Collector output: (name, kind, help, [(labels dict, value), ...])
+CollectorResult = Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]
+
+
+class MetricsRegistry:
+    """
+    Holds metrics and scrape-time collectors and renders the text format.
+
+    Updates are plain attribute/list increments without locks; under the GIL
+    a concurrent scrape may see a histogram mid-update, which Prometheus
+    tolerates, in exchange for keeping observations essentially free.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        """Register a metric and return it."""
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], CollectorResult]) -> None:
+        """
+        Register a function called at scrape time that yields
+        (name, kind, help, [(labels, value), ...]) for values owned elsewhere,
+        such as service frame counters or queue depths.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    label_text = _format_labels(tuple(labels), tuple(labels.values()))
+                    lines.append(f"{name}{label_text} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording request latency and responses per route.
+
+    Requests are labelled with the matched route template (e.g.
+    /api/fleet/nearest), never the raw path, so label cardinality is fixed.
+    """
+
+    def __init__(self, app, latency: Histogram, responses: Counter):
+        self.app = app
+        self.latency = latency
+        self.responses = responses
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "other"
+            method = scope["method"]
+            self.latency.labels(method, path).observe(time.perf_counter() - start)
+            self.responses.labels(method, path, f"{status[0] // 100}xx").inc()
+
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def process_metrics() -> CollectorResult:
+    """Collect resident memory, CPU time and thread count of this process."""
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        try:
+            import resource
+            # ru_maxrss is the peak, in KiB on Linux
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except (ImportError, AttributeError):
+            pass
+
+    times = os.times()
+    return [
+        ("process_resident_memory_bytes", "gauge", "Resident memory size in bytes.", [({}, rss)]),
+        ("process_cpu_seconds_total", "counter", "Total user and system CPU time in seconds.",
+         [({}, times.user + times.system)]),
+        ("process_threads", "gauge", "Number of Python threads.", [({}, threading.active_count())]),
+    ]
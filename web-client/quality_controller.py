@@ -0,0 +1,353 @@
+"""
+Adaptive Quality Controller for Nautilus Controller
+Watches end-to-end latency and CPU use of the vision pipelines and moves the
+quality knobs (JPEG qualities, model input sizes, depth rate) between fixed
+levels to hold a target latency and frame rate.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Steps from full quality, best first: JPEG qualities drop by `jpeg_drop`
+# points and the upload quality by `upload_drop`, model input sizes shrink by
+# `size_factor` (depth) and `imgsz_factor` (YOLO), and the pause between depth
+# frames grows by `interval_factor`.
+QUALITY_STEPS = (
+    {'jpeg_drop': 0, 'upload_drop': 0.0, 'size_factor': 1.0, 'imgsz_factor': 1.0, 'interval_factor': 1.0},
+    {'jpeg_drop': 5, 'upload_drop': 0.1, 'size_factor': 0.87, 'imgsz_factor': 0.9, 'interval_factor': 1.5},
+    {'jpeg_drop': 10, 'upload_drop': 0.2, 'size_factor': 0.76, 'imgsz_factor': 0.8, 'interval_factor': 2.5},
+    {'jpeg_drop': 20, 'upload_drop': 0.3, 'size_factor': 0.6, 'imgsz_factor': 0.65, 'interval_factor': 4.0},
+    {'jpeg_drop': 30, 'upload_drop': 0.4, 'size_factor': 0.49, 'imgsz_factor': 0.5, 'interval_factor': 6.0},
+)
+
+
+def build_quality_levels(ai_jpeg_quality: int = 85, depth_jpeg_quality: int = 80, upload_quality: float = 0.8,
+                         depth_input_size: int = 518, depth_interval: float = 0.1, yolo_imgsz: int = 640):
+    """
+    Build the quality levels from the full-quality settings.
+
+    Level 0 is the given settings; each lower level applies one of
+    QUALITY_STEPS to them. Depth input sizes are rounded down to multiples
+    of the ViT patch size (14) and YOLO image sizes to multiples of its
+    largest stride (32).
+
+    Returns:
+        tuple: One dict of knob values per level, best first
+    """
+    return tuple({
+        'ai_jpeg_quality': max(10, ai_jpeg_quality - step['jpeg_drop']),
+        'depth_jpeg_quality': max(10, depth_jpeg_quality - step['jpeg_drop']),
+        'upload_quality': round(max(0.1, upload_quality - step['upload_drop']), 2),
+        'depth_input_size': max(14, int(depth_input_size * step['size_factor']) // 14 * 14),
+        'depth_interval': round(depth_interval * step['interval_factor'], 3),
+        'yolo_imgsz': max(32, int(yolo_imgsz * step['imgsz_factor']) // 32 * 32)
+    } for step in QUALITY_STEPS)
+
+# Services whose end-to-end ('total') latency the controller watches
+PIPELINES = ('ai_detection', 'depth_camera')
+
+
+class QualityController:
+    """
+    Closed-loop quality control for the AI detection and depth pipelines.
+
+    Every `interval` seconds the controller reads the end-to-end ('total')
+    latency samples each service recorded since the last tick and the
+    process CPU time. A pipeline is over budget when its p95 exceeds its
+    target latency or the frame time of its target fps; CPU above
+    `cpu_high` counts as over budget too. After `degrade_after` bad ticks
+    the controller steps one level down, after `improve_after` good ticks
+    (every pipeline well inside budget and CPU below `cpu_low`) one level
+    up, and after each step it waits `cooldown` seconds so the next
+    decision sees the effect of the change. Ticks without frames hold the
+    level.
+
+    Other components (e.g. a thermal governor) cap the quality with
+    set_limit(); the effective level is the worst of the controller's own
+    level and every limit, so limits apply in manual mode as well.
+    """
+
+    def __init__(self, get_service: Callable[[str], Optional[object]], interval: float = 2.0,
+                 ai_target_ms: float = 250.0, ai_target_fps: float = 4.0,
+                 depth_target_ms: float = 1000.0, depth_target_fps: float = 1.0,
+                 cpu_high: float = 0.85, cpu_low: float = 0.6, headroom: float = 0.7,
+                 degrade_after: int = 2, improve_after: int = 5, cooldown: float = 6.0,
+                 min_level: int = 0, max_level: int = len(QUALITY_STEPS) - 1,
+                 mode: str = "auto", history: int = 100, levels: Optional[tuple] = None):
+        """
+        Initialize the controller.
+
+        Args:
+            get_service: Callable returning a loaded service by name, or None
+            interval: Seconds between control decisions
+            ai_target_ms: Target p95 end-to-end latency of AI detection
+            ai_target_fps: AI frame rate to hold; its frame time also bounds latency
+            depth_target_ms: Target p95 end-to-end latency of depth frames
+            depth_target_fps: Depth frame rate to hold
+            cpu_high: Process CPU share of all cores above which quality drops
+            cpu_low: CPU share below which quality may rise again
+            headroom: Fraction of the latency budget a pipeline must stay
+                under before quality rises
+            degrade_after: Consecutive over-budget ticks before stepping down
+            improve_after: Consecutive good ticks before stepping up
+            cooldown: Seconds after a change before the next one
+            min_level: Best level the controller may use
+            max_level: Worst level the controller may use
+            mode: "auto", or "manual" to hold the level set by set_mode()
+            history: Number of recent level changes kept
+            levels: Knob values per level from build_quality_levels(); built
+                from its defaults if None
+        """
+        self.levels = levels if levels is not None else build_quality_levels()
+        self.get_service = get_service
+        self.interval = interval
+        self.targets = {
+            'ai_detection': min(ai_target_ms, 1000.0 / ai_target_fps),
+            'depth_camera': min(depth_target_ms, 1000.0 / depth_target_fps)
+        }
+        self.cpu_high = cpu_high
+        self.cpu_low = cpu_low
+        self.headroom = headroom
+        self.degrade_after = degrade_after
+        self.improve_after = improve_after
+        self.cooldown = cooldown
+        self.min_level = max(0, min_level)
+        self.max_level = min(len(self.levels) - 1, max_level)
+        self.mode = mode
+        self.level = self.min_level
+        self.limits = {}
+        self.changes = deque(maxlen=history)
+        self.change_count = 0
+        self.last_sample = None
+        self._bad_ticks = 0
+        self._good_ticks = 0
+        self._last_change = 0.0
+        self._counts = {name: 0 for name in PIPELINES}
+        self._cpu_time = None
+        self._task = None
+
+    @property
+    def effective_level(self) -> int:
+        """Level in force: the controller's level or a worse limit."""
+        return max([self.level] + [limit['level'] for limit in self.limits.values()])
+
+    @property
+    def settings(self) -> Dict:
+        """Knob values of the effective level."""
+        return self.levels[self.effective_level]
+
+    def start(self) -> None:
+        """Start the control task (call from the event loop)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the control task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"Quality control tick failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def tick(self, now: Optional[float] = None) -> Dict:
+        """
+        Take one latency/CPU sample, step the level if needed and apply it.
+
+        Returns:
+            dict: The sample (per-pipeline fps and p95, CPU share, verdict)
+        """
+        now = time.time() if now is None else now
+        sample = self._sample(now)
+        self.last_sample = sample
+
+        if self.mode == "auto" and sample['verdict'] != "idle" and now - self._last_change >= self.cooldown:
+            if sample['verdict'] == "over":
+                self._bad_ticks += 1
+                self._good_ticks = 0
+            elif sample['verdict'] == "good":
+                self._good_ticks += 1
+                self._bad_ticks = 0
+            else:
+                self._bad_ticks = self._good_ticks = 0
+
+            if self._bad_ticks >= self.degrade_after and self.level < self.max_level:
+                self._set_level(self.level + 1, sample['reason'], now)
+            elif self._good_ticks >= self.improve_after and self.level > self.min_level:
+                self._set_level(self.level - 1, "latency and CPU within budget", now)
+
+        self.apply()
+        return sample
+
+    def _sample(self, now: float) -> Dict:
+        """Measure each pipeline since the last tick and classify the load."""
+        times = os.times()
+        cpu_time = times.user + times.system
+        cpu = None
+        if self._cpu_time is not None and now > self._cpu_time[0]:
+            cpu = (cpu_time - self._cpu_time[1]) / (now - self._cpu_time[0]) / (os.cpu_count() or 1)
+        elapsed = now - self._cpu_time[0] if self._cpu_time is not None else None
+        self._cpu_time = (now, cpu_time)
+
+        pipelines = {}
+        reasons = []
+        within = []
+        for name in PIPELINES:
+            service = self.get_service(name)
+            if service is None:
+                continue
+            count, samples = service.latency.since('total', self._counts[name])
+            self._counts[name] = count
+            if len(samples) == 0:
+                continue
+            p95 = float(np.percentile(samples, 95))
+            target = self.targets[name]
+            pipelines[name] = {
+                'frames': len(samples),
+                'fps': round(len(samples) / elapsed, 2) if elapsed else None,
+                'p95_ms': round(p95, 1),
+                'target_ms': round(target, 1)
+            }
+            if p95 > target:
+                reasons.append(f"{name} p95 {p95:.0f} ms > {target:.0f} ms")
+            within.append(p95 <= target * self.headroom)
+
+        if cpu is not None and cpu > self.cpu_high:
+            reasons.append(f"CPU {cpu:.0%} > {self.cpu_high:.0%}")
+        if reasons:
+            verdict = "over"
+        elif not pipelines:
+            verdict = "idle"
+        elif all(within) and (cpu is None or cpu < self.cpu_low):
+            verdict = "good"
+        else:
+            verdict = "hold"
+        return {
+            'time': now,
+            'cpu': round(cpu, 3) if cpu is not None else None,
+            'pipelines': pipelines,
+            'verdict': verdict,
+            'reason': "; ".join(reasons) or None
+        }
+
+    def _set_level(self, level: int, reason: str, now: Optional[float] = None) -> None:
+        """Change the controller's own level and log why."""
+        now = time.time() if now is None else now
+        before = self.effective_level
+        self.level = level
+        self._record(before, reason, now)
+
+    def _record(self, before: int, reason: str, now: float) -> None:
+        """Log an effective level change with its reason and measurements."""
+        self._bad_ticks = self._good_ticks = 0
+        self._last_change = now
+        after = self.effective_level
+        if after == before:
+            return
+        change = {
+            'time': now,
+            'from': before,
+            'to': after,
+            'reason': reason,
+            'sample': self.last_sample,
+            'settings': self.levels[after]
+        }
+        self.changes.append(change)
+        self.change_count += 1
+        logger.info(f"Quality level {before} -> {after} ({reason}): {self.levels[after]}")
+
+    def set_mode(self, mode: str, level: Optional[int] = None) -> None:
+        """
+        Switch between automatic control and a fixed level.
+
+        Args:
+            mode: "auto" or "manual"
+            level: Level to use (clamped to the configured bounds); keeps the
+                current level if None
+        """
+        if mode not in ("auto", "manual"):
+            raise ValueError(f"Unknown quality mode: {mode}")
+        self.mode = mode
+        if level is not None:
+            self._set_level(max(self.min_level, min(self.max_level, int(level))), f"{mode} level set")
+        self.apply()
+
+    def set_limit(self, name: str, level: Optional[int], reason: str = "") -> None:
+        """
+        Cap the quality from outside the controller, e.g. on battery or heat.
+
+        Args:
+            name: Source of the limit; each source holds at most one limit
+            level: Best level allowed, or None to remove the limit
+            reason: Why the limit applies, logged with the change
+        """
+        before = self.effective_level
+        current = self.limits.get(name)
+        if level is None:
+            if current is None:
+                return
+            del self.limits[name]
+            reason = f"{name} limit cleared"
+        else:
+            level = max(0, min(len(self.levels) - 1, int(level)))
+            if current is not None and current['level'] == level:
+                current['reason'] = reason
+                return
+            self.limits[name] = {'level': level, 'reason': reason, 'since': time.time()}
+            reason = f"{name} limit: {reason}" if reason else f"{name} limit"
+        self._record(before, reason, time.time())
+        self.apply()
+
+    def apply(self) -> None:
+        """Push the effective level's knobs into the loaded services."""
+        settings = self.settings
+        ai_detection_service = self.get_service("ai_detection")
+        if ai_detection_service is not None:
+            ai_detection_service.jpeg_quality = settings['ai_jpeg_quality']
+            ai_detection_service.image_size = settings['yolo_imgsz']
+        depth_camera_service = self.get_service("depth_camera")
+        if depth_camera_service is not None:
+            depth_camera_service.jpeg_quality = settings['depth_jpeg_quality']
+            depth_camera_service.process_interval = settings['depth_interval']
+            if depth_camera_service.depth_processor is not None:
+                depth_camera_service.depth_processor.input_size = settings['depth_input_size']
+
+    def get_status(self, limit: Optional[int] = None) -> Dict:
+        """
+        Get the controller state and recent level changes, newest first.
+
+        Returns:
+            dict: mode, level, effective_level, bounds, limits, settings,
+                targets, last sample and changes
+        """
+        changes = list(self.changes)[::-1]
+        if limit is not None:
+            changes = changes[:limit]
+        return {
+            'mode': self.mode,
+            'level': self.level,
+            'effective_level': self.effective_level,
+            'min_level': self.min_level,
+            'max_level': self.max_level,
+            'levels': len(self.levels),
+            'limits': self.limits,
+            'settings': self.settings,
+            'targets_ms': {name: round(target, 1) for name, target in self.targets.items()},
+            'last_sample': self.last_sample,
+            'change_count': self.change_count,
+            'changes': changes
+        }
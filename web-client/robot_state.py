@@ -0,0 +1,134 @@
+"""
+Robot State Store for Nautilus Controller
+Thread-safe, versioned store for the robot state shared by the GPS thread and
+the API handlers.
+"""
+
+import threading
+import logging
+from typing import Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Field name -> (type, default). University of Malaya, KK9, Kuala Lumpur, Malaysia
+# is used as the default position until the GPS reports a fix.
+STATE_FIELDS = {
+    "posX": (float, 101.6559),   # Longitude
+    "posY": (float, 3.1209),     # Latitude
+    "heading": (float, 0.0),
+    "motor_speed": (int, 50),
+    "speed_limit": (int, 100),       # Percent cap from the obstacle map on forward motion
+    "servo_angle": (int, 0),
+    "camera_enabled": (bool, False),
+    "ai_detection_enabled": (bool, False),
+    "depth_camera_enabled": (bool, False),
+    "is_moving": (bool, False),
+    "current_direction": (str, "stopped"),
+    "gps_status": (str, "initializing"),
+    "gps_fix_mode": (int, 0),        # 0 unknown, 1 no fix, 2 2D, 3 3D
+    "gps_satellites": (int, 0),      # Satellites used in the fix
+    "gps_hdop": (float, None),
+    "battery": (int, None),
+    "temperature": (float, None),
+}
+
+
+class RobotStateStore:
+    """
+    Typed robot state with per-field versions, atomic snapshots and change
+    notifications.
+
+    Every update that changes at least one field bumps the store version and
+    stamps the changed fields with it, so clients can ask for just the fields
+    that changed since the last version they saw.
+    """
+
+    def __init__(self):
+        """Initialize the store with the default value of every field."""
+        self.lock = threading.RLock()
+        self.version = 0
+        self._values = {name: default for name, (_, default) in STATE_FIELDS.items()}
+        self._versions = {name: 0 for name in STATE_FIELDS}
+        self._subscribers: List[Callable[[int, Dict], None]] = []
+
+    def get(self, name: str):
+        """Get the current value of a field."""
+        return self._values[name]
+
+    def update(self, **fields) -> Tuple[int, Dict]:
+        """
+        Atomically update one or more fields.
+
+        Values are coerced to the field type; unchanged values are ignored.
+
+        Args:
+            **fields: Field names and their new values
+
+        Returns:
+            Tuple of (store version, dict of the fields that changed)
+        """
+        with self.lock:
+            changes = {}
+            for name, value in fields.items():
+                field_type, _ = STATE_FIELDS[name]
+                if value is not None:
+                    value = field_type(value)
+                if self._values[name] != value:
+                    changes[name] = value
+
+            if changes:
+                self.version += 1
+                for name, value in changes.items():
+                    self._values[name] = value
+                    self._versions[name] = self.version
+            version = self.version
+            subscribers = list(self._subscribers) if changes else []
+
+        # Notify outside the lock so subscribers may read the store
+        for callback in subscribers:
+            try:
+                callback(version, changes)
+            except Exception as e:
+                logger.error(f"Robot state subscriber failed: {e}")
+
+        return version, changes
+
+    def snapshot(self) -> Dict:
+        """Get a consistent copy of every field plus the store version."""
+        with self.lock:
+            state = dict(self._values)
+            state["version"] = self.version
+        return state
+
+    def changes_since(self, version: int) -> Dict:
+        """
+        Get the fields that changed after a given version.
+
+        Args:
+            version: Last store version the caller has seen
+
+        Returns:
+            Dict of changed fields plus the current store version
+        """
+        with self.lock:
+            changes = {
+                name: self._values[name]
+                for name, field_version in self._versions.items()
+                if field_version > version
+            }
+            changes["version"] = self.version
+        return changes
+
+    def subscribe(self, callback: Callable[[int, Dict], None]) -> None:
+        """
+        Register a callback invoked as callback(version, changes) after each
+        update that changes the state. Callbacks run on the updating thread.
+        """
+        with self.lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[int, Dict], None]) -> None:
+        """Remove a previously registered callback."""
+        with self.lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
@@ -13,6 +13,10 @@ class NautilusController {
         this.joystickController = null;
         this.aiDetectionController = null;
         this.depthCameraController = null;
+        this.robotState = {}; // Last known state, merged from partial updates
+        this.statusVersion = null; // State version of the last /api/status poll
+        this.telemetrySocket = null;
+        this.staticData = {}; // Class list etc., sent once per telemetry connection
         this.init();
     }
 
@@ -434,9 +438,12 @@ class NautilusController {
 
     async updateStatus() {
         try {
-            const response = await fetch('/api/status');
+            // After the first full poll, only ask for fields that changed
+            const url = this.statusVersion === null ? '/api/status' : `/api/status?since=${this.statusVersion}`;
+            const response = await fetch(url);
             if (response.ok) {
                 const data = await response.json();
+                this.statusVersion = data.version;
                 this.updateStatusFromResponse(data);
                 this.showConnectionStatus(true);
             }
@@ -445,6 +452,11 @@ class NautilusController {
             this.showConnectionError();
         }
     }    updateStatusFromResponse(data) {
+        // Responses carry only the state fields that changed; merge them into
+        // the cached state so unchanged fields keep their last known value
+        Object.assign(this.robotState, data.state || data);
+        data = this.robotState;
+
         // Update position - Extract coordinates
         const lat = data.state?.posY || data.posY || 3.1209; // Default to University of Malaya, KK9 coordinates
         const lon = data.state?.posX || data.posX || 101.6559;
@@ -626,11 +638,43 @@ class NautilusController {
     }
 
     startStatusUpdates() {
+        // State is pushed over the telemetry socket; poll only while it is down
+        this.connectTelemetry();
         this.updateInterval = setInterval(() => {
-            this.updateStatus();
+            if (!this.isTelemetryConnected()) {
+                this.updateStatus();
+            }
             this.checkDepthCameraButton();
         }, 1000); // Update every second
     }
+
+    connectTelemetry() {
+        const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+        try {
+            this.telemetrySocket = new WebSocket(`${protocol}//${window.location.host}/ws/telemetry`);
+        } catch (error) {
+            console.error('Telemetry WebSocket error:', error);
+            return;
+        }
+
+        this.telemetrySocket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.static) {
+                this.staticData = message.static;
+            }
+            this.statusVersion = message.state.version;
+            this.updateStatusFromResponse(message);
+            this.showConnectionStatus(true);
+        };
+        this.telemetrySocket.onclose = () => {
+            this.telemetrySocket = null;
+            setTimeout(() => this.connectTelemetry(), 2000);
+        };
+    }
+
+    isTelemetryConnected() {
+        return this.telemetrySocket !== null && this.telemetrySocket.readyState === WebSocket.OPEN;
+    }
     
     checkDepthCameraButton() {
         const cameraVideo = document.getElementById('cameraVideo');
@@ -0,0 +1,163 @@
+"""
+Service Registry for Nautilus Controller
+Constructs model-backed services lazily in background threads so the backend
+can accept motion commands immediately after startup.
+"""
+
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LazyService:
+    """A service that is constructed on demand in a background thread."""
+    
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+    
+    def __init__(self, name: str, factory: Callable[[], object]):
+        """
+        Initialize the lazy service.
+        
+        Args:
+            name: Service name used in status reports
+            factory: Callable that builds and returns the ready service,
+                raising an exception if the service cannot be loaded
+        """
+        self.name = name
+        self.factory = factory
+        self.state = self.NOT_LOADED
+        self.instance = None
+        self.error = None
+        self.load_started = None
+        self.load_time = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+    
+    def start_loading(self) -> bool:
+        """
+        Start loading the service in a background thread.
+        
+        Returns:
+            bool: True if a load was started, False if already loading or ready
+        """
+        with self._lock:
+            if self.state in (self.LOADING, self.READY):
+                return False
+            self.state = self.LOADING
+            self.error = None
+            self.load_started = time.time()
+            self._done.clear()
+        
+        thread = threading.Thread(target=self._load, name=f"load-{self.name}")
+        thread.daemon = True
+        thread.start()
+        return True
+    
+    def _load(self):
+        """Build the service and record the outcome."""
+        logger.info(f"Loading service '{self.name}' in background")
+        start_time = time.time()
+        try:
+            instance = self.factory()
+        except Exception as e:
+            logger.error(f"Failed to load service '{self.name}': {e}")
+            with self._lock:
+                self.state = self.FAILED
+                self.error = str(e)
+        else:
+            with self._lock:
+                self.instance = instance
+                self.state = self.READY
+            logger.info(f"Service '{self.name}' ready in {time.time() - start_time:.2f}s")
+        finally:
+            self.load_time = time.time() - start_time
+            self._done.set()
+    
+    def get(self):
+        """Return the service instance if it is ready, otherwise None."""
+        return self.instance if self.state == self.READY else None
+    
+    def wait(self, timeout: Optional[float] = None):
+        """
+        Block until the current load attempt finishes.
+        
+        Args:
+            timeout: Maximum time to wait in seconds
+            
+        Returns:
+            The service instance if ready, otherwise None
+        """
+        if self.state == self.NOT_LOADED:
+            return None
+        self._done.wait(timeout)
+        return self.get()
+    
+    def get_status(self) -> Dict:
+        """Get the load status of this service."""
+        return {
+            "state": self.state,
+            "ready": self.state == self.READY,
+            "error": self.error,
+            "load_time": self.load_time
+        }
+
+
+class ServiceRegistry:
+    """Registry of lazily constructed services."""
+    
+    def __init__(self):
+        """Initialize an empty registry."""
+        self._services = {}
+    
+    def register(self, name: str, factory: Callable[[], object]) -> LazyService:
+        """
+        Register a service factory under a name.
+        
+        Args:
+            name: Service name
+            factory: Callable that builds and returns the ready service
+            
+        Returns:
+            LazyService: The registered lazy service
+        """
+        service = LazyService(name, factory)
+        self._services[name] = service
+        return service
+    
+    def __getitem__(self, name: str) -> LazyService:
+        return self._services[name]
+    
+    def get(self, name: str):
+        """Return the named service instance if ready, otherwise None."""
+        return self._services[name].get()
+    
+    def ensure_loading(self, name: str):
+        """
+        Return the named service if ready, starting a background load if not.
+        
+        Args:
+            name: Service name
+            
+        Returns:
+            The service instance if ready, otherwise None
+        """
+        service = self._services[name]
+        instance = service.get()
+        if instance is None:
+            service.start_loading()
+        return instance
+    
+    def preload(self):
+        """Start background loads for every registered service."""
+        for service in self._services.values():
+            service.start_loading()
+    
+    def get_status(self) -> Dict:
+        """Get the load status of every registered service."""
+        return {name: service.get_status() for name, service in self._services.items()}
@@ -0,0 +1,181 @@
+"""
+Telemetry Publisher for Nautilus Controller
+Samples sensors at their own rates and pushes robot state deltas to
+subscribed dashboards over WebSocket.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger(__name__)
+
+
+class TelemetryPublisher:
+    """
+    Pushes robot state changes to every connected dashboard.
+
+    Sensors write into the robot state store on their own schedules. State
+    changes wake a single broadcaster that encodes one delta message per
+    push and sends the same bytes to all clients, so extra dashboards do
+    not add sampling or encoding work.
+    """
+
+    def __init__(self, state_store, max_rate: float = 10.0, send_timeout: float = 1.0):
+        """
+        Initialize the publisher.
+
+        Args:
+            state_store: RobotStateStore to publish
+            max_rate: Maximum number of pushes per second
+            send_timeout: Seconds before a slow client is dropped
+        """
+        self.state_store = state_store
+        self.min_interval = 1.0 / max_rate
+        self.send_timeout = send_timeout
+        self.sensors = []
+        self.static_providers = {}
+        self.clients = set()
+        self.messages_encoded = 0
+        self._static_cache = {}
+        self._last_version = 0
+        self._loop = None
+        self._wakeup = None
+        self._tasks = []
+
+    def add_sensor(self, name: str, read_fn: Callable[[], Dict], interval: float) -> None:
+        """
+        Register a sensor sampled every `interval` seconds.
+
+        Args:
+            name: Sensor name used in log messages
+            read_fn: Callable returning a dict of robot state fields
+            interval: Sampling interval in seconds
+        """
+        self.sensors.append((name, read_fn, interval))
+
+    def add_static(self, name: str, provider: Callable[[], Optional[object]]) -> None:
+        """
+        Register static data sent once to each client on connect.
+
+        The first non-None value returned by the provider is cached and the
+        provider is not called again.
+        """
+        self.static_providers[name] = provider
+
+    def get_static(self) -> Dict:
+        """Get the static data, filling the cache from providers as needed."""
+        for name, provider in self.static_providers.items():
+            if name not in self._static_cache:
+                value = provider()
+                if value is not None:
+                    self._static_cache[name] = value
+        return dict(self._static_cache)
+
+    async def start(self) -> None:
+        """Start the sensor samplers and the broadcaster on the running loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._last_version = self.state_store.version
+        self.state_store.subscribe(self._on_state_change)
+
+        self._tasks = [asyncio.create_task(self._broadcast_loop())]
+        for name, read_fn, interval in self.sensors:
+            self._tasks.append(asyncio.create_task(self._sample_loop(name, read_fn, interval)))
+
+    async def stop(self) -> None:
+        """Stop all publisher tasks."""
+        self.state_store.unsubscribe(self._on_state_change)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def _on_state_change(self, version: int, changes: Dict) -> None:
+        """State store callback; may run on any thread."""
+        if self._loop is not None and self.clients:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _sample_loop(self, name: str, read_fn: Callable[[], Dict], interval: float) -> None:
+        """Sample one sensor forever."""
+        while True:
+            try:
+                values = read_fn()
+                if values:
+                    self.state_store.update(**values)
+            except Exception as e:
+                logger.error(f"Telemetry sensor '{name}' failed: {e}")
+            await asyncio.sleep(interval)
+
+    async def _broadcast_loop(self) -> None:
+        """Send coalesced state deltas to all clients, at most max_rate per second."""
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            changes = self.state_store.changes_since(self._last_version)
+            self._last_version = changes["version"]
+            if len(changes) > 1 and self.clients:
+                message = json.dumps({"type": "delta", "state": changes})
+                self.messages_encoded += 1
+                await self._send_all(message)
+
+            # Changes arriving during this sleep are merged into the next push
+            await asyncio.sleep(self.min_interval)
+
+    async def _send_all(self, message: str) -> None:
+        """Send one encoded message to every client, dropping slow or closed ones."""
+        clients = list(self.clients)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(client.send_text(message), self.send_timeout) for client in clients),
+            return_exceptions=True
+        )
+        for client, result in zip(clients, results):
+            if isinstance(result, Exception):
+                self.clients.discard(client)
+
+    async def handle_client(self, websocket: WebSocket) -> None:
+        """
+        Serve one dashboard: send a full snapshot and the static data, then
+        keep the socket subscribed to deltas until it disconnects.
+
+        Broadcasts made while the snapshot is being sent do not reach this
+        socket yet, so it is caught up with deltas from the snapshot version
+        and joins the broadcast with no await in between; at worst it then
+        receives a few fields it already has.
+        """
+        await websocket.accept()
+        state = self.state_store.snapshot()
+        await websocket.send_text(json.dumps({
+            "type": "snapshot",
+            "state": state,
+            "static": self.get_static()
+        }))
+        version = state["version"]
+        while True:
+            changes = self.state_store.changes_since(version)
+            if len(changes) == 1:
+                break
+            await websocket.send_text(json.dumps({"type": "delta", "state": changes}))
+            version = changes["version"]
+        self.clients.add(websocket)
+        try:
+            while True:
+                # Clients do not send anything; this only detects disconnects
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.clients.discard(websocket)
+
+    def get_status(self) -> Dict:
+        """Get publisher statistics."""
+        return {
+            "clients": len(self.clients),
+            "sensors": [name for name, _, _ in self.sensors],
+            "messages_encoded": self.messages_encoded,
+            "version": self._last_version
+        }